@@ -0,0 +1,116 @@
+"""Session-based authentication: sessions cached in memory and persisted in MongoDB.
+Anonymous guests get a signed guest token instead."""
+import hashlib
+import hmac
+import logging
+import os
+import secrets
+import uuid
+from datetime import datetime
+from typing import Optional
+
+from fastapi import HTTPException, status
+from pydantic import BaseModel, Field
+
+import db
+from db import get_collections
+from metrics import record_cache
+
+# Named as when this lived in server.py, so LOG_SAMPLE_RATES and LOG_LEVELS still apply
+session_logger = logging.getLogger("server.sessions")
+
+# Simple session storage (in production, use Redis or similar)
+active_sessions = {}
+
+# Without a configured secret, guest tokens only survive until the process restarts
+GUEST_TOKEN_SECRET = os.getenv("GUEST_TOKEN_SECRET", "").encode("utf-8") or secrets.token_bytes(32)
+GUEST_TOKEN_COOKIE = "guest_token"
+GUEST_TOKEN_MAX_AGE_SECONDS = 365 * 24 * 3600
+
+class User(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    username: str
+    password: str  # Simple plain text password
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+# MongoDB-based authentication helper functions
+async def create_simple_session(user_id: str) -> str:
+    session_id = str(uuid.uuid4())
+    session_data = {
+        "session_id": session_id,
+        "user_id": user_id,
+        "created_at": datetime.utcnow()
+    }
+    
+    # Store in memory for fast access
+    active_sessions[session_id] = session_data
+    
+    # Also store in MongoDB for persistence across server restarts
+    users_coll, weddings_coll = await get_collections()
+    if users_coll is not None:
+        try:
+            sessions_collection = db.database.sessions
+            await sessions_collection.insert_one(session_data)
+            session_logger.info("✅ Session stored in MongoDB", extra={"session": session_id[:8], "user_id": user_id})
+        except Exception as e:
+            session_logger.warning("⚠️ Failed to store session in MongoDB: %s", e)
+    
+    return session_id
+
+async def get_current_user_simple(session_id: str = None):
+    if not session_id:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Session ID required"
+        )
+    
+    # First check in-memory sessions
+    session = active_sessions.get(session_id)
+    record_cache("sessions", session is not None)
+    
+    # If not in memory, check MongoDB
+    if not session:
+        try:
+            users_coll, weddings_coll = await get_collections()
+            if users_coll is not None:
+                sessions_collection = db.database.sessions
+                session_data = await sessions_collection.find_one({"session_id": session_id})
+                if session_data:
+                    # Restore to memory cache
+                    active_sessions[session_id] = session_data
+                    session = session_data
+                    session_logger.info("✅ Session restored from MongoDB", extra={"session": session_id[:8]})
+        except Exception as e:
+            session_logger.warning("⚠️ Failed to restore session from MongoDB: %s", e)
+    
+    if not session:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid session"
+        )
+    
+    users_coll, weddings_coll = await get_collections()
+    user_data = await users_coll.find_one({"id": session["user_id"]})
+    
+    if not user_data:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User not found"
+        )
+    
+    return User(**user_data)
+
+def sign_guest_id(guest_id: str) -> str:
+    return hmac.new(GUEST_TOKEN_SECRET, guest_id.encode("utf-8"), hashlib.sha256).hexdigest()[:32]
+
+def issue_guest_token() -> tuple:
+    """A new (guest_id, token) pair; the token is the id plus its signature"""
+    guest_id = uuid.uuid4().hex
+    return guest_id, f"{guest_id}.{sign_guest_id(guest_id)}"
+
+def guest_id_of(token: Optional[str]) -> Optional[str]:
+    """The guest id a token was issued for, or None if it is missing or forged"""
+    guest_id, _, signature = (token or "").partition(".")
+    if not guest_id or not hmac.compare_digest(signature, sign_guest_id(guest_id)):
+        return None
+    return guest_id
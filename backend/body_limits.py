@@ -0,0 +1,129 @@
+"""Per-route request body limits, enforced while the body streams in"""
+import json
+import os
+import re
+
+from fastapi import APIRouter, HTTPException, status
+
+router = APIRouter(prefix="/api")
+
+# Request body limits, enforced while the body streams in (first matching rule wins)
+KIB, MIB = 1024, 1024 * 1024
+BODY_LIMIT_DEFAULT = int(os.getenv("BODY_LIMIT_DEFAULT_BYTES", str(1 * MIB)))
+BODY_LIMIT_RULES = [
+    ("wedding", re.compile(r"^/api/wedding(/batch)?$"), int(os.getenv("BODY_LIMIT_WEDDING_BYTES", str(8 * MIB)))),
+    ("wedding_section", re.compile(r"^/api/wedding/(party|faq)$"), int(os.getenv("BODY_LIMIT_SECTION_BYTES", str(4 * MIB)))),
+    ("wedding_item", re.compile(r"^/api/wedding/[^/]+/(items(/[^/]+)?|order)$"), int(os.getenv("BODY_LIMIT_ITEM_BYTES", str(4 * MIB)))),
+    ("upload", re.compile(r"^/api/uploads$"), int(os.getenv("UPLOAD_MAX_BYTES", str(25 * MIB))) + 64 * KIB),
+    ("upload_chunk", re.compile(r"^/api/uploads/sessions/[^/]+$"), int(os.getenv("UPLOAD_CHUNK_MAX_BYTES", str(8 * MIB)))),
+    ("auth", re.compile(r"^/api/auth/"), 4 * KIB),
+    ("rsvp", re.compile(r"^/api/rsvp$"), 16 * KIB),
+    ("guestbook_reaction", re.compile(r"^/api/guestbook/[^/]+/reactions$"), 1 * KIB),
+    ("guestbook", re.compile(r"^/api/guestbook(/private)?$"), 16 * KIB),
+]
+BODYLESS_METHODS = {"GET", "HEAD", "OPTIONS", "DELETE"}
+
+body_limit_metrics = {
+    "rejected_requests": 0,
+    "rejected_declared_bytes": 0,  # Content-Length of requests refused before reading
+    "rejected_streamed_bytes": 0,  # bytes read before a streaming body crossed its limit
+    "rejected_by_route": {},
+}
+
+class RequestBodyTooLarge(HTTPException):
+    """Raised from receive(); an HTTPException so FastAPI's body parsing passes it through as 413"""
+    
+    def __init__(self, limit: int):
+        super().__init__(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Request body exceeds the {limit} byte limit for this endpoint",
+            headers={"Connection": "close"}
+        )
+
+def body_limit_for(path: str) -> tuple:
+    for name, pattern, limit in BODY_LIMIT_RULES:
+        if pattern.match(path):
+            return name, limit
+    return "default", BODY_LIMIT_DEFAULT
+
+def record_body_rejection(route: str, declared: int = 0, streamed: int = 0):
+    body_limit_metrics["rejected_requests"] += 1
+    body_limit_metrics["rejected_declared_bytes"] += declared
+    body_limit_metrics["rejected_streamed_bytes"] += streamed
+    body_limit_metrics["rejected_by_route"][route] = body_limit_metrics["rejected_by_route"].get(route, 0) + 1
+
+class BodySizeLimitMiddleware:
+    """Pure ASGI middleware: refuses oversized bodies from Content-Length up front, and
+    counts streamed chunks so chunked or lying clients are cut off at the limit
+    instead of being buffered whole."""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in BODYLESS_METHODS:
+            await self.app(scope, receive, send)
+            return
+        route, limit = body_limit_for(scope["path"])
+        
+        declared = None
+        for name, value in scope.get("headers", []):
+            if name == b"content-length":
+                try:
+                    declared = int(value)
+                except ValueError:
+                    pass
+                break
+        if declared is not None and declared > limit:
+            record_body_rejection(route, declared=declared)
+            await self.reject(send, limit)
+            return
+        
+        received = 0
+        
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    record_body_rejection(route, streamed=received)
+                    raise RequestBodyTooLarge(limit)
+            return message
+        
+        response_started = False
+        
+        async def tracking_send(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+        
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except RequestBodyTooLarge:
+            # Only reached if something other than FastAPI's handlers read the body
+            if not response_started:
+                await self.reject(send, limit)
+    
+    @staticmethod
+    async def reject(send, limit: int):
+        error = RequestBodyTooLarge(limit)
+        body = json.dumps({"detail": error.detail}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": error.status_code,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"connection", b"close"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+@router.get("/metrics/request-limits")
+async def request_limit_metrics():
+    """Counts of request bodies refused by BodySizeLimitMiddleware"""
+    limits = {name: limit for name, _, limit in BODY_LIMIT_RULES}
+    limits["default"] = BODY_LIMIT_DEFAULT
+    return {**body_limit_metrics, "limits": limits}
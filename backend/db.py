@@ -0,0 +1,47 @@
+"""MongoDB connection, shared by server.py and the subsystem modules"""
+import logging
+import os
+import urllib.parse
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+logger = logging.getLogger(__name__)
+
+# MongoDB connection
+MONGO_URL = os.getenv("MONGO_URL")
+DB_NAME = os.getenv("DB_NAME", "weddingcard")
+
+# MongoDB client and database
+mongodb_client = None
+database = None
+
+async def connect_to_mongo():
+    global mongodb_client, database
+    try:
+        logger.info("🔄 Attempting to connect to MongoDB at %s", urllib.parse.urlsplit(MONGO_URL or "").hostname)
+        mongodb_client = AsyncIOMotorClient(MONGO_URL)
+        database = mongodb_client[DB_NAME]
+        # Test the connection
+        await database.command("ping")
+        logger.info("✅ Connected to MongoDB database: %s", DB_NAME)
+    except Exception as e:
+        logger.error("❌ Error connecting to MongoDB: %s", e)
+        # Don't raise the error, just continue with JSON files
+        pass
+
+async def close_mongo_connection():
+    global mongodb_client
+    if mongodb_client:
+        mongodb_client.close()
+
+# MongoDB collections
+users_collection = None
+weddings_collection = None
+
+async def get_collections():
+    global users_collection, weddings_collection
+    if users_collection is None:
+        users_collection = database.users
+    if weddings_collection is None:
+        weddings_collection = database.weddings
+    return users_collection, weddings_collection
@@ -0,0 +1,534 @@
+"""Image derivatives: width-bucketed WebP/JPEG variants rendered in a process pool and
+cached on disk by content hash. Pillow is optional; without it these endpoints 503."""
+import asyncio
+import base64
+import concurrent.futures
+import hashlib
+import http.client
+import io
+import ipaddress
+import json
+import logging
+import os
+import re
+import socket
+import ssl
+import time
+import urllib.parse
+import uuid
+from collections import Counter, OrderedDict
+from pathlib import Path
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException, Query, status
+from fastapi.responses import FileResponse, RedirectResponse
+
+import db
+from body_limits import KIB, MIB
+from metrics import record_cache
+from uploads import upload_store
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = ImageOps = None
+
+ROOT_DIR = Path(__file__).parent
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/api")
+
+IMAGE_CACHE_DIR = Path(os.getenv("IMAGE_CACHE_DIR", str(ROOT_DIR / "image_cache")))
+IMAGE_CACHE_MAX_BYTES = int(os.getenv("IMAGE_CACHE_MAX_BYTES", str(1024 * MIB)))
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", str(min(4, os.cpu_count() or 1))))
+IMAGE_WIDTHS = (160, 320, 640, 960, 1280, 1920)
+IMAGE_FORMATS = {"webp": "image/webp", "jpeg": "image/jpeg"}
+IMAGE_FETCH_MAX_BYTES = 25 * MIB
+IMAGE_FETCH_TIMEOUT_SECONDS = 15
+IMAGE_FETCH_MAX_REDIRECTS = 3
+IMAGE_FETCH_RETRY_SECONDS = 300  # a source that failed to download is not tried again sooner
+IMAGE_FETCH_FAILURES_MAX = 10000
+IMAGE_SOURCES_LOAD_WAIT_SECONDS = 5
+IMAGE_MAX_PIXELS = 60_000_000  # refuse decompression bombs
+IMAGE_IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+IMAGE_DIGEST_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+IMAGE_PLACEHOLDER_SIZE = 16  # longest side of the inline preview, in pixels
+
+# Which image fields public payloads get thumbnails for, and at what width
+IMAGE_THUMBNAIL_FIELDS = {
+    "gallery_photos": (("src", "url"), 640),
+    "story_timeline": (("image",), 640),
+    "bridal_party": (("photo", "image"), 320),
+    "groom_party": (("photo", "image"), 320),
+    "special_roles": (("photo", "image"), 320),
+    "registry_items": (("image",), 320),
+}
+
+def image_width_bucket(width: int) -> int:
+    """Round a requested width up to a bucket so near-identical sizes share one variant"""
+    for bucket in IMAGE_WIDTHS:
+        if width <= bucket:
+            return bucket
+    return IMAGE_WIDTHS[-1]
+
+def render_image_variant(original_path: str, variant_path: str, width: int, fmt: str) -> int:
+    """Resize and re-encode one image. Runs in a worker process; returns the variant's size"""
+    Image.MAX_IMAGE_PIXELS = IMAGE_MAX_PIXELS
+    with Image.open(original_path) as source:
+        image = ImageOps.exif_transpose(source)
+        if fmt == "jpeg" and image.mode != "RGB":
+            image = image.convert("RGB")
+        elif image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA")
+        if image.width > width:
+            image = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+        
+        temp_path = f"{variant_path}.{os.getpid()}.tmp"
+        if fmt == "webp":
+            image.save(temp_path, format="WEBP", quality=80, method=4)
+        else:
+            image.save(temp_path, format="JPEG", quality=82, optimize=True, progressive=True)
+    os.replace(temp_path, variant_path)
+    return os.path.getsize(variant_path)
+
+def render_image_placeholder(original_path: str) -> dict:
+    """Intrinsic size and a tiny blurred-up preview of one image. Runs in a worker process"""
+    Image.MAX_IMAGE_PIXELS = IMAGE_MAX_PIXELS
+    with Image.open(original_path) as source:
+        width, height = source.size
+        if source.getexif().get(0x0112) in (5, 6, 7, 8):  # EXIF rotated a quarter turn
+            width, height = height, width
+        source.draft("RGB", (IMAGE_PLACEHOLDER_SIZE * 4, IMAGE_PLACEHOLDER_SIZE * 4))  # JPEG decodes at 1/8 scale
+        image = ImageOps.exif_transpose(source).convert("RGB")
+        image.thumbnail((IMAGE_PLACEHOLDER_SIZE, IMAGE_PLACEHOLDER_SIZE), Image.BILINEAR)
+        buffer = io.BytesIO()
+        image.save(buffer, format="WEBP", quality=40)
+    return {
+        "width": width,
+        "height": height,
+        "preview": "data:image/webp;base64," + base64.b64encode(buffer.getvalue()).decode(),
+    }
+
+def resolve_public_address(host: str) -> str:
+    """One address for host, provided every address it resolves to is public (no localhost,
+    LAN or link-local metadata endpoints). The caller connects to exactly this address, so
+    a second lookup can't be answered differently (DNS rebinding)."""
+    try:
+        addresses = [info[4][0] for info in socket.getaddrinfo(host, None, proto=socket.IPPROTO_TCP)]
+    except socket.gaierror:
+        raise ValueError(f"Cannot resolve {host}")
+    if not addresses or not all(ipaddress.ip_address(address.split("%")[0]).is_global for address in addresses):
+        raise ValueError("Only public image hosts can be fetched")
+    return addresses[0]
+
+class PinnedHTTPConnection(http.client.HTTPConnection):
+    """HTTP connection to a pre-validated address, still sending the original Host header"""
+    
+    def __init__(self, host: str, address: str, **kwargs):
+        super().__init__(host, **kwargs)
+        self.address = address
+    
+    def connect(self):
+        self.sock = socket.create_connection((self.address, self.port), self.timeout)
+
+class PinnedHTTPSConnection(http.client.HTTPSConnection):
+    """HTTPS to a pre-validated address; the certificate is still checked against the hostname"""
+    
+    def __init__(self, host: str, address: str, **kwargs):
+        super().__init__(host, context=ssl.create_default_context(), **kwargs)
+        self.address = address
+    
+    def connect(self):
+        sock = socket.create_connection((self.address, self.port), self.timeout)
+        self.sock = self._context.wrap_socket(sock, server_hostname=self.host)
+
+def open_public_image(url: str) -> tuple:
+    """GET url, following up to IMAGE_FETCH_MAX_REDIRECTS redirects and validating the
+    scheme and destination address of every hop; returns (connection, response)"""
+    for _ in range(IMAGE_FETCH_MAX_REDIRECTS + 1):
+        parsed = urllib.parse.urlsplit(url)
+        if parsed.scheme not in ("http", "https") or not parsed.hostname:
+            raise ValueError("Only public http(s) image URLs can be fetched")
+        address = resolve_public_address(parsed.hostname)
+        connection_class = PinnedHTTPSConnection if parsed.scheme == "https" else PinnedHTTPConnection
+        connection = connection_class(parsed.hostname, address, port=parsed.port, timeout=IMAGE_FETCH_TIMEOUT_SECONDS)
+        target = urllib.parse.urlunsplit(("", "", parsed.path or "/", parsed.query, ""))
+        try:
+            connection.request("GET", target, headers={"User-Agent": "WeddingCard-Thumbnailer/1.0"})
+            response = connection.getresponse()
+        except Exception:
+            connection.close()
+            raise
+        if response.status in (301, 302, 303, 307, 308) and response.getheader("Location"):
+            url = urllib.parse.urljoin(url, response.getheader("Location"))
+            connection.close()
+            continue
+        if response.status != 200:
+            connection.close()
+            raise ValueError(f"Image host answered {response.status}")
+        return connection, response
+    raise ValueError("Too many redirects")
+
+def download_image(url: str, directory: Path) -> tuple:
+    """Stream a remote image to a temp file, hashing as it goes; returns (sha256, temp path)"""
+    directory.mkdir(parents=True, exist_ok=True)
+    digest = hashlib.sha256()
+    temp_path = directory / f"fetch-{uuid.uuid4().hex}.tmp"
+    size = 0
+    connection, remote = open_public_image(url)
+    try:
+        with open(temp_path, "wb") as f:
+            if not (remote.getheader("Content-Type") or "").startswith("image/"):
+                raise ValueError("URL does not point at an image")
+            while chunk := remote.read(64 * KIB):
+                size += len(chunk)
+                if size > IMAGE_FETCH_MAX_BYTES:
+                    raise ValueError("Image is too large")
+                digest.update(chunk)
+                f.write(chunk)
+    except Exception:
+        temp_path.unlink(missing_ok=True)
+        raise
+    finally:
+        connection.close()
+    return digest.hexdigest(), temp_path
+
+class ImageCache:
+    """Fetched originals and rendered variants on local disk, evicted least-recently-used
+    once they outgrow max_bytes. Variants are keyed by the original's SHA-256, so their
+    URLs never change meaning and can be cached forever."""
+    
+    def __init__(self, root: Path, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # path -> size, oldest first
+        self.total_bytes = 0
+        self.inflight = {}  # variant path or source record -> future of the work in progress
+        self.failed_fetches = OrderedDict()  # url -> (retry after, reason), oldest first
+        self.pool = None
+    
+    def scan(self) -> list:
+        """What earlier runs left on disk, oldest access first. Blocking; run in a thread"""
+        files = []
+        for folder in ("originals", "variants"):
+            for path in (self.root / folder).glob("*/*"):
+                if path.suffix != ".tmp":
+                    stat = path.stat()
+                    files.append((stat.st_atime, path, stat.st_size))
+        return [(path, size) for _, path, size in sorted(files)]
+    
+    async def load(self):
+        """Index the cache directory without blocking the event loop"""
+        entries = OrderedDict(await asyncio.to_thread(self.scan))
+        # Files added while the scan ran are the most recently used
+        for path, size in self.entries.items():
+            entries.pop(path, None)
+            entries[path] = size
+        self.entries = entries
+        self.total_bytes = sum(entries.values())
+        self.evict()
+    
+    def original_path(self, digest: str) -> Path:
+        return self.root / "originals" / digest[:2] / digest
+    
+    def variant_path(self, digest: str, width: int, fmt: str) -> Path:
+        return self.root / "variants" / digest[:2] / f"{digest}-{width}.{fmt}"
+    
+    def placeholder_path(self, digest: str) -> Path:
+        return self.root / "placeholders" / digest[:2] / f"{digest}.json"
+    
+    def touch(self, path: Path):
+        if path in self.entries:
+            self.entries.move_to_end(path)
+    
+    def add(self, path: Path, size: int):
+        self.total_bytes += size - self.entries.pop(path, 0)
+        self.entries[path] = size
+        self.evict()
+    
+    def evict(self):
+        while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+            old_path, old_size = self.entries.popitem(last=False)
+            self.total_bytes -= old_size
+            old_path.unlink(missing_ok=True)
+    
+    def find_original(self, digest: str) -> Optional[Path]:
+        path = self.original_path(digest)
+        if path.exists():
+            self.touch(path)
+            return path
+        # Uploaded photos are originals too, but live in the upload store and are never evicted
+        path = upload_store.blob_path(digest)
+        return path if path.exists() else None
+    
+    def source_record(self, url: str) -> Path:
+        return self.root / "sources" / hashlib.sha256(url.encode()).hexdigest()
+    
+    def cached_digest(self, url: str) -> Optional[str]:
+        """Digest of an already-downloaded url whose original is still cached"""
+        source_record = self.source_record(url)
+        if source_record.exists():
+            digest = source_record.read_text().strip()
+            if self.find_original(digest):
+                return digest
+        return None
+    
+    async def fetch_original(self, url: str) -> str:
+        """Digest of the image at url, downloading it only the first time it's asked for.
+        Concurrent first requests share one download, and a failed download is not
+        retried for IMAGE_FETCH_RETRY_SECONDS."""
+        digest = self.cached_digest(url)
+        if digest:
+            return digest
+        failure = self.failed_fetches.get(url)
+        if failure is not None:
+            if failure[0] > time.monotonic():
+                raise ValueError(failure[1])
+            del self.failed_fetches[url]
+        
+        source_record = self.source_record(url)
+        pending = self.inflight.get(source_record)
+        if pending is None:
+            pending = asyncio.ensure_future(self.download_original(url, source_record))
+            self.inflight[source_record] = pending
+            pending.add_done_callback(lambda _: self.inflight.pop(source_record, None))
+        # Shielded, so one requester disconnecting doesn't cancel the download for the rest
+        return await asyncio.shield(pending)
+    
+    async def download_original(self, url: str, source_record: Path) -> str:
+        try:
+            digest, temp_path = await asyncio.to_thread(download_image, url, self.root / "tmp")
+        except (ValueError, OSError) as e:
+            self.failed_fetches[url] = (time.monotonic() + IMAGE_FETCH_RETRY_SECONDS, str(e))
+            while len(self.failed_fetches) > IMAGE_FETCH_FAILURES_MAX:
+                self.failed_fetches.popitem(last=False)
+            raise
+        path = self.original_path(digest)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(temp_path, path)
+        self.add(path, path.stat().st_size)
+        source_record.parent.mkdir(parents=True, exist_ok=True)
+        source_record.write_text(digest)
+        return digest
+    
+    async def variant(self, digest: str, width: int, fmt: str) -> Path:
+        """Path of a rendered variant, rendering it once however many requests want it"""
+        path = self.variant_path(digest, width, fmt)
+        if path.exists():
+            record_cache("image_variants", True)
+            self.touch(path)
+            return path
+        record_cache("image_variants", False)
+        original = self.find_original(digest)
+        if original is None:
+            raise FileNotFoundError(digest)
+        
+        pending = self.inflight.get(path)
+        if pending is None:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            pending = self.run_in_pool(render_image_variant, str(original), str(path), width, fmt)
+            self.inflight[path] = pending
+            try:
+                self.add(path, await pending)
+            finally:
+                self.inflight.pop(path, None)
+        else:
+            await pending
+        return path
+    
+    def run_in_pool(self, function, *args) -> asyncio.Future:
+        if self.pool is None:
+            self.pool = concurrent.futures.ProcessPoolExecutor(max_workers=IMAGE_WORKERS)
+        return asyncio.get_running_loop().run_in_executor(self.pool, function, *args)
+    
+    async def placeholder(self, digest: str) -> dict:
+        """Dimensions and inline preview of an original, computed once per digest. These are
+        a few hundred bytes each, so they are kept outside the LRU budget."""
+        path = self.placeholder_path(digest)
+        if path.exists():
+            return json.loads(path.read_text())
+        original = self.find_original(digest)
+        if original is None:
+            raise FileNotFoundError(digest)
+        placeholder = await self.run_in_pool(render_image_placeholder, str(original))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(placeholder))
+        return placeholder
+    
+    def shutdown(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
+
+image_cache = ImageCache(IMAGE_CACHE_DIR, IMAGE_CACHE_MAX_BYTES)
+
+def require_image_support():
+    if Image is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Image processing is not available (Pillow is not installed)"
+        )
+
+def negotiate_image_format(fmt: Optional[str], accept: Optional[str]) -> str:
+    if fmt:
+        if fmt not in IMAGE_FORMATS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"format must be one of {', '.join(IMAGE_FORMATS)}"
+            )
+        return fmt
+    return "webp" if "image/webp" in (accept or "") else "jpeg"
+
+def thumbnail_path(src: str, width: int) -> str:
+    return f"/api/images/thumbnail?{urllib.parse.urlencode({'src': src, 'w': width})}"
+
+def public_wedding_view(wedding: dict) -> dict:
+    """A wedding as guests see it: owner fields removed, image entries given thumbnail links"""
+    public_data = {k: v for k, v in wedding.items() if k not in ("user_id", "_id")}
+    if Image is None:
+        return public_data
+    for field, (keys, width) in IMAGE_THUMBNAIL_FIELDS.items():
+        items = public_data.get(field)
+        if not isinstance(items, list):
+            continue
+        with_thumbnails = []
+        for item in items:
+            src = next((item.get(key) for key in keys if isinstance(item, dict) and item.get(key)), None)
+            if isinstance(src, str) and src.startswith(("http://", "https://")):
+                item = {**item, "thumbnail": thumbnail_path(src, width)}
+            with_thumbnails.append(item)
+        public_data[field] = with_thumbnails
+    return public_data
+
+def wedding_image_sources(wedding: dict) -> set:
+    """The remote image URLs a wedding's public page links thumbnails for"""
+    return {
+        item[key]
+        for field, (keys, _) in IMAGE_THUMBNAIL_FIELDS.items()
+        for item in wedding.get(field) or []
+        if isinstance(item, dict)
+        for key in keys
+        if isinstance(item.get(key), str) and item[key].startswith(("http://", "https://"))
+    }
+
+class WeddingImageSources:
+    """Every image URL some wedding shows, counted across weddings, so /images/thumbnail
+    can refuse unknown URLs with a set lookup instead of a query.
+    
+    Loaded once at startup; after that, wedding writes mark the wedding dirty (the same
+    hook that refreshes upload references and placeholders) and the next lookup re-reads
+    just those weddings. Requests with made-up URLs never reach the database.
+    """
+    
+    PROJECTION = {"_id": 0, "id": 1, **{field: 1 for field in IMAGE_THUMBNAIL_FIELDS}}
+    
+    def __init__(self):
+        self.by_wedding = {}  # wedding_id -> set of URLs
+        self.counts = Counter()  # URL -> weddings showing it
+        self.dirty = set()
+        self.loaded = asyncio.Event()
+    
+    def mark(self, wedding_id: str):
+        self.dirty.add(wedding_id)
+    
+    def update(self, wedding_id: str, wedding: Optional[dict]):
+        current = wedding_image_sources(wedding) if wedding else set()
+        previous = self.by_wedding.pop(wedding_id, set())
+        if current:
+            self.by_wedding[wedding_id] = current
+        self.counts.update(current - previous)
+        for src in previous - current:
+            self.counts[src] -= 1
+            if self.counts[src] <= 0:
+                del self.counts[src]
+    
+    async def load(self, backup_weddings: dict):
+        """Index every wedding in Mongo, then those only present in the JSON backup"""
+        if db.database is not None:
+            async for wedding in db.database.weddings.find({}, self.PROJECTION):
+                self.update(wedding.get("id"), wedding)
+        for wedding_id, wedding in backup_weddings.items():
+            if wedding_id not in self.by_wedding:
+                self.update(wedding_id, wedding)
+        self.loaded.set()
+    
+    async def flush(self):
+        while self.dirty:
+            wedding_id = self.dirty.pop()
+            try:
+                wedding = await db.database.weddings.find_one({"id": wedding_id}, self.PROJECTION)
+            except Exception as e:
+                self.dirty.add(wedding_id)
+                logger.warning("⚠️ Image source refresh failed: %s", e, extra={"wedding_id": wedding_id})
+                return
+            self.update(wedding_id, wedding)
+    
+    async def contains(self, src: str) -> bool:
+        if not self.loaded.is_set():
+            try:
+                await asyncio.wait_for(self.loaded.wait(), IMAGE_SOURCES_LOAD_WAIT_SECONDS)
+            except asyncio.TimeoutError:
+                return False
+        if self.dirty:
+            await self.flush()
+        return src in self.counts
+
+wedding_images = WeddingImageSources()
+
+@router.get("/images/thumbnail")
+async def image_thumbnail(
+    src: str,
+    w: int = Query(640, ge=1, le=4096),
+    format: Optional[str] = None,
+    accept: Optional[str] = Header(None),
+):
+    """Redirect to the content-addressed variant of a remote image, fetching it on first use"""
+    require_image_support()
+    fmt = negotiate_image_format(format, accept)
+    # Only images some wedding actually shows are fetched, so this can't be used to make
+    # the server download arbitrary URLs or flush the cache
+    if not await wedding_images.contains(src):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Image is not used by any wedding"
+        )
+    try:
+        digest = await image_cache.fetch_original(src)
+    except (ValueError, OSError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Could not fetch image: {e}"
+        )
+    # The source URL could start serving a different image, so only the redirect is short-lived
+    return RedirectResponse(
+        f"/api/images/{digest}/{image_width_bucket(w)}.{fmt}",
+        status_code=status.HTTP_302_FOUND,
+        headers={"Cache-Control": "public, max-age=3600", "Vary": "Accept"}
+    )
+
+@router.get("/images/{digest}/{variant}")
+async def image_variant(digest: str, variant: str):
+    """A rendered variant; the URL names the exact bytes, so it is cached as immutable"""
+    require_image_support()
+    width, _, fmt = variant.partition(".")
+    if not IMAGE_DIGEST_PATTERN.match(digest) or fmt not in IMAGE_FORMATS or not width.isdigit() or int(width) not in IMAGE_WIDTHS:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Unknown image variant"
+        )
+    try:
+        path = await image_cache.variant(digest, int(width), fmt)
+    except FileNotFoundError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Image not found"
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Could not process image: {e}"
+        )
+    return FileResponse(
+        path,
+        media_type=IMAGE_FORMATS[fmt],
+        headers={"Cache-Control": IMAGE_IMMUTABLE_CACHE_CONTROL, "ETag": f'"{digest[:16]}-{width}-{fmt}"'}
+    )
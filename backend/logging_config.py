@@ -0,0 +1,134 @@
+"""Structured logging: JSON records written by a listener thread, tagged with request ids"""
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import sys
+import uuid
+from datetime import datetime
+
+# Logging: records are queued on the event loop and formatted/written by a listener thread,
+# so a slow stdout never stalls requests. Output is one JSON object per line.
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")  # "json", or "text" for local development
+LOG_QUEUE_SIZE = 10000  # beyond this, records are dropped rather than blocking the loop
+
+def parse_logger_settings(value: str) -> dict:
+    """"server.sessions=0.1,uvicorn.access=WARNING" -> {"server.sessions": "0.1", ...}"""
+    settings = {}
+    for part in value.split(","):
+        name, _, setting = part.partition("=")
+        if name.strip() and setting.strip():
+            settings[name.strip()] = setting.strip()
+    return settings
+
+LOG_LEVELS = parse_logger_settings(os.getenv("LOG_LEVELS", ""))
+# Fraction of sub-WARNING records kept for chatty loggers (prefix match on the logger name)
+LOG_SAMPLE_RATES = {
+    "server.sessions": 0.1,
+    **{name: float(rate) for name, rate in parse_logger_settings(os.getenv("LOG_SAMPLE_RATES", "")).items()},
+}
+
+request_id_var = contextvars.ContextVar("request_id", default=None)
+
+class JsonLogFormatter(logging.Formatter):
+    """One JSON object per record; anything passed via extra= becomes a top-level key"""
+    
+    STANDARD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+    
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.utcfromtimestamp(record.created).isoformat(timespec="milliseconds") + "Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in self.STANDARD_ATTRIBUTES and value is not None:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+class LogContextFilter(logging.Filter):
+    """Runs on the calling side of the queue: attaches the request id (a contextvar, only
+    readable there) and drops the unsampled share of high-volume debug/info records."""
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < logging.WARNING:
+            for prefix, rate in LOG_SAMPLE_RATES.items():
+                if record.name == prefix or record.name.startswith(prefix + "."):
+                    if random.random() >= rate:
+                        return False
+                    break
+        record.request_id = request_id_var.get()
+        return True
+
+class LoopSafeQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves formatting to the listener thread and never blocks"""
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The stock prepare() formats here; the queue is in-process, so the record can go as is
+        return record
+    
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+def configure_logging() -> logging.handlers.QueueListener:
+    output = logging.StreamHandler(sys.stdout)
+    if LOG_FORMAT == "json":
+        output.setFormatter(JsonLogFormatter())
+    else:
+        output.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s'))
+    
+    handler = LoopSafeQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+    handler.addFilter(LogContextFilter())
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(LOG_LEVEL)
+    for name, level in LOG_LEVELS.items():
+        logging.getLogger(name).setLevel(level.upper())
+    
+    listener = logging.handlers.QueueListener(handler.queue, output, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+# Request ids: taken from X-Request-ID when a proxy set one, otherwise generated, and
+# attached to every log record written while the request is handled
+REQUEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9._:-]{1,64}$")
+
+class RequestIdMiddleware:
+    """Pure ASGI middleware: binds the request id to request_id_var and echoes it back"""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request_id = next(
+            (value.decode("latin-1") for name, value in scope.get("headers", []) if name == b"x-request-id"), ""
+        )
+        if not REQUEST_ID_PATTERN.match(request_id):
+            request_id = uuid.uuid4().hex
+        token = request_id_var.set(request_id)
+        
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), (b"x-request-id", request_id.encode())]
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            request_id_var.reset(token)
@@ -0,0 +1,143 @@
+"""Prometheus metrics: per-route latency and size histograms, in-flight requests, cache hits"""
+import bisect
+import os
+import time
+from collections import Counter
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException, Response, status
+
+from body_limits import body_limit_metrics
+
+router = APIRouter()
+
+# Metrics: per-route request counts, latency and response-size histograms, in-flight
+# requests and cache hit/miss counts, exposed in Prometheus text format at /metrics.
+# Everything is updated from the event loop thread only, so plain ints need no locks.
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")  # when set, /metrics requires "Authorization: Bearer <token>"
+METRICS_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+METRICS_SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+class Histogram:
+    __slots__ = ("bounds", "counts", "total")
+    
+    def __init__(self, bounds: tuple):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # per bucket, last one is +Inf; cumulated on export
+        self.total = 0
+    
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.total += value
+    
+    def export(self, name: str, labels: str) -> list:
+        lines = []
+        cumulative = 0
+        for bound, count in zip((*self.bounds, "+Inf"), self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f"{name}_sum{{{labels}}} {self.total}")
+        lines.append(f"{name}_count{{{labels}}} {cumulative}")
+        return lines
+
+class RouteMetrics:
+    __slots__ = ("statuses", "latency", "response_size")
+    
+    def __init__(self):
+        self.statuses = {}  # status code -> count
+        self.latency = Histogram(METRICS_LATENCY_BUCKETS)
+        self.response_size = Histogram(METRICS_SIZE_BUCKETS)
+
+route_metrics = {}  # (method, route template) -> RouteMetrics
+requests_in_flight = Counter()  # method -> requests being handled now
+cache_metrics = Counter()  # (cache, "hit" | "miss") -> count
+
+def record_cache(cache: str, hit: bool):
+    cache_metrics[(cache, "hit" if hit else "miss")] += 1
+
+class MetricsMiddleware:
+    """Pure ASGI middleware timing each request and counting its response bytes. Routes
+    are labelled by template (/api/wedding/{field}/items), never by raw path."""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        method = scope["method"]
+        started = time.perf_counter()
+        status_code = 500
+        sent_bytes = 0
+        
+        async def measured_send(message):
+            nonlocal status_code, sent_bytes
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                sent_bytes += len(message.get("body", b""))
+            await send(message)
+        
+        requests_in_flight[method] += 1
+        try:
+            await self.app(scope, receive, measured_send)
+        finally:
+            requests_in_flight[method] -= 1
+            route = scope.get("route")
+            key = (method, route.path if route is not None else "unmatched")
+            metrics = route_metrics.get(key)
+            if metrics is None:
+                metrics = route_metrics[key] = RouteMetrics()
+            metrics.statuses[status_code] = metrics.statuses.get(status_code, 0) + 1
+            metrics.latency.observe(time.perf_counter() - started)
+            metrics.response_size.observe(sent_bytes)
+
+def metric_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def render_metrics() -> str:
+    lines = [
+        "# HELP http_requests_total Requests handled, by route template and status.",
+        "# TYPE http_requests_total counter",
+    ]
+    routes = sorted(route_metrics.items())
+    for (method, route), metrics in routes:
+        for status_code, count in sorted(metrics.statuses.items()):
+            lines.append(f'http_requests_total{{method="{method}",route="{metric_label(route)}",status="{status_code}"}} {count}')
+    
+    lines += ["# HELP http_request_duration_seconds Time from request start to last response byte.",
+              "# TYPE http_request_duration_seconds histogram"]
+    for (method, route), metrics in routes:
+        lines += metrics.latency.export("http_request_duration_seconds", f'method="{method}",route="{metric_label(route)}"')
+    
+    lines += ["# HELP http_response_size_bytes Response body size.",
+              "# TYPE http_response_size_bytes histogram"]
+    for (method, route), metrics in routes:
+        lines += metrics.response_size.export("http_response_size_bytes", f'method="{method}",route="{metric_label(route)}"')
+    
+    lines += ["# HELP http_requests_in_flight Requests currently being handled.",
+              "# TYPE http_requests_in_flight gauge"]
+    for method, count in sorted(requests_in_flight.items()):
+        lines.append(f'http_requests_in_flight{{method="{method}"}} {count}')
+    
+    lines += ["# HELP cache_requests_total Cache lookups, by cache and result.",
+              "# TYPE cache_requests_total counter"]
+    for (cache, result), count in sorted(cache_metrics.items()):
+        lines.append(f'cache_requests_total{{cache="{cache}",result="{result}"}} {count}')
+    
+    lines += ["# HELP request_body_rejections_total Request bodies refused for exceeding their limit.",
+              "# TYPE request_body_rejections_total counter"]
+    for route, count in sorted(body_limit_metrics["rejected_by_route"].items()):
+        lines.append(f'request_body_rejections_total{{route="{route}"}} {count}')
+    return "\n".join(lines) + "\n"
+
+@router.get("/metrics")
+async def prometheus_metrics(authorization: Optional[str] = Header(None)):
+    """Prometheus scrape endpoint"""
+    if METRICS_TOKEN and authorization != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Metrics token required"
+        )
+    return Response(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
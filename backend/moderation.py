@@ -0,0 +1,275 @@
+"""Guestbook moderation: cheap spam checks run by background workers, with the
+decisions written back in bulk so posting a message never waits on them."""
+import asyncio
+import hashlib
+import ipaddress
+import logging
+import os
+import re
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from fastapi import Request
+from pymongo import UpdateOne
+
+import db
+from text_search import search_tokens
+
+logger = logging.getLogger(__name__)
+
+GUESTBOOK_MODERATION = os.getenv("GUESTBOOK_MODERATION", "on") == "on"
+GUESTBOOK_MODERATION_WORKERS = int(os.getenv("GUESTBOOK_MODERATION_WORKERS", "2"))
+GUESTBOOK_MODERATION_BATCH_SIZE = 100
+GUESTBOOK_MODERATION_FLUSH_MS = 250
+# Messages that missed the queue (full, or a failed write) are picked up again this often
+GUESTBOOK_MODERATION_REPOLL_SECONDS = int(os.getenv("GUESTBOOK_MODERATION_REPOLL_SECONDS", "60"))
+GUESTBOOK_MAX_LINKS = 2
+GUESTBOOK_MAX_LINK_RATIO = 0.2
+GUESTBOOK_DUPLICATE_WINDOW_SECONDS = 3600
+GUESTBOOK_DUPLICATE_MIN_LENGTH = 20
+GUESTBOOK_DUPLICATE_MAX_WEDDINGS = 3
+GUESTBOOK_IP_RATE_LIMIT = 5
+GUESTBOOK_IP_RATE_WINDOW_SECONDS = 600
+GUESTBOOK_BLOCKLIST = {
+    word.strip().casefold()
+    for word in os.getenv("GUESTBOOK_BLOCKLIST", "viagra,casino,bitcoin,forex,porn,xxx").split(",")
+    if word.strip()
+}
+# Only these peers may tell us the client address through X-Forwarded-For
+TRUSTED_PROXIES = [
+    ipaddress.ip_network(proxy.strip(), strict=False)
+    for proxy in os.getenv("TRUSTED_PROXIES", "").split(",")
+    if proxy.strip()
+]
+LINK_PATTERN = re.compile(r"(https?://|www\.)\S+", re.IGNORECASE)
+
+def check_link_density(message: dict, client_ip: Optional[str]) -> Optional[str]:
+    text = message.get("message", "")
+    links = len(LINK_PATTERN.findall(text))
+    words = max(len(text.split()), 1)
+    if links > GUESTBOOK_MAX_LINKS or (links and links / words > GUESTBOOK_MAX_LINK_RATIO):
+        return "too_many_links"
+    return None
+
+def check_blocklist(message: dict, client_ip: Optional[str]) -> Optional[str]:
+    tokens = set(search_tokens(f"{message.get('name', '')} {message.get('message', '')}"))
+    if tokens & GUESTBOOK_BLOCKLIST:
+        return "blocked_term"
+    return None
+
+class RecentWindow:
+    """Bounded map of key -> timestamps inside a sliding window"""
+    
+    def __init__(self, window_seconds: int, max_keys: int = 50000):
+        self.window = window_seconds
+        self.max_keys = max_keys
+        self.entries = OrderedDict()
+    
+    def hit(self, key, value=None) -> list:
+        """Record a hit and return the (timestamp, value) pairs still in the window"""
+        now = time.monotonic()
+        hits = [(ts, v) for ts, v in self.entries.pop(key, []) if now - ts < self.window]
+        hits.append((now, value))
+        self.entries[key] = hits
+        while len(self.entries) > self.max_keys:
+            self.entries.popitem(last=False)
+        return hits
+
+recent_message_hashes = RecentWindow(GUESTBOOK_DUPLICATE_WINDOW_SECONDS)
+recent_posts_by_ip = RecentWindow(GUESTBOOK_IP_RATE_WINDOW_SECONDS)
+
+def check_duplicate_text(message: dict, client_ip: Optional[str]) -> Optional[str]:
+    normalized = " ".join(search_tokens(message.get("message", "")))
+    if not normalized:
+        return None
+    digest = hashlib.blake2b(normalized.encode("utf-8"), digest_size=12).digest()
+    author = (message.get("wedding_id"), " ".join(search_tokens(message.get("name", ""))))
+    earlier = [value for _, value in recent_message_hashes.hit(digest, author)[:-1]]
+    # The same guest posting the same text twice to one wedding
+    if author in earlier:
+        return "duplicate_message"
+    # Long identical texts posted to many different weddings are spam
+    if len(normalized) >= GUESTBOOK_DUPLICATE_MIN_LENGTH and \
+            len({wedding_id for wedding_id, _ in earlier}) >= GUESTBOOK_DUPLICATE_MAX_WEDDINGS:
+        return "duplicate_message"
+    return None
+
+def check_ip_rate(message: dict, client_ip: Optional[str]) -> Optional[str]:
+    if client_ip and len(recent_posts_by_ip.hit(client_ip)) > GUESTBOOK_IP_RATE_LIMIT:
+        return "rate_limited"
+    return None
+
+# Checks run in order and stop at the first rejection reason; append to extend
+GUESTBOOK_MODERATION_CHECKS = [
+    check_link_density,
+    check_blocklist,
+    check_duplicate_text,
+    check_ip_rate,
+]
+
+def is_trusted_proxy(host: str) -> bool:
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(address in network for network in TRUSTED_PROXIES)
+
+def client_ip_of(request: Request) -> Optional[str]:
+    """The connecting peer, or behind a trusted proxy the nearest hop that isn't one.
+    
+    Clients can put anything at the left of X-Forwarded-For, so the header is only
+    read when a TRUSTED_PROXIES peer sent it, and from the right.
+    """
+    peer = request.client.host if request.client else None
+    if peer is None or not is_trusted_proxy(peer):
+        return peer
+    hops = [
+        hop.strip()
+        for header in request.headers.getlist("x-forwarded-for")
+        for hop in header.split(",")
+        if hop.strip()
+    ]
+    for hop in reversed(hops):
+        if not is_trusted_proxy(hop):
+            return hop
+    return hops[0] if hops else peer
+
+class GuestbookModerator:
+    """Moderates pending guestbook messages off the request path.
+    
+    Worker tasks run GUESTBOOK_MODERATION_CHECKS over queued messages; decisions
+    are written back with one bulk_write per batch, after which approved messages
+    are handed to on_approved (the public feed and the event stream).
+    """
+    
+    def __init__(self, workers: int, batch_size: int, flush_ms: int, on_approved: Callable[[dict], None]):
+        self.workers = workers
+        self.on_approved = on_approved
+        self.batch_size = batch_size
+        self.flush_interval = flush_ms / 1000
+        self.queue = asyncio.Queue(maxsize=10000)
+        self.decisions = []
+        self.queued = set()  # ids queued or awaiting their decision write
+        self.flush_needed = asyncio.Event()
+        self.tasks = []
+    
+    def start(self):
+        self.tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        self.tasks.append(asyncio.create_task(self._flush_periodically()))
+        self.tasks.append(asyncio.create_task(self._requeue_periodically()))
+    
+    def submit(self, message: dict, client_ip: Optional[str] = None) -> bool:
+        if message["id"] in self.queued:
+            return False
+        try:
+            self.queue.put_nowait((message, client_ip))
+        except asyncio.QueueFull:
+            # Stays pending in Mongo and is picked up again by requeue_pending()
+            logger.warning("⚠️ Moderation queue full, message left pending", extra={"message_id": message["id"]})
+            return False
+        self.queued.add(message["id"])
+        return True
+    
+    async def recover(self):
+        """Queue messages left pending by a previous run"""
+        # Messages from before moderation existed were already public
+        await db.database.guestbook.update_many(
+            {"moderation_state": {"$exists": False}}, {"$set": {"moderation_state": "approved"}}
+        )
+        await self.requeue_pending()
+    
+    async def requeue_pending(self, min_age_seconds: int = 0) -> int:
+        """Queue pending messages this worker isn't already moderating, oldest first.
+        
+        Re-polled messages are checked without their client IP, which isn't stored.
+        """
+        room = self.queue.maxsize - self.queue.qsize()
+        if room <= 0:
+            return 0
+        query = {"moderation_state": "pending"}
+        if min_age_seconds:
+            # Leave fresh messages to the worker that received them
+            query["created_at"] = {"$lt": (datetime.utcnow() - timedelta(seconds=min_age_seconds)).isoformat()}
+        requeued = 0
+        async for message in db.database.guestbook.find(query, {"_id": 0}).sort("created_at", 1).limit(
+            room + len(self.queued)
+        ):
+            if requeued >= room:
+                break
+            requeued += self.submit(message)
+        return requeued
+    
+    async def _requeue_periodically(self):
+        while True:
+            await asyncio.sleep(GUESTBOOK_MODERATION_REPOLL_SECONDS)
+            try:
+                requeued = await self.requeue_pending(GUESTBOOK_MODERATION_REPOLL_SECONDS)
+            except Exception as e:
+                logger.warning("⚠️ Failed to re-poll pending guestbook messages: %s", e)
+                continue
+            if requeued:
+                logger.info("🔁 Re-queued %d pending guestbook messages", requeued)
+    
+    def moderate(self, message: dict, client_ip: Optional[str]) -> Optional[str]:
+        for check in GUESTBOOK_MODERATION_CHECKS:
+            try:
+                reason = check(message, client_ip)
+            except Exception as e:
+                logger.warning("⚠️ Moderation check %s failed: %s", check.__name__, e)
+                continue
+            if reason:
+                return reason
+        return None
+    
+    async def _work(self):
+        while True:
+            message, client_ip = await self.queue.get()
+            reason = self.moderate(message, client_ip)
+            self.decisions.append((message, "rejected" if reason else "approved", reason))
+            if len(self.decisions) >= self.batch_size:
+                self.flush_needed.set()
+    
+    async def _flush_periodically(self):
+        while True:
+            try:
+                await asyncio.wait_for(self.flush_needed.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.flush_needed.clear()
+            await self.flush()
+    
+    async def flush(self):
+        if not self.decisions:
+            return
+        decisions, self.decisions = self.decisions, []
+        moderated_at = datetime.utcnow().isoformat()
+        operations = [
+            UpdateOne(
+                {"id": message["id"], "moderation_state": "pending"},
+                {"$set": {"moderation_state": state, "moderation_reason": reason, "moderated_at": moderated_at}}
+            )
+            for message, state, reason in decisions
+        ]
+        try:
+            await db.database.guestbook.bulk_write(operations, ordered=False)
+        except Exception as e:
+            # Left pending; the next re-poll queues them again
+            logger.warning("⚠️ Failed to publish %d moderation decisions: %s", len(operations), e)
+            return
+        finally:
+            self.queued.difference_update(message["id"] for message, _, _ in decisions)
+        
+        for message, state, reason in decisions:
+            if state != "approved":
+                continue
+            message["moderation_state"] = state
+            self.on_approved(message)
+    
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        await self.flush()
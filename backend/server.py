@@ -1,54 +1,58 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Header, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 import os
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field
-from typing import List, Optional
+from pydantic import AfterValidator, BaseModel, Field, StringConstraints, TypeAdapter, ValidationError
+from typing import Annotated, Any, Dict, List, Optional, Union
+from typing_extensions import TypedDict
 import uuid
 from datetime import datetime
 import json
-from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import DeleteOne, InsertOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
 import asyncio
+import base64
+import copy
+import csv
+import hashlib
+from collections import OrderedDict, deque
+import io
+import itertools
+import math
+import random
+import re
+import threading
+import time
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-MONGO_URL = os.getenv("MONGO_URL")
-DB_NAME = os.getenv("DB_NAME", "weddingcard")
+# Subsystem modules read their settings from the environment, so they load after .env
+from auth import GUEST_TOKEN_COOKIE, GUEST_TOKEN_MAX_AGE_SECONDS, User, active_sessions, create_simple_session, get_current_user_simple, guest_id_of, issue_guest_token  # noqa: E402
+from body_limits import KIB, BodySizeLimitMiddleware, router as body_limits_router  # noqa: E402
+import db  # noqa: E402
+from db import close_mongo_connection, connect_to_mongo, get_collections  # noqa: E402
+from images import Image, image_cache, public_wedding_view, router as images_router, wedding_images  # noqa: E402
+from logging_config import RequestIdMiddleware, configure_logging  # noqa: E402
+from metrics import MetricsMiddleware, record_cache, router as metrics_router  # noqa: E402
+import moderation  # noqa: E402
+from moderation import GUESTBOOK_MODERATION, GuestbookModerator, RecentWindow, client_ip_of  # noqa: E402
+from static_assets import StaticAssetIndex  # noqa: E402
+from text_search import search_tokens  # noqa: E402
+from uploads import UPLOAD_REFERENCE_PATTERN, maintain_uploads_periodically, router as uploads_router, upload_references  # noqa: E402
 
-# MongoDB client and database
-mongodb_client = None
-database = None
-
-async def connect_to_mongo():
-    global mongodb_client, database
-    try:
-        print(f"🔄 Attempting to connect to MongoDB: {MONGO_URL}")
-        mongodb_client = AsyncIOMotorClient(MONGO_URL)
-        database = mongodb_client[DB_NAME]
-        # Test the connection
-        await database.command("ping")
-        print(f"✅ Connected to MongoDB database: {DB_NAME}")
-        logger.info(f"✅ Connected to MongoDB database: {DB_NAME}")
-    except Exception as e:
-        print(f"❌ Error connecting to MongoDB: {e}")
-        logger.error(f"❌ Error connecting to MongoDB: {e}")
-        # Don't raise the error, just continue with JSON files
-        pass
-
-async def close_mongo_connection():
-    global mongodb_client
-    if mongodb_client:
-        mongodb_client.close()
+log_listener = configure_logging()
+logger = logging.getLogger(__name__)
 
 # JSON file for simple user storage (backup)
 USERS_FILE = ROOT_DIR / 'users.json'
 WEDDINGS_FILE = ROOT_DIR / 'weddings.json'
+# Partial wedding edits are appended here and folded into WEDDINGS_FILE periodically
+WEDDINGS_JOURNAL_FILE = ROOT_DIR / 'weddings.journal.jsonl'
+WEDDINGS_JOURNAL_MAX_ENTRIES = 500
 
 # Create the main app without a prefix
 app = FastAPI()
@@ -56,20 +60,61 @@ app = FastAPI()
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
-# MongoDB collections
-users_collection = None
-weddings_collection = None
-
-async def get_collections():
-    global users_collection, weddings_collection
-    if users_collection is None:
-        users_collection = database.users
-    if weddings_collection is None:
-        weddings_collection = database.weddings
-    return users_collection, weddings_collection
+async def ensure_indexes():
+    """Create the indexes backing the per-wedding queries.
+    
+    Each index is created on its own, so one that can't be built (say a unique index
+    over legacy duplicates) is logged without leaving the others missing.
+    """
+    if db.database is None:
+        return
+    indexes = [
+        # RSVP listing and export scan one wedding in submission order
+        (db.database.weddings, "id", {}),
+        (db.database.weddings, "shareable_id", {}),
+        (db.database.rsvps, [("wedding_id", 1), ("submitted_at", 1)], {}),
+        # Guestbook pages are keyset scans on (created_at, id), newest first;
+        # public feeds only read approved messages
+        (db.database.guestbook, "id", {}),
+        (db.database.guestbook, [("wedding_id", 1), ("moderation_state", 1), ("created_at", -1), ("id", -1)], {}),
+        (db.database.guestbook, [("wedding_id", 1), ("is_public", 1), ("created_at", -1), ("id", -1)], {}),
+        (db.database.guestbook, [("is_public", 1), ("moderation_state", 1), ("created_at", -1), ("id", -1)], {}),
+        (db.database.guestbook, [("moderation_state", 1), ("created_at", 1)], {}),
+        (db.database.guestbook_reactions, "message_id", {}),
+        (
+            db.database.guestbook,
+            [("wedding_id", 1), ("name", "text"), ("relationship", "text"), ("message", "text")],
+            {"weights": GUESTBOOK_SEARCH_WEIGHTS, "name": "guestbook_text"},
+        ),
+        # guest_name last so the uncached fallback's sort is read off the index
+        (db.database.rsvps, [("wedding_id", 1), ("search_prefixes", 1), ("guest_name", 1)], {}),
+        # Edit history: newest first per wedding, checkpoints looked up separately
+        (db.database.wedding_revisions, [("wedding_id", 1), ("revision", -1)], {}),
+        (db.database.wedding_revisions, [("wedding_id", 1), ("kind", 1), ("revision", -1)], {}),
+        # Uploads: one document per stored blob; GC scans unreferenced ones by age
+        (db.database.uploads, "sha256", {"unique": True}),
+        (db.database.uploads, [("ref_count", 1), ("created_at", 1)], {}),
+        (db.database.upload_refs, "wedding_id", {"unique": True}),
+        # One RSVP per guest per wedding; anonymous RSVPs carry no guest_key. Last, as
+        # it fails on legacy duplicates until deduplicate_rsvps() has been run
+        (
+            db.database.rsvps,
+            [("wedding_id", 1), ("guest_key", 1)],
+            {"unique": True, "partialFilterExpression": {"guest_key": {"$type": "string"}}},
+        ),
+    ]
+    failed = 0
+    for collection, keys, options in indexes:
+        try:
+            await collection.create_index(keys, **options)
+        except Exception as e:
+            failed += 1
+            logger.warning("⚠️ Failed to create MongoDB index %s on %s: %s", keys, collection.name, e)
+    if not failed:
+        logger.info("✅ MongoDB indexes ensured")
 
-# Simple session storage (in production, use Redis or similar)
-active_sessions = {}
+# Long-running asyncio tasks started at startup and cancelled at shutdown
+background_tasks = []
 
 # Models
 class UserRegister(BaseModel):
@@ -80,12 +125,6 @@ class UserLogin(BaseModel):
     username: str
     password: str
 
-class User(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    username: str
-    password: str  # Simple plain text password
-    created_at: datetime = Field(default_factory=datetime.utcnow)
-
 class RSVPResponse(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     wedding_id: str
@@ -98,46 +137,295 @@ class RSVPResponse(BaseModel):
     special_message: Optional[str] = ""
     submitted_at: datetime = Field(default_factory=datetime.utcnow)
 
+# Typed wedding sections. Items keep any extra keys the editor adds, within limits
+# Budget: a wedding must stay well under MongoDB's 16 MB document limit and fit the 8 MiB
+# request body cap. Photos belong in /api/uploads; inline data: URLs are for small images.
+WEDDING_SHORT_TEXT_MAX = 300
+WEDDING_LONG_TEXT_MAX = 5000
+WEDDING_STORY_MAX = 20000
+WEDDING_URL_MAX = 2048
+WEDDING_IMAGE_MAX = int(os.getenv("WEDDING_IMAGE_MAX_CHARS", str(256 * 1024)))  # data: URLs included
+WEDDING_LIST_MAX_ITEMS = 200
+WEDDING_GALLERY_MAX_PHOTOS = 500
+WEDDING_EXTRA_FIELD_MAX_BYTES = 64 * 1024  # serialized size of any top-level key without a schema
+MONGO_DOCUMENT_TOO_LARGE_CODES = {10334, 17419, 17420}
+
+ShortText = Annotated[str, StringConstraints(max_length=WEDDING_SHORT_TEXT_MAX)]
+LongText = Annotated[str, StringConstraints(max_length=WEDDING_LONG_TEXT_MAX)]
+UrlText = Annotated[str, StringConstraints(max_length=WEDDING_URL_MAX)]
+ImageRef = Annotated[str, StringConstraints(max_length=WEDDING_IMAGE_MAX)]
+ItemId = Union[Annotated[str, StringConstraints(max_length=64)], int]
+StoryText = Annotated[str, StringConstraints(max_length=WEDDING_STORY_MAX)]
+
+def cap_json_size(value):
+    if len(json.dumps(value, default=str)) > WEDDING_EXTRA_FIELD_MAX_BYTES:
+        raise ValueError(f"larger than {WEDDING_EXTRA_FIELD_MAX_BYTES} bytes")
+    return value
+
+# Free-form nested values in items; only these (rare) shapes pay for a Python size check
+ExtraList = Annotated[List[Any], AfterValidator(cap_json_size)]
+ExtraDict = Annotated[Dict[str, Any], AfterValidator(cap_json_size)]
+
+class WeddingItem(TypedDict, total=False, extra_items=Union[LongText, bool, int, float, None, ExtraList, ExtraDict]):
+    """Base for list items: every key optional, unknown keys allowed but bounded.
+    
+    Items are TypedDicts rather than models, so validation hands back plain dicts with
+    only the keys that were sent: nothing to instantiate or dump. Extra keys are
+    validated in pydantic-core too, so no per-item Python hooks run.
+    """
+    id: Optional[ItemId]
+
+class TimelineEvent(WeddingItem, total=False):
+    year: Optional[ShortText]
+    date: Optional[ShortText]
+    title: Optional[ShortText]
+    description: Optional[LongText]
+    image: Optional[ImageRef]
+
+class ScheduleEvent(WeddingItem, total=False):
+    time: Optional[ShortText]
+    title: Optional[ShortText]
+    description: Optional[LongText]
+    location: Optional[ShortText]
+    duration: Optional[ShortText]
+    icon: Optional[ShortText]
+    highlight: Optional[bool]
+
+class GalleryPhoto(WeddingItem, total=False):
+    src: Optional[ImageRef]
+    url: Optional[ImageRef]
+    category: Optional[ShortText]
+    title: Optional[ShortText]
+
+class PartyMember(WeddingItem, total=False):
+    name: Optional[ShortText]
+    designation: Optional[ShortText]
+    role: Optional[ShortText]
+    relationship: Optional[ShortText]
+    description: Optional[LongText]
+    photo: Optional[ImageRef]
+    image: Optional[ImageRef]
+
+class RegistryItem(WeddingItem, total=False):
+    name: Optional[ShortText]
+    store: Optional[ShortText]
+    description: Optional[LongText]
+    price: Optional[Union[ShortText, float]]
+    url: Optional[UrlText]
+    image: Optional[ImageRef]
+    purchased: Optional[bool]
+    icon: Optional[ShortText]
+    color: Optional[ShortText]
+
+class FAQQuestion(WeddingItem, total=False):
+    question: Optional[LongText]
+    answer: Optional[LongText]
+
+class FAQ(WeddingItem, total=False):
+    """A single question, or a category grouping several"""
+    question: Optional[LongText]
+    answer: Optional[LongText]
+    category: Optional[ShortText]
+    icon: Optional[ShortText]
+    questions: Optional[Annotated[List[FAQQuestion], Field(max_length=WEDDING_LIST_MAX_ITEMS)]]
+
+class HoneymoonFund(WeddingItem, total=False):
+    title: Optional[ShortText]
+    description: Optional[LongText]
+    destination: Optional[ShortText]
+    image: Optional[ImageRef]
+    goal: Optional[Union[float, ShortText]]
+
+WEDDING_ITEM_MODELS = {
+    "story_timeline": TimelineEvent,
+    "schedule_events": ScheduleEvent,
+    "gallery_photos": GalleryPhoto,
+    "bridal_party": PartyMember,
+    "groom_party": PartyMember,
+    "special_roles": PartyMember,
+    "registry_items": RegistryItem,
+    "faqs": FAQ,
+}
+
+def section_list(field: str):
+    limit = WEDDING_GALLERY_MAX_PHOTOS if field == "gallery_photos" else WEDDING_LIST_MAX_ITEMS
+    return Annotated[List[WEDDING_ITEM_MODELS[field]], Field(max_length=limit)]
+
+StoryTimeline = section_list("story_timeline")
+ScheduleEvents = section_list("schedule_events")
+GalleryPhotos = section_list("gallery_photos")
+PartyMembers = section_list("bridal_party")
+RegistryItems = section_list("registry_items")
+FAQs = section_list("faqs")
+
+# TypeAdapters compile a validator once; building them per request would redo that work
+WEDDING_SECTION_ADAPTERS = {field: TypeAdapter(section_list(field)) for field in WEDDING_ITEM_MODELS}
+WEDDING_SECTION_ADAPTERS["honeymoon_fund"] = TypeAdapter(HoneymoonFund)
+WEDDING_ITEM_ADAPTERS = {field: TypeAdapter(model) for field, model in WEDDING_ITEM_MODELS.items()}
+
+def wedding_validation_error(error: ValidationError, prefix: tuple = ()) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        detail=[
+            {"loc": [*prefix, *err["loc"]], "msg": err["msg"], "type": err["type"]}
+            for err in error.errors(include_url=False)
+        ]
+    )
+
+WEDDING_TEXT_ADAPTERS = {
+    **{field: TypeAdapter(ShortText) for field in ("couple_name_1", "couple_name_2", "wedding_date", "venue_name", "venue_location", "theme")},
+    "their_story": TypeAdapter(StoryText),
+}
+
+def list_item_id(field: str, index: int, item: dict) -> str:
+    """The id an id-less item gets: derived from its position and content, so saving the
+    same list again yields the ids it was stored with and the list doesn't look changed"""
+    content = json.dumps({k: v for k, v in item.items() if k != "id"}, sort_keys=True, default=str)
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"item:{field}:{index}:{content}"))
+
+def with_item_ids(field: str, items: list) -> list:
+    """Give list items without an id a string one, so the item endpoints can address them"""
+    for index, item in enumerate(items):
+        if isinstance(item, dict) and item.get("id") in (None, ""):
+            item["id"] = list_item_id(field, index, item)
+    return items
+
+def with_wedding_item_ids(wedding: dict) -> dict:
+    for field in WEDDING_ITEM_MODELS:
+        if isinstance(wedding.get(field), list):
+            with_item_ids(field, wedding[field])
+    return wedding
+
+def validate_wedding_field(field: str, value):
+    """Validate one top-level value: typed sections, the text fields, or a size-capped extra"""
+    if value is None:
+        return value
+    adapter = WEDDING_SECTION_ADAPTERS.get(field) or WEDDING_TEXT_ADAPTERS.get(field)
+    if adapter is not None:
+        try:
+            value = adapter.validate_python(value)
+        except ValidationError as e:
+            raise wedding_validation_error(e, (field,))
+        return with_item_ids(field, value) if field in WEDDING_ITEM_MODELS else value
+    # rsvp_responses is legacy data the editor only echoes back; the body limit bounds it
+    if field != "rsvp_responses" and len(json.dumps(value, default=str)) > WEDDING_EXTRA_FIELD_MAX_BYTES:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Field '{field}' is larger than {WEDDING_EXTRA_FIELD_MAX_BYTES} bytes"
+        )
+    return value
+
+def validate_wedding_sections(fields: dict) -> dict:
+    """Validate and normalise every top-level field in a wedding write"""
+    return {field: validate_wedding_field(field, value) for field, value in fields.items()}
+
+def validate_wedding_item(field: str, item: dict) -> dict:
+    """Validate one list item (or a partial set of its fields) for the item endpoints"""
+    adapter = WEDDING_ITEM_ADAPTERS[field]
+    try:
+        return adapter.validate_python(item)
+    except ValidationError as e:
+        raise wedding_validation_error(e, (field,))
+
+def _nest_path(parts: list, value):
+    """{"a": [{"b": value}]} for ["a", "0", "b"]: a stand-in document the models can check"""
+    for part in reversed(parts):
+        value = [value] if part.isdigit() or part == "$" else {part: value}
+    return value
+
+def _unnest_path(value, parts: list):
+    for part in parts:
+        value = value[0] if part.isdigit() or part == "$" else value[part]
+    return value
+
+def validate_wedding_path(path: str, value):
+    """Validate a value $set at a dotted path by checking it in place within its item or section"""
+    parts = path.split(".")
+    field, rest = parts[0], parts[1:]
+    if not rest:
+        return validate_wedding_field(field, value)
+    if field in WEDDING_ITEM_MODELS:
+        index, inner = rest[0], rest[1:]
+        if not (index.isdigit() or index == "$"):
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"'{path}' must address an item of {field} by position"
+            )
+        if not inner:
+            return validate_wedding_item(field, value)
+        return _unnest_path(validate_wedding_item(field, _nest_path(inner, value)), inner)
+    if field in WEDDING_SECTION_ADAPTERS or field in WEDDING_TEXT_ADAPTERS:
+        return _unnest_path(validate_wedding_field(field, _nest_path(rest, value)), rest)
+    validate_wedding_field(field, _nest_path(rest, value))
+    return value
+
+def validate_wedding_update(update: dict) -> dict:
+    """Validate every value inside a Mongo update: whole fields, nested paths and pushes"""
+    validated = dict(update)
+    if "$set" in update:
+        validated["$set"] = {path: validate_wedding_path(path, value) for path, value in update["$set"].items()}
+    if "$push" in update:
+        pushes = {}
+        for path, value in update["$push"].items():
+            items = value["$each"] if isinstance(value, dict) and "$each" in value else [value]
+            if path in WEDDING_ITEM_MODELS:
+                items = [validate_wedding_item(path, item) for item in items]
+            else:
+                items = [validate_wedding_path(f"{path}.0", item) for item in items]
+            pushes[path] = {**value, "$each": items} if isinstance(value, dict) and "$each" in value else items[0]
+        validated["$push"] = pushes
+    return validated
+
+def document_too_large(error: OperationFailure) -> Optional[HTTPException]:
+    """A 413 for writes MongoDB refused because the wedding would outgrow 16 MB"""
+    if error.code in MONGO_DOCUMENT_TOO_LARGE_CODES:
+        return HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail="This change would make the wedding too large; upload photos instead of embedding them"
+        )
+    return None
+
 class WeddingData(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     user_id: str
-    couple_name_1: str
-    couple_name_2: str
-    wedding_date: str
-    venue_name: str
-    venue_location: str
-    their_story: str
-    story_timeline: List[dict] = []
-    schedule_events: List[dict] = []
-    gallery_photos: List[dict] = []
-    bridal_party: List[dict] = []
-    groom_party: List[dict] = []
-    special_roles: List[dict] = []  # Added special roles field
-    registry_items: List[dict] = []
-    honeymoon_fund: dict = {}
-    faqs: List[dict] = []
-    theme: str = "classic"
+    couple_name_1: ShortText
+    couple_name_2: ShortText
+    wedding_date: ShortText
+    venue_name: ShortText
+    venue_location: ShortText
+    their_story: StoryText
+    story_timeline: StoryTimeline = []
+    schedule_events: ScheduleEvents = []
+    gallery_photos: GalleryPhotos = []
+    bridal_party: PartyMembers = []
+    groom_party: PartyMembers = []
+    special_roles: PartyMembers = []  # Added special roles field
+    registry_items: RegistryItems = []
+    honeymoon_fund: HoneymoonFund = Field(default_factory=HoneymoonFund)
+    faqs: FAQs = []
+    theme: ShortText = "classic"
     rsvp_responses: List[dict] = []  # Store RSVP responses
+    version: int = 1  # Bumped on every write; drives ETag / If-Match
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
 class WeddingDataCreate(BaseModel):
-    couple_name_1: str
-    couple_name_2: str
-    wedding_date: str
-    venue_name: str
-    venue_location: str
-    their_story: str
-    story_timeline: List[dict] = []
-    schedule_events: List[dict] = []
-    gallery_photos: List[dict] = []
-    bridal_party: List[dict] = []
-    groom_party: List[dict] = []
-    special_roles: List[dict] = []  # Added special roles field
-    registry_items: List[dict] = []
-    honeymoon_fund: dict = {}
-    faqs: List[dict] = []
-    theme: str = "classic"
+    couple_name_1: ShortText
+    couple_name_2: ShortText
+    wedding_date: ShortText
+    venue_name: ShortText
+    venue_location: ShortText
+    their_story: StoryText
+    story_timeline: StoryTimeline = []
+    schedule_events: ScheduleEvents = []
+    gallery_photos: GalleryPhotos = []
+    bridal_party: PartyMembers = []
+    groom_party: PartyMembers = []
+    special_roles: PartyMembers = []  # Added special roles field
+    registry_items: RegistryItems = []
+    honeymoon_fund: HoneymoonFund = Field(default_factory=HoneymoonFund)
+    faqs: FAQs = []
+    theme: ShortText = "classic"
 
 class AuthResponse(BaseModel):
     session_id: str
@@ -159,71 +447,315 @@ def save_json_file(filename, data):
     with open(filename, 'w') as f:
         json.dump(data, f, indent=2, default=str)
 
-# MongoDB-based authentication helper functions
-async def create_simple_session(user_id: str) -> str:
-    session_id = str(uuid.uuid4())
-    session_data = {
-        "session_id": session_id,
-        "user_id": user_id,
-        "created_at": datetime.utcnow()
-    }
+def _path_parent(document, parts: List[str], create: bool = True):
+    """Walk a dotted path to the container holding its last segment"""
+    node = document
+    for part in parts[:-1]:
+        if isinstance(node, list):
+            node = node[int(part)]
+        else:
+            if part not in node and create:
+                node[part] = {}
+            node = node.get(part)
+        if node is None:
+            return None
+    return node
+
+def _matches_condition(value, condition) -> bool:
+    """Equality, or membership for the {"$in": [...]} form item id matches use"""
+    if isinstance(condition, dict) and "$in" in condition:
+        return value in condition["$in"]
+    return value == condition
+
+def _resolve_positional(document: dict, parts: list, match: Optional[dict]) -> Optional[list]:
+    """Swap a positional "$" path segment for the index of the item named in match"""
+    if "$" not in parts:
+        return parts
+    position = parts.index("$")
+    array_path = ".".join(parts[:position])
+    item_id = (match or {}).get(f"{array_path}.id")
+    items = _path_parent(document, parts[:position] + ["$"], create=False)
+    for index, item in enumerate(items if isinstance(items, list) else []):
+        if isinstance(item, dict) and _matches_condition(item.get("id"), item_id):
+            return parts[:position] + [str(index)] + parts[position + 1:]
+    return None
+
+def apply_update_to_document(document: dict, update: dict, match: Optional[dict] = None) -> dict:
+    """Apply the $set/$unset/$inc/$push/$pull subset of a Mongo update to a plain dict.
     
-    # Store in memory for fast access
-    active_sessions[session_id] = session_data
+    match is the query's "<list>.id" equality, used to resolve positional "$" paths.
+    """
+    for path, value in update.get("$set", {}).items():
+        parts = _resolve_positional(document, path.split("."), match)
+        if parts is None:
+            continue
+        parent = _path_parent(document, parts)
+        if isinstance(parent, list):
+            parent[int(parts[-1])] = value
+        else:
+            parent[parts[-1]] = value
+    for path in update.get("$unset", {}):
+        parts = path.split(".")
+        parent = _path_parent(document, parts, create=False)
+        if isinstance(parent, dict):
+            parent.pop(parts[-1], None)
+        elif isinstance(parent, list) and int(parts[-1]) < len(parent):
+            parent[int(parts[-1])] = None
+    for path, amount in update.get("$inc", {}).items():
+        parts = path.split(".")
+        parent = _path_parent(document, parts)
+        parent[parts[-1]] = (parent.get(parts[-1]) or 0) + amount
+    for path, value in update.get("$push", {}).items():
+        parts = path.split(".")
+        parent = _path_parent(document, parts)
+        target = parent.setdefault(parts[-1], []) if isinstance(parent, dict) else parent[int(parts[-1])]
+        items = value["$each"] if isinstance(value, dict) and "$each" in value else [value]
+        position = value.get("$position", len(target)) if isinstance(value, dict) else len(target)
+        target[position:position] = items
+    for path, condition in update.get("$pull", {}).items():
+        parts = path.split(".")
+        parent = _path_parent(document, parts, create=False)
+        target = parent.get(parts[-1]) if isinstance(parent, dict) else None
+        if isinstance(target, list):
+            target[:] = [
+                item for item in target
+                if not (isinstance(item, dict) and isinstance(condition, dict)
+                        and all(_matches_condition(item.get(k), v) for k, v in condition.items()))
+                and item != condition
+            ]
+    return document
+
+# Wedding JSON backup: a snapshot file plus a journal of partial updates. Compaction
+# renames the journal aside and folds it into the snapshot in a worker thread, so the
+# event loop only ever appends; the lock covers the rename and the snapshot swap.
+weddings_journal_entries = None
+weddings_backup_lock = threading.Lock()
+weddings_compaction = None  # future of the compaction in progress, if any
+
+def compacting_journal_file() -> Path:
+    return WEDDINGS_JOURNAL_FILE.with_name(WEDDINGS_JOURNAL_FILE.name + ".compacting")
+
+def replay_wedding_journal(weddings: dict, lines: List[str], source: str):
+    """Apply journal lines to the weddings they name.
     
-    # Also store in MongoDB for persistence across server restarts
-    users_coll, weddings_coll = await get_collections()
-    if users_coll is not None:
+    Entries for weddings missing from the snapshot are skipped rather than replayed onto
+    an empty document, which would have no user_id or shareable_id to serve it by.
+    """
+    unknown = set()
+    for number, line in enumerate(lines, 1):
         try:
-            sessions_collection = database.sessions
-            await sessions_collection.insert_one(session_data)
-            print(f"✅ Session {session_id} stored in MongoDB")
-        except Exception as e:
-            print(f"⚠️ Failed to store session in MongoDB: {e}")
+            entry = json.loads(line)
+        except json.JSONDecodeError:
+            if number < len(lines):
+                logger.warning("⚠️ Skipping unreadable line %d of %s", number, source)
+            continue  # a torn final line from a crash is expected
+        if "document" in entry:
+            weddings[entry["wedding_id"]] = entry["document"]
+            continue
+        wedding = weddings.get(entry.get("wedding_id"))
+        if wedding is None:
+            unknown.add(entry.get("wedding_id"))
+            continue
+        try:
+            apply_update_to_document(wedding, entry["update"], entry.get("match"))
+        except (KeyError, IndexError, TypeError, ValueError, AttributeError) as e:
+            logger.warning(
+                "⚠️ Could not replay line %d of %s: %r", number, source, e,
+                extra={"wedding_id": entry.get("wedding_id")}
+            )
+    if unknown:
+        logger.warning("⚠️ Skipped %s entries for %d weddings not in the snapshot", source, len(unknown))
+
+def _read_lines(path: Path) -> List[str]:
+    if not path.exists():
+        return []
+    with open(path, 'r') as f:
+        return f.readlines()
+
+def load_wedding_backup() -> dict:
+    """The snapshot with any journal being compacted, then the live journal, replayed over it"""
+    with weddings_backup_lock:
+        weddings = load_json_file(WEDDINGS_FILE)
+        compacting = _read_lines(compacting_journal_file())
+        journal = _read_lines(WEDDINGS_JOURNAL_FILE)
+    replay_wedding_journal(weddings, compacting, "the compacting wedding journal")
+    replay_wedding_journal(weddings, journal, "the wedding journal")
+    return weddings
+
+def compact_wedding_backup():
+    """Fold the renamed-aside journal into a new snapshot; blocking, so run it in a thread"""
+    compacting = compacting_journal_file()
+    weddings = load_json_file(WEDDINGS_FILE)
+    replay_wedding_journal(weddings, _read_lines(compacting), "the compacting wedding journal")
+    temp_path = WEDDINGS_FILE.with_name(WEDDINGS_FILE.name + ".tmp")
+    save_json_file(temp_path, weddings)
+    with weddings_backup_lock:
+        os.replace(temp_path, WEDDINGS_FILE)
+        compacting.unlink(missing_ok=True)
+
+def _compaction_done(future):
+    if not future.cancelled() and future.exception() is not None:
+        logger.warning("⚠️ Wedding backup compaction failed: %s", future.exception())
+
+def start_wedding_backup_compaction():
+    """Set the journal aside and compact it off the event loop (inline if there's no loop)"""
+    global weddings_compaction, weddings_journal_entries
+    if weddings_compaction is not None and not weddings_compaction.done():
+        return  # appends carry on; the next one past the limit tries again
+    with weddings_backup_lock:
+        # A compacting file left by a crash is folded in first; the live journal waits its turn
+        if not compacting_journal_file().exists() and WEDDINGS_JOURNAL_FILE.exists():
+            os.replace(WEDDINGS_JOURNAL_FILE, compacting_journal_file())
+            weddings_journal_entries = 0
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        compact_wedding_backup()
+        return
+    weddings_compaction = loop.run_in_executor(None, compact_wedding_backup)
+    weddings_compaction.add_done_callback(_compaction_done)
+
+def _append_wedding_journal(entry: dict):
+    global weddings_journal_entries
+    if weddings_journal_entries is None:
+        weddings_journal_entries = len(_read_lines(WEDDINGS_JOURNAL_FILE))
+    with open(WEDDINGS_JOURNAL_FILE, 'a') as f:
+        f.write(json.dumps(entry, default=str) + "\n")
+    weddings_journal_entries += 1
     
-    return session_id
+    if weddings_journal_entries >= WEDDINGS_JOURNAL_MAX_ENTRIES:
+        start_wedding_backup_compaction()
 
-async def get_current_user_simple(session_id: str = None):
-    if not session_id:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Session ID required"
-        )
+def journal_wedding_created(wedding: dict):
+    """Record a whole new wedding in the backup"""
+    _append_wedding_journal({"wedding_id": wedding["id"], "document": wedding})
+
+def journal_wedding_update(wedding_id: str, update: dict, match: Optional[dict] = None):
+    """Record a partial update in the backup without rewriting every wedding"""
+    entry = {"wedding_id": wedding_id, "update": {op: update[op] for op in ("$set", "$unset", "$inc", "$push", "$pull") if op in update}}
+    if match:
+        entry["match"] = match
+    _append_wedding_journal(entry)
+
+# Known wedding ids (lets public write endpoints reject junk wedding_ids in memory)
+WEDDING_ID_INDEX = os.getenv("WEDDING_ID_INDEX", "set")  # "set", or "bloom" for large deployments
+WEDDING_ID_REFRESH_SECONDS = int(os.getenv("WEDDING_ID_REFRESH_SECONDS", "60"))
+WEDDING_ID_MISS_TTL_SECONDS = 300
+WEDDING_ID_MAX_LENGTH = 64
+RESERVED_WEDDING_IDS = {"public", "default"}  # landing page and demo card
+
+class BloomFilter:
+    """Fixed-size Bloom filter: never a false negative, ~error_rate false positives"""
     
-    # First check in-memory sessions
-    session = active_sessions.get(session_id)
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        capacity = max(capacity, 1)
+        self.size = max(64, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
     
-    # If not in memory, check MongoDB
-    if not session:
-        try:
-            users_coll, weddings_coll = await get_collections()
-            if users_coll is not None:
-                sessions_collection = database.sessions
-                session_data = await sessions_collection.find_one({"session_id": session_id})
-                if session_data:
-                    # Restore to memory cache
-                    active_sessions[session_id] = session_data
-                    session = session_data
-                    print(f"✅ Session {session_id} restored from MongoDB")
-        except Exception as e:
-            print(f"⚠️ Failed to restore session from MongoDB: {e}")
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
     
-    if not session:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid session"
-        )
+    def add(self, item: str):
+        for pos in self._positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
     
-    users_coll, weddings_coll = await get_collections()
-    user_data = await users_coll.find_one({"id": session["user_id"]})
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+class WeddingIdRegistry:
+    """In-memory index of wedding ids and shareable ids, refreshed from MongoDB"""
     
-    if not user_data:
+    def __init__(self, kind: str = "set"):
+        self.kind = kind
+        self.ids = set()
+        self.loaded = False
+        self.recent_misses = {}  # wedding_id -> monotonic expiry
+    
+    def _new_index(self, expected: int):
+        if self.kind == "bloom":
+            # Leave headroom for weddings created between refreshes
+            return BloomFilter(capacity=expected * 2 + 1024)
+        return set()
+    
+    def _build_index(self, known: list):
+        index = self._new_index(len(known))
+        for wedding_id in known:
+            if wedding_id:
+                index.add(wedding_id)
+        return index
+    
+    def add(self, *wedding_ids):
+        for wedding_id in wedding_ids:
+            if wedding_id:
+                self.ids.add(wedding_id)
+                self.recent_misses.pop(wedding_id, None)
+    
+    async def refresh(self):
+        users_coll, weddings_coll = await get_collections()
+        known = []
+        async for wedding in weddings_coll.find({}, {"_id": 0, "id": 1, "shareable_id": 1}):
+            known.append(wedding.get("id"))
+            known.append(wedding.get("shareable_id"))
+        # Weddings only present in the JSON backup are still served publicly. Reading and
+        # replaying it, and hashing every id into a new index, is blocking work: keep it
+        # off the event loop
+        for wedding_id, wedding in (await asyncio.to_thread(load_wedding_backup)).items():
+            known.append(wedding_id)
+            known.append(wedding.get("shareable_id"))
+        
+        self.ids = await asyncio.to_thread(self._build_index, known)
+        self.recent_misses.clear()
+        self.loaded = True
+    
+    async def exists(self, wedding_id: Optional[str]) -> bool:
+        if wedding_id in RESERVED_WEDDING_IDS:
+            return True
+        if not wedding_id or len(wedding_id) > WEDDING_ID_MAX_LENGTH:
+            return False
+        # Fail open until the first refresh so a Mongo outage doesn't drop real guests
+        if not self.loaded or wedding_id in self.ids:
+            record_cache("wedding_ids", True)
+            return True
+        
+        now = time.monotonic()
+        if self.recent_misses.get(wedding_id, 0) > now:
+            record_cache("wedding_ids", True)
+            return False
+        record_cache("wedding_ids", False)
+        
+        # Another worker may have created this wedding since our last refresh
+        users_coll, weddings_coll = await get_collections()
+        found = await weddings_coll.find_one(
+            {"$or": [{"id": wedding_id}, {"shareable_id": wedding_id}]}, {"_id": 1}
+        )
+        if found:
+            self.add(wedding_id)
+            return True
+        if len(self.recent_misses) >= 10000:
+            self.recent_misses.clear()
+        self.recent_misses[wedding_id] = now + WEDDING_ID_MISS_TTL_SECONDS
+        return False
+
+wedding_registry = WeddingIdRegistry(WEDDING_ID_INDEX)
+
+async def require_known_wedding(wedding_id: Optional[str]):
+    if not await wedding_registry.exists(wedding_id):
         raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User not found"
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Wedding not found"
         )
-    
-    return User(**user_data)
+
+async def refresh_wedding_registry_periodically():
+    while True:
+        try:
+            await wedding_registry.refresh()
+        except Exception as e:
+            logger.warning("⚠️ Failed to refresh wedding id registry: %s", e)
+        await asyncio.sleep(WEDDING_ID_REFRESH_SECONDS)
 
 # Auth Routes - MongoDB-based
 @api_router.post("/auth/register", response_model=AuthResponse)
@@ -245,7 +777,7 @@ async def register(user_data: UserRegister):
     )
     
     # Save to MongoDB
-    user_dict = user.dict()
+    user_dict = user.model_dump()
     await users_coll.insert_one(user_dict)
     
     # Also save to JSON as backup
@@ -293,17 +825,17 @@ async def register(user_data: UserRegister):
     )
     
     # Save wedding data to MongoDB
-    wedding_dict = default_wedding_data.dict()
+    wedding_dict = with_wedding_item_ids(default_wedding_data.model_dump())
     wedding_dict["shareable_id"] = shareable_id  # Add shareable ID
     wedding_dict["created_at"] = wedding_dict["created_at"].isoformat()
     wedding_dict["updated_at"] = wedding_dict["updated_at"].isoformat()
     
     await weddings_coll.insert_one(wedding_dict)
+    wedding_registry.add(default_wedding_data.id, shareable_id)
+    await record_wedding_checkpoint({k: v for k, v in wedding_dict.items() if k != "_id"})
     
     # Also save to JSON as backup
-    weddings = load_json_file(WEDDINGS_FILE)
-    weddings[default_wedding_data.id] = wedding_dict
-    save_json_file(WEDDINGS_FILE, weddings)
+    journal_wedding_created(wedding_dict)
     
     # Create simple session
     session_id = await create_simple_session(user.id)
@@ -368,13 +900,16 @@ async def create_wedding_data(request_data: dict):
     # Generate shareable link ID automatically (shorter and user-friendly)
     shareable_id = str(uuid.uuid4())[:8]  # Short 8-character ID
     
-    wedding = WeddingData(
-        user_id=current_user.id,
-        **wedding_create_data
-    )
+    try:
+        wedding = WeddingData(
+            user_id=current_user.id,
+            **wedding_create_data
+        )
+    except ValidationError as e:
+        raise wedding_validation_error(e)
     
     # Convert to dict and handle ObjectId
-    wedding_dict = wedding.dict()
+    wedding_dict = with_wedding_item_ids(wedding.model_dump())
     wedding_dict["shareable_id"] = shareable_id  # Add shareable ID
     wedding_dict["created_at"] = wedding_dict["created_at"].isoformat()
     wedding_dict["updated_at"] = wedding_dict["updated_at"].isoformat()
@@ -382,18 +917,253 @@ async def create_wedding_data(request_data: dict):
     # Save to MongoDB
     result = await weddings_coll.insert_one(wedding_dict)
     wedding_dict["_id"] = str(result.inserted_id)
+    wedding_registry.add(wedding.id, shareable_id)
+    await record_wedding_checkpoint({k: v for k, v in wedding_dict.items() if k != "_id"})
     
     # Also save to JSON as backup
-    weddings = load_json_file(WEDDINGS_FILE)
-    weddings[wedding.id] = wedding_dict
-    save_json_file(WEDDINGS_FILE, weddings)
+    journal_wedding_created(wedding_dict)
     
     # Remove _id from response
     response_data = {k: v for k, v in wedding_dict.items() if k != "_id"}
     return response_data
 
+# Optimistic concurrency: every wedding write bumps "version"; clients send it back in If-Match
+def parse_if_match(if_match: Optional[str]) -> Optional[int]:
+    """Expected version from an If-Match header, or None for an unconditional write"""
+    if not if_match or if_match.strip() == "*":
+        return None
+    tag = if_match.split(",")[0].strip()
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    # "<version>.<placeholders_version>": placeholders are derived, so only the version counts here
+    tag = tag.strip('"').split(".")[0]
+    if not tag.isdigit():
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail="If-Match must be a wedding version ETag"
+        )
+    return int(tag)
+
+def wedding_version_query(user_id: str, expected_version: Optional[int]) -> dict:
+    query = {"user_id": user_id}
+    if expected_version is not None:
+        # Weddings created before versioning count as version 0
+        query["version"] = expected_version if expected_version else {"$in": [0, None]}
+    return query
+
+def wedding_etag(wedding: dict) -> str:
+    """The version, plus a counter of placeholder writes, which change the body but not the version"""
+    if wedding.get("placeholders_version"):
+        return f'"{wedding.get("version") or 0}.{wedding["placeholders_version"]}"'
+    return f'"{wedding.get("version") or 0}"'
+
+async def raise_wedding_write_failure(
+    weddings_coll,
+    user_id: str,
+    expected_version: Optional[int],
+    match_failure: Optional[HTTPException] = None,
+):
+    """A conditional write matched nothing: work out whether the wedding, its version or the match was at fault"""
+    if match_failure is not None and await weddings_coll.count_documents(wedding_version_query(user_id, expected_version), limit=1):
+        raise match_failure
+    if expected_version is not None and await weddings_coll.count_documents({"user_id": user_id}, limit=1):
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail="Wedding was modified by someone else. Reload and try again."
+        )
+    raise HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail="Wedding data not found"
+    )
+
+# Edit history: every write stores its delta; periodic checkpoints bound the replay on restore
+WEDDING_CHECKPOINT_INTERVAL = int(os.getenv("WEDDING_CHECKPOINT_INTERVAL", "25"))
+WEDDING_REVISIONS_PAGE_SIZE = 50
+wedding_checkpoint_versions = {}  # wedding_id -> revision of its latest checkpoint
+wedding_checkpoints_due = set()  # weddings whose history has a gap a checkpoint must close
+
+def encode_revision_changes(update: dict) -> list:
+    """Flatten a Mongo update into storable records (stored documents can't have "$" keys)"""
+    changes = []
+    for operator, fields in update.items():
+        for path, value in fields.items():
+            if operator == "$inc" and path == "version":
+                continue  # the revision number is the version
+            change = {"op": operator, "path": path, "value": value}
+            if operator == "$push" and isinstance(value, dict) and "$each" in value:
+                change["value"] = value["$each"]
+                if "$position" in value:
+                    change["position"] = value["$position"]
+            changes.append(change)
+    return changes
+
+def decode_revision_changes(changes: list) -> dict:
+    update = {}
+    for change in changes:
+        value = change["value"]
+        if change["op"] == "$push":
+            value = {"$each": value}
+            if "position" in change:
+                value["$position"] = change["position"]
+        update.setdefault(change["op"], {})[change["path"]] = value
+    return update
+
+async def record_wedding_checkpoint(wedding: dict):
+    """Store a full copy of the wedding at its current version.
+    
+    The wedding write has already committed by now, so a failure is logged, not raised,
+    and the wedding's next write tries the checkpoint again.
+    """
+    if db.database is None:
+        return
+    upload_references.mark(wedding["id"])
+    image_placeholders.mark(wedding["id"])
+    wedding_images.mark(wedding["id"])
+    try:
+        await db.database.wedding_revisions.insert_one({
+            "wedding_id": wedding["id"],
+            "revision": wedding.get("version") or 0,
+            "kind": "checkpoint",
+            "document": wedding,
+            "created_at": datetime.utcnow().isoformat(),
+        })
+    except Exception as e:
+        wedding_checkpoints_due.add(wedding["id"])
+        logger.warning("⚠️ Failed to record wedding checkpoint: %s", e, extra={"wedding_id": wedding["id"]})
+        return
+    wedding_checkpoint_versions[wedding["id"]] = wedding.get("version") or 0
+    wedding_checkpoints_due.discard(wedding["id"])
+
+async def record_wedding_revision(wedding_id: str, revision: int, update: dict, match: Optional[dict] = None):
+    """Store the delta a write produced, and a checkpoint when the last one is too far back.
+    
+    Like checkpoints, a failure here is logged rather than turning a saved edit into a
+    500. The missing delta leaves a gap in the history, so the next write checkpoints.
+    """
+    if db.database is None:
+        return
+    # Every wedding write passes through here, so it is also where derived image data is refreshed
+    upload_references.mark(wedding_id)
+    image_placeholders.mark(wedding_id)
+    wedding_images.mark(wedding_id)
+    try:
+        await _record_wedding_delta(wedding_id, revision, update, match)
+    except Exception as e:
+        wedding_checkpoints_due.add(wedding_id)
+        logger.warning("⚠️ Failed to record wedding revision %d: %s", revision, e, extra={"wedding_id": wedding_id})
+
+async def _record_wedding_delta(wedding_id: str, revision: int, update: dict, match: Optional[dict]):
+    fields = sorted({change["path"].split(".")[0] for change in encode_revision_changes(update)} - {"updated_at"})
+    entry = {
+        "wedding_id": wedding_id,
+        "revision": revision,
+        "kind": "delta",
+        "changes": encode_revision_changes(update),
+        "fields": fields,
+        "created_at": datetime.utcnow().isoformat(),
+    }
+    # Only item id matches matter on replay: they pick the item a positional "$" refers to
+    item_matches = [
+        [key, value["$in"][0] if isinstance(value, dict) and "$in" in value else value]
+        for key, value in (match or {}).items()
+        if isinstance(value, str) or (isinstance(value, dict) and "$in" in value)
+    ]
+    if item_matches:
+        entry["match"] = item_matches
+    await db.database.wedding_revisions.insert_one(entry)
+    
+    last_checkpoint = wedding_checkpoint_versions.get(wedding_id)
+    if last_checkpoint is None:
+        latest = await db.database.wedding_revisions.find_one(
+            {"wedding_id": wedding_id, "kind": "checkpoint"}, {"revision": 1}, sort=[("revision", -1)]
+        )
+        last_checkpoint = wedding_checkpoint_versions[wedding_id] = latest["revision"] if latest else None
+    if wedding_id in wedding_checkpoints_due or last_checkpoint is None or revision - last_checkpoint >= WEDDING_CHECKPOINT_INTERVAL:
+        # Snapshot whatever version is current now; later deltas replay on top of it
+        wedding = await db.database.weddings.find_one({"id": wedding_id}, {"_id": 0})
+        if wedding:
+            await record_wedding_checkpoint(wedding)
+
+async def wedding_state_at(wedding_id: str, revision: int) -> dict:
+    """Rebuild the wedding as of a revision from the nearest checkpoint plus its deltas"""
+    checkpoint = await db.database.wedding_revisions.find_one(
+        {"wedding_id": wedding_id, "kind": "checkpoint", "revision": {"$lte": revision}},
+        sort=[("revision", -1)]
+    )
+    if not checkpoint:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Revision {revision} is older than the recorded history"
+        )
+    deltas = await db.database.wedding_revisions.find(
+        {"wedding_id": wedding_id, "kind": "delta", "revision": {"$gt": checkpoint["revision"], "$lte": revision}}
+    ).sort("revision", 1).to_list(length=None)
+    if len(deltas) != revision - checkpoint["revision"]:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Edit history up to revision {revision} is incomplete"
+        )
+    
+    state = checkpoint["document"]
+    for delta in deltas:
+        match = {key: item_id_condition(value) for key, value in delta.get("match", [])}
+        apply_update_to_document(state, decode_revision_changes(delta["changes"]), match)
+    return state
+
+async def update_wedding_section(
+    user_id: str,
+    update: dict,
+    expected_version: Optional[int] = None,
+    projection: Optional[dict] = None,
+    match: Optional[dict] = None,
+    match_failure: Optional[HTTPException] = None,
+    session=None,
+    minimize: bool = False,
+) -> dict:
+    """Apply a Mongo update to the user's wedding in one round trip and return the result.
+    
+    Stamps updated_at, bumps the version, journals the change into the JSON backup and
+    edit history, and raises 404 (or 412 when If-Match was stale) if nothing matched.
+    match narrows the query further (e.g. to a list item); match_failure is raised when
+    only it failed. Inside a transaction (session given) the caller journals once it
+    commits. minimize reads the document as it was so that only the $set fields whose
+    value actually changed are journaled; it needs the full projection.
+    """
+    users_coll, weddings_coll = await get_collections()
+    update = {**update, "$set": {**update.get("$set", {}), "updated_at": datetime.utcnow().isoformat()}}
+    update["$inc"] = {**update.get("$inc", {}), "version": 1}
+    
+    try:
+        result = await weddings_coll.find_one_and_update(
+            {**wedding_version_query(user_id, expected_version), **(match or {})},
+            update,
+            return_document=ReturnDocument.BEFORE if minimize else ReturnDocument.AFTER,
+            projection={"_id": 0} if minimize else projection or {"_id": 0},
+            session=session
+        )
+    except OperationFailure as e:
+        raise document_too_large(e) or e
+    if not result:
+        await raise_wedding_write_failure(weddings_coll, user_id, expected_version, match_failure)
+    
+    updated_wedding = result
+    if minimize:
+        before = result
+        updated_wedding = apply_update_to_document(copy.deepcopy(before), update, match)
+        update = {**update, "$set": {k: v for k, v in update["$set"].items() if k not in before or before[k] != v}}
+    
+    # Also update JSON backup
+    if session is None:
+        journal_wedding_update(updated_wedding["id"], update, match)
+        await record_wedding_revision(updated_wedding["id"], updated_wedding["version"], update, match)
+    return updated_wedding
+
 @api_router.put("/wedding")
-async def update_wedding_data(request_data: dict):
+async def update_wedding_data(
+    request_data: dict,
+    response: Response,
+    if_match: Optional[str] = Header(None, alias="If-Match"),
+):
     session_id = request_data.get('session_id')
     if not session_id:
         raise HTTPException(
@@ -401,46 +1171,269 @@ async def update_wedding_data(request_data: dict):
             detail="Session ID required"
         )
     
+    current_user = await get_current_user_simple(session_id)
+    expected_version = parse_if_match(if_match)
+    
+    # Identity fields (id, user_id, shareable_id, created_at, version) are never
+    # taken from the client, so there's nothing to read before writing
+    updated_data = validate_wedding_sections({k: v for k, v in request_data.items() if k not in WEDDING_PROTECTED_FIELDS})
+    
+    updated_wedding = await update_wedding_section(current_user.id, {"$set": updated_data}, expected_version, minimize=True)
+    
+    response.headers["ETag"] = wedding_etag(updated_wedding)
+    return updated_wedding
+
+# Partial wedding updates (PATCH)
+WEDDING_PROTECTED_FIELDS = {"_id", "id", "user_id", "shareable_id", "created_at", "updated_at", "session_id", "version", "placeholders_version"}
+MERGE_PATCH_CONTENT_TYPE = "application/merge-patch+json"
+JSON_PATCH_CONTENT_TYPE = "application/json-patch+json"
+
+def patch_error(detail: str, status_code: int = status.HTTP_400_BAD_REQUEST):
+    return HTTPException(status_code=status_code, detail=detail)
+
+def check_patch_key(key: str, top_level: bool):
+    if not isinstance(key, str) or not key or key.startswith("$") or "." in key:
+        raise patch_error(f"Invalid field name in patch: {key!r}")
+    if top_level and key in WEDDING_PROTECTED_FIELDS:
+        raise patch_error(f"Field '{key}' cannot be modified")
+
+def strip_nulls(value):
+    if isinstance(value, dict):
+        return {k: strip_nulls(v) for k, v in value.items() if v is not None}
+    return value
+
+def merge_patch_to_update(patch: dict, nested: bool = True, prefix: str = "") -> dict:
+    """Translate an RFC 7396 merge patch into $set/$unset on dotted paths.
+    
+    With ``nested`` off, objects are set whole at the top level, which is what
+    RFC 7396 prescribes when the target value is not an object.
+    """
+    sets, unsets = {}, {}
+    for key, value in patch.items():
+        check_patch_key(key, top_level=not prefix)
+        path = f"{prefix}{key}"
+        if value is None:
+            unsets[path] = ""
+        elif isinstance(value, dict) and nested:
+            child = merge_patch_to_update(value, nested, f"{path}.")
+            sets.update(child.get("$set", {}))
+            unsets.update(child.get("$unset", {}))
+        else:
+            sets[path] = strip_nulls(value)
+    update = {}
+    if sets:
+        update["$set"] = sets
+    if unsets:
+        update["$unset"] = unsets
+    return update
+
+def json_pointer_parts(pointer) -> List[str]:
+    if not isinstance(pointer, str) or not pointer.startswith("/"):
+        raise patch_error(f"Invalid JSON pointer: {pointer!r}")
+    parts = [part.replace("~1", "/").replace("~0", "~") for part in pointer[1:].split("/")]
+    check_patch_key(parts[0], top_level=True)
+    for part in parts[1:]:
+        if part != "-":
+            check_patch_key(part, top_level=False)
+    return parts
+
+def json_equal(a, b) -> bool:
+    """JSON value equality: no array-contains matching, and true is not 1"""
+    if isinstance(a, bool) or isinstance(b, bool):
+        return type(a) is type(b) and a == b
+    if isinstance(a, (int, float)) and isinstance(b, (int, float)):
+        return a == b
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(json_equal(a[k], b[k]) for k in a)
+    if isinstance(a, list) and isinstance(b, list):
+        return len(a) == len(b) and all(json_equal(x, y) for x, y in zip(a, b))
+    return type(a) is type(b) and a == b
+
+def _json_pointer_target(document, parts: List[str], pointer: str, appending: bool = False) -> tuple:
+    """(container, key) for the last segment: a list index only where the parent is a list"""
+    node = document
+    for depth, part in enumerate(parts):
+        last = depth == len(parts) - 1
+        if isinstance(node, list):
+            if part == "-" and last and appending:
+                key = len(node)
+            elif part.isdigit() and (part == "0" or not part.startswith("0")):
+                key = int(part)
+            else:
+                raise patch_error(f"{pointer}: '{part}' is not an array index", status.HTTP_409_CONFLICT)
+            limit = len(node) + 1 if last and appending else len(node)
+            if key >= limit:
+                raise patch_error(f"{pointer}: index {key} is out of range", status.HTTP_409_CONFLICT)
+        elif isinstance(node, dict):
+            key = part
+            if not (last and appending) and key not in node:
+                raise patch_error(f"{pointer} does not exist", status.HTTP_409_CONFLICT)
+        else:
+            raise patch_error(f"{pointer}: parent is not an object or array", status.HTTP_409_CONFLICT)
+        if last:
+            return node, key
+        node = node[key]
+
+def _json_patch_add(document, parts: List[str], pointer: str, value) -> List[str]:
+    container, key = _json_pointer_target(document, parts, pointer, appending=True)
+    if isinstance(container, list):
+        container.insert(key, value)
+        return parts[:-1]  # later items shift, so the whole array is rewritten
+    container[key] = value
+    return parts
+
+def _json_patch_remove(document, parts: List[str], pointer: str) -> tuple:
+    container, key = _json_pointer_target(document, parts, pointer)
+    value = container.pop(key)
+    return value, (parts[:-1] if isinstance(container, list) else parts)
+
+def json_patch_to_update(document: dict, operations: list) -> tuple:
+    """Apply RFC 6902 operations to a copy of the document; returns (Mongo update, patched copy).
+    
+    Applying them for real is what tells an array index from a numeric object key,
+    rejects out-of-range indexes and checks 'test' with exact JSON equality. Each
+    changed path is then $set (or $unset) to its final value, so the write must be
+    made conditional on the version the document was read at.
+    """
+    patched = copy.deepcopy(document)
+    touched = []
+    for operation in operations:
+        if not isinstance(operation, dict):
+            raise patch_error("Each JSON Patch operation must be an object")
+        op, pointer = operation.get("op"), operation.get("path")
+        parts = json_pointer_parts(pointer)
+        if op in ("add", "replace", "test") and "value" not in operation:
+            raise patch_error(f"'{op}' operation on {pointer} needs a value")
+        
+        if op == "test":
+            container, key = _json_pointer_target(patched, parts, pointer)
+            if not json_equal(container[key], operation["value"]):
+                raise patch_error("JSON Patch test operation failed", status.HTTP_409_CONFLICT)
+        elif op == "add":
+            touched.append(_json_patch_add(patched, parts, pointer, copy.deepcopy(operation["value"])))
+        elif op == "replace":
+            container, key = _json_pointer_target(patched, parts, pointer)
+            container[key] = copy.deepcopy(operation["value"])
+            touched.append(parts)
+        elif op == "remove":
+            touched.append(_json_patch_remove(patched, parts, pointer)[1])
+        elif op in ("move", "copy"):
+            source = operation.get("from")
+            from_parts = json_pointer_parts(source)
+            if op == "move":
+                if parts[:len(from_parts)] == from_parts and parts != from_parts:
+                    raise patch_error(f"Cannot move {source} into its own child {pointer}")
+                value, removed = _json_patch_remove(patched, from_parts, source)
+                touched.append(removed)
+            else:
+                container, key = _json_pointer_target(patched, from_parts, source)
+                value = copy.deepcopy(container[key])
+            touched.append(_json_patch_add(patched, parts, pointer, value))
+        else:
+            raise patch_error(f"Unsupported JSON Patch operation: {op!r}")
+    
+    # Mongo rejects one update touching a path and its parent; the parent's final value covers both
+    kept = []
+    for path in sorted(touched, key=len):
+        if not any(path[:len(ancestor)] == ancestor for ancestor in kept):
+            kept.append(path)
+    
+    update = {}
+    for path in kept:
+        try:
+            container, key = _json_pointer_target(patched, path, "")
+        except HTTPException:
+            update.setdefault("$unset", {})[".".join(path)] = ""  # a removed object member
+            continue
+        update.setdefault("$set", {})[".".join(path)] = container[key]
+    return update, patched
+
+def validate_json_patch_update(update: dict, patched: dict) -> dict:
+    """Validate each section a JSON Patch touched as a whole, where arrays and objects are known,
+    and take the $set values from the validated sections"""
+    fields = {path.split(".")[0] for operator in ("$set", "$unset") for path in update.get(operator, {})}
+    validated = {field: validate_wedding_field(field, patched[field]) for field in fields if field in patched}
+    sets = {}
+    for path, value in update.get("$set", {}).items():
+        try:
+            container, key = _json_pointer_target(validated, path.split("."), "")
+            sets[path] = container[key]
+        except HTTPException:
+            sets[path] = value
+    return {**update, "$set": sets} if sets else update
+
+@api_router.patch("/wedding")
+async def patch_wedding_data(
+    request: Request,
+    response: Response,
+    session_id: str,
+    if_match: Optional[str] = Header(None, alias="If-Match"),
+):
+    """Apply a JSON Merge Patch (default) or JSON Patch to the user's wedding"""
     current_user = await get_current_user_simple(session_id)
     users_coll, weddings_coll = await get_collections()
+    expected_version = parse_if_match(if_match)
     
-    # Find existing wedding
-    existing_wedding = await weddings_coll.find_one({"user_id": current_user.id})
-    if not existing_wedding:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Wedding data not found"
-        )
+    try:
+        body = await request.json()
+    except ValueError:
+        raise patch_error("Request body must be valid JSON")
     
-    # Remove session_id from the data before updating
-    updated_data = {k: v for k, v in request_data.items() if k != 'session_id'}
-    updated_data["updated_at"] = datetime.utcnow().isoformat()
-    updated_data["user_id"] = current_user.id
-    updated_data["id"] = existing_wedding["id"]
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if content_type == JSON_PATCH_CONTENT_TYPE:
+        if not isinstance(body, list):
+            raise patch_error("JSON Patch body must be an array of operations")
+        # Array indexes, bounds and 'test' depend on the document itself, so read it and
+        # write conditionally on that version: a concurrent edit becomes a 412
+        current = await weddings_coll.find_one(wedding_version_query(current_user.id, expected_version), {"_id": 0})
+        if not current:
+            await raise_wedding_write_failure(weddings_coll, current_user.id, expected_version)
+        update, patched = json_patch_to_update(current, body)
+        if update:
+            update = validate_json_patch_update(update, patched)
+        expected_version = current.get("version") or 0
+    else:
+        if not isinstance(body, dict):
+            raise patch_error("Merge patch body must be a JSON object")
+        update = merge_patch_to_update(body)
+        if update:
+            update = validate_wedding_update(update)
     
-    # Preserve shareable_id if it exists
-    if "shareable_id" in existing_wedding:
-        updated_data["shareable_id"] = existing_wedding["shareable_id"]
+    if not update:
+        raise patch_error("Patch contains no changes")
+    update.setdefault("$set", {})["updated_at"] = datetime.utcnow().isoformat()
+    update["$inc"] = {"version": 1}
     
-    # Preserve created_at timestamp
-    if "created_at" in existing_wedding:
-        updated_data["created_at"] = existing_wedding["created_at"]
+    query = wedding_version_query(current_user.id, expected_version)
+    try:
+        updated_wedding = await weddings_coll.find_one_and_update(
+            query, update, return_document=ReturnDocument.AFTER, projection={"_id": 0}
+        )
+    except OperationFailure as e:
+        if document_too_large(e):
+            raise document_too_large(e)
+        if content_type == JSON_PATCH_CONTENT_TYPE:
+            raise patch_error(f"Patch could not be applied: {e}", status.HTTP_409_CONFLICT)
+        # A nested merge hit a non-object value: RFC 7396 replaces it whole
+        update = validate_wedding_update(merge_patch_to_update(body, nested=False))
+        update.setdefault("$set", {})["updated_at"] = datetime.utcnow().isoformat()
+        update["$inc"] = {"version": 1}
+        updated_wedding = await weddings_coll.find_one_and_update(
+            query, update, return_document=ReturnDocument.AFTER, projection={"_id": 0}
+        )
     
-    # Update in MongoDB
-    await weddings_coll.update_one(
-        {"user_id": current_user.id},
-        {"$set": updated_data}
-    )
+    if not updated_wedding:
+        await raise_wedding_write_failure(weddings_coll, current_user.id, expected_version)
     
-    # Also update JSON backup
-    weddings = load_json_file(WEDDINGS_FILE)
-    weddings[existing_wedding["id"]] = updated_data
-    save_json_file(WEDDINGS_FILE, weddings)
+    # Journal just the edit into the JSON backup and the edit history
+    journal_wedding_update(updated_wedding["id"], update)
+    await record_wedding_revision(updated_wedding["id"], updated_wedding["version"], update)
     
-    return updated_data
+    response.headers["ETag"] = wedding_etag(updated_wedding)
+    return updated_wedding
 
 @api_router.get("/wedding")
-async def get_wedding_data(session_id: str):
+async def get_wedding_data(session_id: str, response: Response):
     current_user = await get_current_user_simple(session_id)
     users_coll, weddings_coll = await get_collections()
     
@@ -453,6 +1446,7 @@ async def get_wedding_data(session_id: str):
     
     # Remove _id from response
     response_data = {k: v for k, v in wedding_data.items() if k != "_id"}
+    response.headers["ETag"] = wedding_etag(response_data)
     return response_data
 
 @api_router.get("/wedding/public/{wedding_id}")
@@ -464,7 +1458,7 @@ async def get_public_wedding_data(wedding_id: str):
     
     if not wedding:
         # Fallback to JSON file
-        weddings = load_json_file(WEDDINGS_FILE)
+        weddings = load_wedding_backup()
         if wedding_id not in weddings:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -473,7 +1467,7 @@ async def get_public_wedding_data(wedding_id: str):
         wedding = weddings[wedding_id]
     
     # Remove sensitive data for public access
-    public_data = {k: v for k, v in wedding.items() if k not in ["user_id", "_id"]}
+    public_data = public_wedding_view(wedding)
     return public_data
 
 # Add shareable link endpoint 
@@ -486,16 +1480,16 @@ async def get_wedding_by_shareable_id(shareable_id: str):
     
     if wedding:
         # Remove sensitive data for public access
-        public_data = {k: v for k, v in wedding.items() if k not in ["user_id", "_id"]}
+        public_data = public_wedding_view(wedding)
         return public_data
     
     # Fallback to JSON file for shareable_id ONLY
-    weddings = load_json_file(WEDDINGS_FILE)
+    weddings = load_wedding_backup()
     for wedding_id, wedding_data in weddings.items():
         # Check ONLY shareable_id (no more custom_url support)
         if wedding_data.get("shareable_id") == shareable_id:
             # Remove sensitive data for public access
-            public_data = {k: v for k, v in wedding_data.items() if k not in ["user_id"]}
+            public_data = public_wedding_view(wedding_data)
             return public_data
 
 # Username-based routing endpoints
@@ -519,7 +1513,7 @@ async def get_wedding_by_username(username: str):
         return get_default_wedding_data()
     
     # Remove sensitive data for public access
-    public_data = {k: v for k, v in wedding.items() if k not in ["user_id", "_id"]}
+    public_data = public_wedding_view(wedding)
     return public_data
 
 @api_router.get("/wedding/user/{username}/{section}")
@@ -542,7 +1536,7 @@ async def get_wedding_section_by_username(username: str, section: str):
         wedding = get_default_wedding_data()
     
     # Remove sensitive data
-    public_data = {k: v for k, v in wedding.items() if k not in ["user_id", "_id"]}
+    public_data = public_wedding_view(wedding)
     
     # Add section metadata
     public_data["current_section"] = section
@@ -612,23 +1606,62 @@ def get_default_wedding_data():
                 "highlight": True
             }
         ],
-        "gallery_photos": {
-            "engagement": [
-                "https://images.unsplash.com/photo-1606216794074-735e91aa2c92?w=500",
-                "https://images.unsplash.com/photo-1583939003579-730e3918a45a?w=500",
-                "https://images.unsplash.com/photo-1582750433449-648ed127bb54?w=500"
-            ],
-            "travel": [
-                "https://images.unsplash.com/photo-1506905925346-21bda4d32df4?w=500",
-                "https://images.unsplash.com/photo-1507003211169-0a1dd7228f2d?w=500",
-                "https://images.unsplash.com/photo-1506197603052-3cc9c3a201bd?w=500"
-            ],
-            "family": [
-                "https://images.unsplash.com/photo-1511895426328-dc8714191300?w=500",
-                "https://images.unsplash.com/photo-1515934751635-c81c6bc9a2d8?w=500",
-                "https://images.unsplash.com/photo-1556909114-f6e7ad7d3136?w=500"
-            ]
-        },
+        "gallery_photos": [
+            {
+                "id": "1",
+                "src": "https://images.unsplash.com/photo-1606216794074-735e91aa2c92?w=500",
+                "category": "engagement",
+                "title": "Engagement"
+            },
+            {
+                "id": "2",
+                "src": "https://images.unsplash.com/photo-1583939003579-730e3918a45a?w=500",
+                "category": "engagement",
+                "title": "Engagement"
+            },
+            {
+                "id": "3",
+                "src": "https://images.unsplash.com/photo-1582750433449-648ed127bb54?w=500",
+                "category": "engagement",
+                "title": "Engagement"
+            },
+            {
+                "id": "4",
+                "src": "https://images.unsplash.com/photo-1506905925346-21bda4d32df4?w=500",
+                "category": "travel",
+                "title": "Travel"
+            },
+            {
+                "id": "5",
+                "src": "https://images.unsplash.com/photo-1507003211169-0a1dd7228f2d?w=500",
+                "category": "travel",
+                "title": "Travel"
+            },
+            {
+                "id": "6",
+                "src": "https://images.unsplash.com/photo-1506197603052-3cc9c3a201bd?w=500",
+                "category": "travel",
+                "title": "Travel"
+            },
+            {
+                "id": "7",
+                "src": "https://images.unsplash.com/photo-1511895426328-dc8714191300?w=500",
+                "category": "family",
+                "title": "Family"
+            },
+            {
+                "id": "8",
+                "src": "https://images.unsplash.com/photo-1515934751635-c81c6bc9a2d8?w=500",
+                "category": "family",
+                "title": "Family"
+            },
+            {
+                "id": "9",
+                "src": "https://images.unsplash.com/photo-1556909114-f6e7ad7d3136?w=500",
+                "category": "family",
+                "title": "Family"
+            }
+        ],
         "bridal_party": [
             {
                 "name": "Emma Johnson",
@@ -749,67 +1782,614 @@ async def get_profile(session_id: str):
         "created_at": current_user.created_at
     }
 
-# RSVP Endpoints
-@api_router.post("/rsvp")
-async def submit_rsvp(rsvp_data: dict):
-    users_coll, weddings_coll = await get_collections()
+# Real-time wedding events (Server-Sent Events)
+WEDDING_EVENTS_SOURCE = os.getenv("WEDDING_EVENTS_SOURCE", "local")  # "local" or "changestream"
+WEDDING_EVENTS_HISTORY = int(os.getenv("WEDDING_EVENTS_HISTORY", "200"))
+WEDDING_EVENTS_SUBSCRIBER_BUFFER = 100
+WEDDING_EVENTS_HEARTBEAT_SECONDS = 15
+# History of a wedding nobody is watching is dropped after this long without events
+WEDDING_EVENTS_IDLE_SECONDS = int(os.getenv("WEDDING_EVENTS_IDLE_SECONDS", "3600"))
+WEDDING_EVENT_COLLECTIONS = {"rsvps": "rsvp", "guestbook": "guestbook"}
+
+class EventSubscription:
+    """Pending events for one SSE connection; overflows instead of blocking publishers"""
     
-    # Create RSVP response
-    rsvp_response = RSVPResponse(
-        wedding_id=rsvp_data.get('wedding_id', ''),
-        guest_name=rsvp_data.get('guest_name', ''),
-        guest_email=rsvp_data.get('guest_email', ''),
-        guest_phone=rsvp_data.get('guest_phone', ''),
-        attendance=rsvp_data.get('attendance', ''),
-        guest_count=int(rsvp_data.get('guest_count', 1)),
-        dietary_restrictions=rsvp_data.get('dietary_restrictions', ''),
-        special_message=rsvp_data.get('special_message', '')
-    )
+    def __init__(self, limit: int):
+        self.pending = deque()
+        self.ready = asyncio.Event()
+        self.overflowed = False
+        self.limit = limit
     
-    # Convert to dict
-    rsvp_dict = rsvp_response.dict()
-    rsvp_dict["submitted_at"] = rsvp_dict["submitted_at"].isoformat()
+    def push(self, event: tuple):
+        if len(self.pending) >= self.limit:
+            self.overflowed = True
+        else:
+            self.pending.append(event)
+        self.ready.set()
+
+class WeddingEventHub:
+    """In-process pub/sub per wedding with a short replay history for Last-Event-ID"""
     
-    # Store RSVP in separate collection
-    rsvps_collection = database.rsvps
-    await rsvps_collection.insert_one(rsvp_dict)
+    def __init__(self, history_size: int, idle_seconds: int = WEDDING_EVENTS_IDLE_SECONDS):
+        self.history_size = history_size
+        self.idle_seconds = idle_seconds
+        self.next_id = 1
+        self.history = {}  # channel -> deque of (event_id, event_type, data)
+        self.evicted_upto = {}  # channel -> newest event id dropped from history
+        self.pruned_upto = 0  # newest event id dropped along with an idle channel
+        self.last_active = OrderedDict()  # channel -> monotonic time of its last event or subscriber
+        self.subscribers = {}  # channel -> set of EventSubscription
     
-    return {"success": True, "message": "RSVP submitted successfully", "rsvp_id": rsvp_response.id}
-
-@api_router.get("/rsvp/{wedding_id}")
-async def get_wedding_rsvps(wedding_id: str):
-    """Get all RSVPs for a specific wedding (for admin/couple view)"""
-    users_coll, weddings_coll = await get_collections()
+    def publish(self, channel: str, event_type: str, payload: dict):
+        event = (self.next_id, event_type, json.dumps(payload, default=str))
+        self.next_id += 1
+        
+        self.prune_idle()
+        history = self.history.get(channel)
+        if history is None:
+            history = self.history[channel] = deque(maxlen=self.history_size)
+            if self.pruned_upto:
+                # Earlier events may have gone with a pruned history
+                self.evicted_upto[channel] = self.pruned_upto
+        if len(history) == self.history_size:
+            self.evicted_upto[channel] = history[0][0]
+        history.append(event)
+        self.touch(channel)
+        
+        for subscription in self.subscribers.get(channel, ()):
+            subscription.push(event)
     
-    # Get RSVPs for this wedding
-    rsvps_collection = database.rsvps
-    rsvps = await rsvps_collection.find({"wedding_id": wedding_id}).to_list(length=None)
+    def touch(self, channel: str):
+        self.last_active[channel] = time.monotonic()
+        self.last_active.move_to_end(channel)
     
-    # Remove _id from response and format dates
-    response_data = []
-    for rsvp in rsvps:
-        clean_rsvp = {k: v for k, v in rsvp.items() if k != "_id"}
-        response_data.append(clean_rsvp)
+    def prune_idle(self):
+        """Drop the history of channels without subscribers that have been quiet for a while"""
+        cutoff = time.monotonic() - self.idle_seconds
+        while self.last_active:
+            channel, last_active = next(iter(self.last_active.items()))
+            if last_active >= cutoff:
+                break
+            if channel in self.subscribers:
+                self.touch(channel)
+                continue
+            del self.last_active[channel]
+            self.evicted_upto.pop(channel, None)
+            history = self.history.pop(channel, None)
+            if history:
+                self.pruned_upto = max(self.pruned_upto, history[-1][0])
     
-    return {"success": True, "rsvps": response_data, "total_count": len(response_data)}
-
-@api_router.get("/rsvp/shareable/{shareable_id}")  
-async def get_rsvps_by_shareable_id(shareable_id: str):
-    """Get RSVPs using shareable ID (for dashboard admin view)"""
-    users_coll, weddings_coll = await get_collections()
+    def subscribe(self, channels: List[str]) -> EventSubscription:
+        subscription = EventSubscription(WEDDING_EVENTS_SUBSCRIBER_BUFFER)
+        for channel in channels:
+            self.subscribers.setdefault(channel, set()).add(subscription)
+        return subscription
     
-    # First find the wedding by shareable_id
-    wedding = await weddings_coll.find_one({"shareable_id": shareable_id})
+    def unsubscribe(self, channels: List[str], subscription: EventSubscription):
+        for channel in channels:
+            subscribers = self.subscribers.get(channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self.subscribers[channel]
+                    self.touch(channel)
     
-    if not wedding:
+    def replay(self, channels: List[str], last_event_id: int) -> Optional[List[tuple]]:
+        """Events after last_event_id, or None when history can't cover the gap"""
+        if last_event_id >= self.next_id:
+            return None  # id from before a restart
+        for channel in channels:
+            # A channel without history may have had one pruned
+            dropped_upto = self.evicted_upto.get(channel, 0) if channel in self.history else self.pruned_upto
+            if dropped_upto > last_event_id:
+                return None
+        events = [
+            event
+            for channel in channels
+            for event in self.history.get(channel, ())
+            if event[0] > last_event_id
+        ]
+        return sorted(events)
+
+wedding_event_hub = WeddingEventHub(WEDDING_EVENTS_HISTORY)
+
+# Moderation bookkeeping stays server-side; only approved messages are ever published
+GUESTBOOK_INTERNAL_FIELDS = ("moderation_state", "moderation_reason", "moderated_at")
+
+def event_payload(document: dict) -> dict:
+    return {
+        k: v for k, v in document.items()
+        if k != "_id" and k not in RSVP_INTERNAL_FIELDS and k not in GUESTBOOK_INTERNAL_FIELDS
+    }
+
+def fan_out_wedding_event(event_type: str, document: dict):
+    payload = event_payload(document)
+    wedding_event_hub.publish(document.get("wedding_id", ""), event_type, payload)
+    # Public messages also feed the landing page guestbook
+    if event_type == "guestbook" and document.get("is_public") and document.get("wedding_id") != "public":
+        wedding_event_hub.publish("public", event_type, payload)
+
+def publish_wedding_event(event_type: str, document: dict):
+    """Fan a freshly written RSVP or guestbook message out to SSE subscribers"""
+    if WEDDING_EVENTS_SOURCE == "local":
+        fan_out_wedding_event(event_type, document)
+    # Otherwise watch_wedding_events publishes from the change stream
+
+async def watch_wedding_events():
+    """Publish inserts/updates from a MongoDB change stream (replica sets only)"""
+    pipeline = [{"$match": {"$or": [
+        {"ns.coll": "rsvps", "operationType": {"$in": ["insert", "update", "replace"]}},
+        # Guestbook messages appear once, when approved: inserted approved (moderation off)
+        # or moderated to approved. Pending/rejected posts and reaction rollups never go out.
+        {
+            "ns.coll": "guestbook",
+            "fullDocument.moderation_state": "approved",
+            "$or": [
+                {"operationType": "insert"},
+                {"operationType": "update", "updateDescription.updatedFields.moderation_state": "approved"},
+            ],
+        },
+    ]}}]
+    resume_token = None
+    while True:
+        try:
+            async with db.database.watch(
+                pipeline, full_document="updateLookup", resume_after=resume_token
+            ) as stream:
+                async for change in stream:
+                    resume_token = stream.resume_token
+                    document = change.get("fullDocument")
+                    if not document:
+                        continue
+                    fan_out_wedding_event(WEDDING_EVENT_COLLECTIONS[change["ns"]["coll"]], document)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("⚠️ Wedding event change stream failed, retrying: %s", e)
+            await asyncio.sleep(5)
+
+def format_sse(event: tuple) -> str:
+    event_id, event_type, data = event
+    return f"id: {event_id}\nevent: {event_type}\ndata: {data}\n\n"
+
+@api_router.get("/events/{wedding_id}")
+async def stream_wedding_events(
+    wedding_id: str,
+    request: Request,
+    last_event_id: Optional[str] = Header(None, alias="Last-Event-ID"),
+):
+    """Stream new RSVPs and guestbook messages for a wedding (id or shareable id)"""
+    channels = [wedding_id]
+    if wedding_id not in RESERVED_WEDDING_IDS:
+        users_coll, weddings_coll = await get_collections()
+        wedding = await weddings_coll.find_one(
+            {"$or": [{"id": wedding_id}, {"shareable_id": wedding_id}]},
+            {"_id": 0, "id": 1, "shareable_id": 1}
+        )
+        if not wedding:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Wedding not found"
+            )
+        # RSVPs may be filed under either id, depending on the page they came from
+        channels = [c for c in {wedding.get("id"), wedding.get("shareable_id")} if c]
+    
+    subscription = wedding_event_hub.subscribe(channels)
+    backlog = []
+    if last_event_id and last_event_id.isdigit():
+        backlog = wedding_event_hub.replay(channels, int(last_event_id))
+    
+    async def event_stream():
+        try:
+            # Tell the browser how long to wait before reconnecting
+            yield "retry: 3000\n\n"
+            sent_upto = int(last_event_id) if last_event_id and last_event_id.isdigit() else 0
+            if backlog is None:
+                # Too far behind for the replay history: client should refetch lists
+                yield f"id: {wedding_event_hub.next_id - 1}\nevent: resync\ndata: {{}}\n\n"
+            else:
+                for event in backlog:
+                    yield format_sse(event)
+                    sent_upto = event[0]
+            
+            while not await request.is_disconnected():
+                try:
+                    await asyncio.wait_for(subscription.ready.wait(), timeout=WEDDING_EVENTS_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                subscription.ready.clear()
+                while subscription.pending:
+                    event = subscription.pending.popleft()
+                    # Skip anything already sent from the replay history
+                    if event[0] > sent_upto:
+                        yield format_sse(event)
+                        sent_upto = event[0]
+                if subscription.overflowed:
+                    # Slow consumer: close and let it resume via Last-Event-ID
+                    break
+        finally:
+            wedding_event_hub.unsubscribe(channels, subscription)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# RSVP Endpoints
+RSVP_INTERNAL_FIELDS = ("guest_key", "search_prefixes")
+RSVP_PUBLIC_PROJECTION = {"_id": 0, **{field: 0 for field in RSVP_INTERNAL_FIELDS}}
+
+def normalize_guest_key(guest_email: Optional[str], guest_phone: Optional[str]) -> Optional[str]:
+    """Build the per-wedding guest identity: case-folded email, else phone digits"""
+    email = (guest_email or "").strip().lower()
+    if email:
+        return f"email:{email}"
+    digits = "".join(ch for ch in (guest_phone or "") if ch.isdigit())
+    if digits:
+        return f"phone:{digits}"
+    return None
+
+def guest_rsvp_id(wedding_id: str, guest_key: str) -> str:
+    """Stable RSVP id for a recognised guest, known before the upsert lands"""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"rsvp:{wedding_id}:{guest_key}"))
+
+def rsvp_upsert_update(rsvp_dict: dict, revisions: int = 1) -> dict:
+    """Update document for a last-write-wins upsert of one guest's RSVP.
+    
+    The id is set on every write, so RSVPs stored with a random id before ids were
+    derived from the guest move to the stable one on their next resubmission.
+    """
+    fields = {k: v for k, v in rsvp_dict.items() if k not in ("wedding_id", "guest_key")}
+    return {
+        "$set": fields,
+        "$inc": {"revision": revisions}
+    }
+
+async def upsert_rsvp(rsvps_collection, rsvp_dict: dict) -> dict:
+    """Last-write-wins upsert on (wedding_id, guest_key), bumping the revision counter"""
+    key_filter = {"wedding_id": rsvp_dict["wedding_id"], "guest_key": rsvp_dict["guest_key"]}
+    
+    for attempt in range(2):
+        try:
+            return await rsvps_collection.find_one_and_update(
+                key_filter,
+                rsvp_upsert_update(rsvp_dict),
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+                projection={"_id": 0, "id": 1, "revision": 1}
+            )
+        except DuplicateKeyError:
+            # A concurrent retry of the same guest won the insert; apply ours as an update
+            if attempt:
+                raise
+
+# Batched RSVP ingestion (RSVP_INGEST_MODE=batched) for submission bursts
+RSVP_INGEST_MODE = os.getenv("RSVP_INGEST_MODE", "direct")
+RSVP_INGEST_FLUSH_MS = int(os.getenv("RSVP_INGEST_FLUSH_MS", "50"))
+RSVP_INGEST_BATCH_SIZE = int(os.getenv("RSVP_INGEST_BATCH_SIZE", "200"))
+RSVP_INGEST_QUEUE_SIZE = int(os.getenv("RSVP_INGEST_QUEUE_SIZE", "5000"))
+RSVP_INGEST_PUT_TIMEOUT = float(os.getenv("RSVP_INGEST_PUT_TIMEOUT", "2"))
+RSVP_INGEST_MAX_RETRIES = 3
+RSVP_INGEST_STOP_TIMEOUT = float(os.getenv("RSVP_INGEST_STOP_TIMEOUT", "10"))
+RSVP_DEAD_LETTER_FILE = ROOT_DIR / 'rsvp_dead_letters.jsonl'  # acknowledged RSVPs that could not be written
+
+def rsvp_bulk_operations(rsvp_dicts: List[dict]) -> list:
+    """Coalesce a batch into (bulk write op, rsvp) pairs, last write wins per guest"""
+    operations = []
+    latest = {}
+    counts = {}
+    for rsvp_dict in rsvp_dicts:
+        if rsvp_dict["guest_key"] is None:
+            operations.append((InsertOne({**rsvp_dict, "revision": 1}), rsvp_dict))
+            continue
+        key = (rsvp_dict["wedding_id"], rsvp_dict["guest_key"])
+        latest[key] = rsvp_dict
+        counts[key] = counts.get(key, 0) + 1
+    
+    for (wedding_id, guest_key), rsvp_dict in latest.items():
+        operations.append((UpdateOne(
+            {"wedding_id": wedding_id, "guest_key": guest_key},
+            rsvp_upsert_update(rsvp_dict, revisions=counts[(wedding_id, guest_key)]),
+            upsert=True
+        ), rsvp_dict))
+    return operations
+
+class RSVPIngestQueue:
+    """Buffers acknowledged RSVPs and writes them with one bulk_write per flush"""
+    
+    def __init__(self, max_size: int, batch_size: int, flush_ms: int):
+        self.queue = asyncio.Queue(maxsize=max_size)
+        self.batch_size = batch_size
+        self.flush_interval = flush_ms / 1000
+        self.accepting = False
+        self.worker = None
+        self.in_flight = []  # batch taken off the queue and not yet written
+    
+    def start(self):
+        self.accepting = True
+        self.worker = asyncio.create_task(self._run())
+    
+    async def submit(self, rsvp_dict: dict):
+        if not self.accepting:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="RSVP service is shutting down, please retry"
+            )
+        try:
+            # Backpressure: wait briefly for room, then ask the client to retry
+            await asyncio.wait_for(self.queue.put(rsvp_dict), timeout=RSVP_INGEST_PUT_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many RSVPs right now, please retry",
+                headers={"Retry-After": "1"}
+            )
+    
+    async def _next_batch(self) -> List[dict]:
+        batch = [await self.queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout=timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+    
+    async def _write(self, batch: List[dict]):
+        pending = rsvp_bulk_operations(batch)
+        for attempt in range(RSVP_INGEST_MAX_RETRIES):
+            try:
+                await db.database.rsvps.bulk_write([operation for operation, _ in pending], ordered=False)
+                failed = {}
+            except BulkWriteError as e:
+                failed = {error["index"]: error for error in e.details.get('writeErrors', [])}
+            except Exception as e:
+                logger.warning("⚠️ RSVP batch write failed (attempt %d): %s", attempt + 1, e)
+                await asyncio.sleep(0.1 * 2 ** attempt)
+                continue
+            
+            retry = []
+            for index, (operation, rsvp_dict) in enumerate(pending):
+                error = failed.get(index)
+                if error is None:
+                    rsvp_search_cache.record(rsvp_dict)
+                    publish_wedding_event("rsvp", rsvp_dict)
+                elif error.get("code") == 11000:
+                    # Two upserts raced to insert the same guest; the retry lands as an update
+                    retry.append((operation, rsvp_dict))
+                else:
+                    logger.error("❌ RSVP rejected by MongoDB: %s", error.get("errmsg"), extra={"rsvp_id": rsvp_dict["id"]})
+                    await self._dead_letter([rsvp_dict])
+            if not retry:
+                return
+            pending = retry
+        # Every RSVP here was acknowledged to a guest, so park it on disk instead of losing it
+        logger.error("❌ %d RSVPs failed %d batch writes; saved for replay", len(pending), RSVP_INGEST_MAX_RETRIES)
+        await self._dead_letter([rsvp_dict for _, rsvp_dict in pending])
+    
+    async def _dead_letter(self, rsvp_dicts: List[dict]):
+        lines = "".join(json.dumps(rsvp_dict, default=str) + "\n" for rsvp_dict in rsvp_dicts)
+        
+        def append():
+            with open(RSVP_DEAD_LETTER_FILE, 'a') as f:
+                f.write(lines)
+        try:
+            await asyncio.to_thread(append)
+        except OSError as e:
+            # Last resort: the log line is the only copy left
+            logger.error("❌ Failed to park %d RSVPs: %s", len(rsvp_dicts), e, extra={"rsvps": rsvp_dicts})
+    
+    async def replay_dead_letters(self):
+        """Retry RSVPs parked by earlier runs (or earlier in this one)"""
+        if not RSVP_DEAD_LETTER_FILE.exists():
+            return
+        replaying = RSVP_DEAD_LETTER_FILE.with_suffix(".replaying")
+        os.replace(RSVP_DEAD_LETTER_FILE, replaying)
+        with open(replaying, 'r') as f:
+            rsvp_dicts = [json.loads(line) for line in f if line.strip()]
+        for start in range(0, len(rsvp_dicts), self.batch_size):
+            await self._write(rsvp_dicts[start:start + self.batch_size])
+        replaying.unlink()
+        logger.info("✅ Replayed %d parked RSVPs", len(rsvp_dicts))
+    
+    async def _run(self):
+        try:
+            await self.replay_dead_letters()
+        except Exception as e:
+            logger.warning("⚠️ Failed to replay parked RSVPs: %s", e)
+        while True:
+            batch = self.in_flight = await self._next_batch()
+            try:
+                await self._write(batch)
+            except Exception:
+                # One bad batch must not take the worker (and every later RSVP) down with it
+                logger.exception("❌ RSVP batch of %d could not be written or parked", len(batch), extra={"rsvps": batch})
+            # Left set if stop() cancels the write, so the batch gets parked
+            self.in_flight = []
+            for _ in batch:
+                self.queue.task_done()
+    
+    async def stop(self):
+        """Stop accepting submissions, flush everything queued, then stop the worker.
+        
+        Whatever is still unwritten after RSVP_INGEST_STOP_TIMEOUT is parked for replay.
+        """
+        self.accepting = False
+        if self.worker is None:
+            return
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout=RSVP_INGEST_STOP_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.error("❌ RSVP queue did not drain in %.0fs; parking what is left", RSVP_INGEST_STOP_TIMEOUT)
+        self.worker.cancel()
+        await asyncio.gather(self.worker, return_exceptions=True)
+        self.worker = None
+        # A batch cut off mid-write may be replayed twice; keyed guests' upserts make that harmless
+        leftover = self.in_flight
+        self.in_flight = []
+        while not self.queue.empty():
+            leftover.append(self.queue.get_nowait())
+            self.queue.task_done()
+        if leftover:
+            await self._dead_letter(leftover)
+
+rsvp_ingest_queue = (
+    RSVPIngestQueue(RSVP_INGEST_QUEUE_SIZE, RSVP_INGEST_BATCH_SIZE, RSVP_INGEST_FLUSH_MS)
+    if RSVP_INGEST_MODE == "batched" else None
+)
+
+@api_router.post("/rsvp")
+async def submit_rsvp(rsvp_data: dict):
+    users_coll, weddings_coll = await get_collections()
+    await require_known_wedding(rsvp_data.get('wedding_id', ''))
+    
+    # Create RSVP response
+    rsvp_response = RSVPResponse(
+        wedding_id=rsvp_data.get('wedding_id', ''),
+        guest_name=rsvp_data.get('guest_name', ''),
+        guest_email=rsvp_data.get('guest_email', ''),
+        guest_phone=rsvp_data.get('guest_phone', ''),
+        attendance=rsvp_data.get('attendance', ''),
+        guest_count=int(rsvp_data.get('guest_count', 1)),
+        dietary_restrictions=rsvp_data.get('dietary_restrictions', ''),
+        special_message=rsvp_data.get('special_message', '')
+    )
+    
+    # Convert to dict
+    rsvp_dict = rsvp_response.model_dump()
+    rsvp_dict["submitted_at"] = rsvp_dict["submitted_at"].isoformat()
+    rsvp_dict["guest_key"] = normalize_guest_key(rsvp_response.guest_email, rsvp_response.guest_phone)
+    if rsvp_dict["guest_key"] is not None:
+        rsvp_dict["id"] = guest_rsvp_id(rsvp_dict["wedding_id"], rsvp_dict["guest_key"])
+    rsvp_dict["search_prefixes"] = rsvp_search_prefixes(rsvp_dict)
+    
+    if rsvp_ingest_queue is not None:
+        # Acknowledge now; the ingest queue writes it with the next batch
+        await rsvp_ingest_queue.submit(rsvp_dict)
+        return {"success": True, "message": "RSVP submitted successfully", "queued": True, "rsvp_id": rsvp_dict["id"]}
+    
+    # Store RSVP in separate collection
+    rsvps_collection = db.database.rsvps
+    if rsvp_dict["guest_key"] is None:
+        # No way to recognise a resubmission, so always insert
+        rsvp_dict["revision"] = 1
+        await rsvps_collection.insert_one(rsvp_dict)
+        stored = rsvp_dict
+    else:
+        stored = await upsert_rsvp(rsvps_collection, rsvp_dict)
+    rsvp_search_cache.record({**rsvp_dict, **stored})
+    publish_wedding_event("rsvp", {**rsvp_dict, **stored})
+    
+    return {
+        "success": True,
+        "message": "RSVP submitted successfully",
+        "rsvp_id": stored["id"],
+        "revision": stored["revision"]
+    }
+
+async def deduplicate_rsvps(batch_size: int = 500) -> dict:
+    """One-off job: collapse legacy duplicate RSVPs onto the latest one per guest.
+    
+    Walks RSVPs without a guest_key in (wedding_id, newest first) order, keeps the
+    newest submission for each guest (stamping its guest_key and revision count) and
+    deletes the rest. Writes are flushed with bulk_write every ``batch_size`` ops.
+    """
+    rsvps_collection = db.database.rsvps
+    cursor = rsvps_collection.find(
+        {"guest_key": {"$exists": False}},
+        {"_id": 1, "wedding_id": 1, "guest_email": 1, "guest_phone": 1}
+    ).sort([("wedding_id", 1), ("submitted_at", -1)]).batch_size(batch_size)
+    
+    stats = {"scanned": 0, "kept": 0, "deleted": 0}
+    operations = []
+    current_wedding = None
+    kept = {}  # guest_key -> ObjectId of the surviving document (current wedding only)
+    duplicate_counts = {}
+    
+    async def flush():
+        if operations:
+            await rsvps_collection.bulk_write(operations, ordered=True)
+            operations.clear()
+    
+    async for rsvp in cursor:
+        stats["scanned"] += 1
+        wedding_id = rsvp.get("wedding_id")
+        if wedding_id != current_wedding:
+            # Count revisions per surviving doc before moving to the next wedding
+            for guest_key, count in duplicate_counts.items():
+                operations.append(UpdateOne({"_id": kept[guest_key]}, {"$set": {"revision": count}}))
+            current_wedding = wedding_id
+            duplicate_counts = {}
+            # Guests already upserted under the new scheme win over every legacy copy
+            kept = {
+                doc["guest_key"]: None
+                async for doc in rsvps_collection.find(
+                    {"wedding_id": wedding_id, "guest_key": {"$type": "string"}},
+                    {"_id": 0, "guest_key": 1}
+                )
+            }
+        
+        guest_key = normalize_guest_key(rsvp.get("guest_email"), rsvp.get("guest_phone"))
+        if guest_key is None:
+            operations.append(UpdateOne({"_id": rsvp["_id"]}, {"$set": {"revision": 1}}))
+        elif guest_key in kept:
+            operations.append(DeleteOne({"_id": rsvp["_id"]}))
+            stats["deleted"] += 1
+            if kept[guest_key] is not None:
+                duplicate_counts[guest_key] += 1
+        else:
+            kept[guest_key] = rsvp["_id"]
+            duplicate_counts[guest_key] = 1
+            operations.append(UpdateOne({"_id": rsvp["_id"]}, {"$set": {"guest_key": guest_key}}))
+            stats["kept"] += 1
+        
+        if len(operations) >= batch_size:
+            await flush()
+    
+    for guest_key, count in duplicate_counts.items():
+        operations.append(UpdateOne({"_id": kept[guest_key]}, {"$set": {"revision": count}}))
+    await flush()
+    return stats
+
+@api_router.get("/rsvp/{wedding_id}")
+async def get_wedding_rsvps(wedding_id: str):
+    """Get all RSVPs for a specific wedding (for admin/couple view)"""
+    users_coll, weddings_coll = await get_collections()
+    
+    # Get RSVPs for this wedding
+    rsvps_collection = db.database.rsvps
+    rsvps = await rsvps_collection.find({"wedding_id": wedding_id}, RSVP_PUBLIC_PROJECTION).to_list(length=None)
+    
+    # Remove _id from response and format dates
+    response_data = []
+    for rsvp in rsvps:
+        clean_rsvp = {k: v for k, v in rsvp.items() if k != "_id"}
+        response_data.append(clean_rsvp)
+    
+    return {"success": True, "rsvps": response_data, "total_count": len(response_data)}
+
+@api_router.get("/rsvp/shareable/{shareable_id}")  
+async def get_rsvps_by_shareable_id(shareable_id: str):
+    """Get RSVPs using shareable ID (for dashboard admin view)"""
+    users_coll, weddings_coll = await get_collections()
+    
+    # First find the wedding by shareable_id
+    wedding = await weddings_coll.find_one({"shareable_id": shareable_id})
+    
+    if not wedding:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Wedding not found"
         )
     
     # Get RSVPs for this wedding
-    rsvps_collection = database.rsvps
-    rsvps = await rsvps_collection.find({"wedding_id": wedding["id"]}).to_list(length=None)
+    rsvps_collection = db.database.rsvps
+    rsvps = await rsvps_collection.find({"wedding_id": wedding["id"]}, RSVP_PUBLIC_PROJECTION).to_list(length=None)
     
     # Remove _id from response
     response_data = []
@@ -819,6 +2399,318 @@ async def get_rsvps_by_shareable_id(shareable_id: str):
     
     return {"success": True, "rsvps": response_data, "total_count": len(response_data)}
 
+# RSVP Export
+RSVP_EXPORT_COLUMNS = [
+    "id",
+    "guest_name",
+    "guest_email",
+    "guest_phone",
+    "attendance",
+    "guest_count",
+    "dietary_restrictions",
+    "special_message",
+    "submitted_at",
+]
+RSVP_EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+RSVP_EXPORT_BATCH_SIZE = 500
+# Spreadsheets run cells starting with these as formulas (OWASP "CSV injection")
+CSV_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+def csv_safe_cell(value):
+    """Guest-typed text, made inert for spreadsheets by a leading quote"""
+    if isinstance(value, str) and value.startswith(CSV_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+def parse_export_columns(columns: Optional[str]) -> List[str]:
+    """Validate a comma-separated column selection against the export columns"""
+    if not columns:
+        return list(RSVP_EXPORT_COLUMNS)
+    selected = [c.strip() for c in columns.split(",") if c.strip()]
+    unknown = [c for c in selected if c not in RSVP_EXPORT_COLUMNS]
+    if unknown or not selected:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown export columns: {', '.join(unknown) or columns}. "
+                   f"Allowed: {', '.join(RSVP_EXPORT_COLUMNS)}"
+        )
+    return selected
+
+async def iter_rsvp_export(wedding_id: str, columns: List[str], export_format: str):
+    """Yield encoded export chunks, one per cursor batch, so memory stays flat"""
+    rsvps_collection = db.database.rsvps
+    projection = {"_id": 0}
+    projection.update({column: 1 for column in columns})
+    cursor = rsvps_collection.find(
+        {"wedding_id": wedding_id}, projection
+    ).sort("submitted_at", 1).batch_size(RSVP_EXPORT_BATCH_SIZE)
+    
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if export_format == "csv" else None
+    if writer:
+        writer.writerow(columns)
+    
+    pending = 0
+    async for rsvp in cursor:
+        if writer:
+            writer.writerow([csv_safe_cell(rsvp.get(column, "")) for column in columns])
+        else:
+            buffer.write(json.dumps({column: rsvp.get(column) for column in columns}, default=str))
+            buffer.write("\n")
+        pending += 1
+        if pending >= RSVP_EXPORT_BATCH_SIZE:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+@api_router.get("/rsvp/{wedding_id}/export")
+async def export_wedding_rsvps(
+    wedding_id: str,
+    format: str = Query("csv"),
+    columns: Optional[str] = Query(None, description="Comma-separated column names"),
+):
+    """Stream all RSVPs for a wedding as CSV or NDJSON (for caterers and planners)"""
+    export_format = format.lower()
+    if export_format not in RSVP_EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported export format. Allowed: {', '.join(RSVP_EXPORT_FORMATS)}"
+        )
+    selected_columns = parse_export_columns(columns)
+    
+    filename = f"rsvps-{wedding_id}.{export_format}"
+    return StreamingResponse(
+        iter_rsvp_export(wedding_id, selected_columns, export_format),
+        media_type=RSVP_EXPORT_FORMATS[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+# RSVP Guest Search
+RSVP_SEARCH_MAX_PREFIX = 20
+RSVP_SEARCH_DEFAULT_LIMIT = 20
+RSVP_SEARCH_MAX_LIMIT = 100
+RSVP_SEARCH_CACHE_WEDDINGS = 64
+RSVP_SEARCH_CACHE_MAX_ROWS = 5000
+RSVP_SEARCH_CACHE_TTL_SECONDS = 60
+RSVP_SEARCH_TOO_LARGE_TTL_SECONDS = 600  # weddings rarely shrink back under the cap
+RSVP_SEARCH_FIELDS = {"id": 1, "guest_name": 1, "guest_email": 1, "guest_phone": 1,
+                      "attendance": 1, "guest_count": 1, "submitted_at": 1}
+
+def rsvp_search_terms(rsvp: dict) -> List[str]:
+    terms = search_tokens(rsvp.get("guest_name")) + search_tokens(rsvp.get("guest_email"))
+    # Phone matches on each dialled group as well as the full digit string
+    terms += search_tokens(rsvp.get("guest_phone"))
+    phone_digits = "".join(ch for ch in (rsvp.get("guest_phone") or "") if ch.isdigit())
+    if phone_digits:
+        terms.append(phone_digits)
+    return terms
+
+def rsvp_search_prefixes(rsvp: dict) -> List[str]:
+    """Every prefix (up to RSVP_SEARCH_MAX_PREFIX chars) of every searchable term"""
+    prefixes = set()
+    for term in rsvp_search_terms(rsvp):
+        for length in range(1, min(len(term), RSVP_SEARCH_MAX_PREFIX) + 1):
+            prefixes.add(term[:length])
+    return sorted(prefixes)
+
+class GuestTrie:
+    """Prefix trie over one wedding's RSVPs; each node holds the ids beneath it"""
+    
+    def __init__(self):
+        self.root = {}
+        self.rows = {}  # rsvp id -> search row
+        self.ids_by_guest_key = {}
+        self.built_at = time.monotonic()
+    
+    def _path(self, term: str) -> List[dict]:
+        nodes = []
+        node = self.root
+        for ch in term[:RSVP_SEARCH_MAX_PREFIX]:
+            node = node.setdefault(ch, {"": set()})
+            nodes.append(node)
+        return nodes
+    
+    def _find(self, term: str) -> Optional[dict]:
+        node = self.root
+        for ch in term[:RSVP_SEARCH_MAX_PREFIX]:
+            node = node.get(ch)
+            if node is None:
+                return None
+        return node
+    
+    def add(self, row: dict):
+        self.remove(row["id"])
+        self.rows[row["id"]] = row
+        if row.get("guest_key"):
+            self.ids_by_guest_key[row["guest_key"]] = row["id"]
+        for term in rsvp_search_terms(row):
+            for node in self._path(term):
+                node[""].add(row["id"])
+    
+    def remove(self, rsvp_id: str):
+        row = self.rows.pop(rsvp_id, None)
+        if row is None:
+            return
+        self.ids_by_guest_key.pop(row.get("guest_key"), None)
+        for term in rsvp_search_terms(row):
+            for node in self._path(term):
+                node[""].discard(rsvp_id)
+    
+    def search(self, tokens: List[str]) -> List[dict]:
+        matches = None
+        for token in tokens:
+            node = self._find(token)
+            ids = node[""] if node is not None else set()
+            matches = set(ids) if matches is None else matches & ids
+            if not matches:
+                return []
+        return [self.rows[rsvp_id] for rsvp_id in matches]
+
+class RSVPSearchCache:
+    """LRU of guest tries for the weddings being searched right now"""
+    
+    def __init__(self, max_weddings: int):
+        self.max_weddings = max_weddings
+        self.tries = OrderedDict()
+        self.too_large = {}  # wedding_id -> monotonic time until which it isn't worth trying
+    
+    def is_too_large(self, wedding_id: str) -> bool:
+        return self.too_large.get(wedding_id, 0) > time.monotonic()
+    
+    def mark_too_large(self, wedding_id: str):
+        if len(self.too_large) >= 10000:
+            self.too_large.clear()
+        self.too_large[wedding_id] = time.monotonic() + RSVP_SEARCH_TOO_LARGE_TTL_SECONDS
+    
+    def get(self, wedding_id: str) -> Optional[GuestTrie]:
+        trie = self.tries.get(wedding_id)
+        if trie is not None and time.monotonic() - trie.built_at > RSVP_SEARCH_CACHE_TTL_SECONDS:
+            # Other workers may have written RSVPs we never saw
+            del self.tries[wedding_id]
+            trie = None
+        record_cache("rsvp_search", trie is not None)
+        if trie is not None:
+            self.tries.move_to_end(wedding_id)
+        return trie
+    
+    def put(self, wedding_id: str, trie: GuestTrie):
+        self.tries[wedding_id] = trie
+        self.tries.move_to_end(wedding_id)
+        while len(self.tries) > self.max_weddings:
+            self.tries.popitem(last=False)
+    
+    def record(self, rsvp_dict: dict):
+        """Keep a cached trie current after a local RSVP write"""
+        trie = self.tries.get(rsvp_dict.get("wedding_id"))
+        if trie is None:
+            return
+        row = {k: rsvp_dict.get(k) for k in RSVP_SEARCH_FIELDS}
+        row["guest_key"] = rsvp_dict.get("guest_key")
+        # The guest's earlier RSVP may be cached under the random id it was stored with
+        previous_id = trie.ids_by_guest_key.get(row["guest_key"])
+        if previous_id is not None and previous_id != row["id"]:
+            trie.remove(previous_id)
+        trie.add(row)
+
+rsvp_search_cache = RSVPSearchCache(RSVP_SEARCH_CACHE_WEDDINGS)
+
+async def load_guest_trie(wedding_id: str) -> Optional[GuestTrie]:
+    """Build a trie for a wedding, or None if it has too many RSVPs to cache"""
+    if rsvp_search_cache.is_too_large(wedding_id):
+        return None
+    rsvps_collection = db.database.rsvps
+    # Counting on the wedding_id index is cheap; reading 5001 rows to find out isn't
+    count = await rsvps_collection.count_documents({"wedding_id": wedding_id}, limit=RSVP_SEARCH_CACHE_MAX_ROWS + 1)
+    if count > RSVP_SEARCH_CACHE_MAX_ROWS:
+        rsvp_search_cache.mark_too_large(wedding_id)
+        return None
+    projection = {"_id": 0, "guest_key": 1, **RSVP_SEARCH_FIELDS}
+    rows = await rsvps_collection.find({"wedding_id": wedding_id}, projection).to_list(
+        length=RSVP_SEARCH_CACHE_MAX_ROWS + 1
+    )
+    trie = GuestTrie()
+    for row in rows:
+        trie.add(row)
+    rsvp_search_cache.put(wedding_id, trie)
+    return trie
+
+@api_router.get("/rsvp/{wedding_id}/search")
+async def search_wedding_rsvps(
+    wedding_id: str,
+    q: str = Query(..., min_length=1),
+    limit: int = Query(RSVP_SEARCH_DEFAULT_LIMIT, ge=1, le=RSVP_SEARCH_MAX_LIMIT),
+    offset: int = Query(0, ge=0),
+):
+    """Find guests by name, email or phone prefix within a wedding"""
+    tokens = [token[:RSVP_SEARCH_MAX_PREFIX] for token in search_tokens(q)]
+    if not tokens:
+        return {"success": True, "rsvps": [], "count": 0, "has_more": False}
+    
+    trie = rsvp_search_cache.get(wedding_id) or await load_guest_trie(wedding_id)
+    if trie is not None:
+        matches = sorted(trie.search(tokens), key=lambda row: (row.get("guest_name") or "").casefold())
+        page = matches[offset:offset + limit + 1]
+        page = [{k: v for k, v in row.items() if k != "guest_key"} for row in page]
+    else:
+        # Too large to cache: bounded scan of the (wedding_id, search_prefixes) index
+        rsvps_collection = db.database.rsvps
+        page = await rsvps_collection.find(
+            {"wedding_id": wedding_id, "search_prefixes": {"$all": tokens}},
+            {"_id": 0, **RSVP_SEARCH_FIELDS}
+        ).sort("guest_name", 1).skip(offset).limit(limit + 1).to_list(length=limit + 1)
+    
+    has_more = len(page) > limit
+    page = page[:limit]
+    return {"success": True, "rsvps": page, "count": len(page), "has_more": has_more}
+
+async def backfill_rsvp_search_prefixes(batch_size: int = 500):
+    """Give RSVPs written before guest search existed their search prefixes"""
+    rsvps_collection = db.database.rsvps
+    cursor = rsvps_collection.find(
+        {"search_prefixes": {"$exists": False}},
+        {"_id": 1, "guest_name": 1, "guest_email": 1, "guest_phone": 1}
+    ).batch_size(batch_size)
+    operations = []
+    try:
+        async for rsvp in cursor:
+            operations.append(UpdateOne(
+                {"_id": rsvp["_id"]}, {"$set": {"search_prefixes": rsvp_search_prefixes(rsvp)}}
+            ))
+            if len(operations) >= batch_size:
+                await rsvps_collection.bulk_write(operations, ordered=False)
+                operations = []
+        if operations:
+            await rsvps_collection.bulk_write(operations, ordered=False)
+    except Exception as e:
+        logger.warning("⚠️ Failed to backfill RSVP search prefixes: %s", e)
+
+async def backfill_wedding_item_ids():
+    """Give list items saved before the item endpoints existed an id they can be addressed by"""
+    users_coll, weddings_coll = await get_collections()
+    missing = {"$or": [{field: {"$elemMatch": {"id": None}}} for field in WEDDING_ITEM_MODELS]}
+    try:
+        async for wedding in weddings_coll.find(missing, {"_id": 0, "user_id": 1, **{field: 1 for field in WEDDING_ITEM_MODELS}}):
+            lists = {field: wedding[field] for field in WEDDING_ITEM_MODELS if isinstance(wedding.get(field), list)}
+            try:
+                # Matching on the lists as read means a concurrent edit wins; it gets ids as it's written
+                await update_wedding_section(
+                    wedding["user_id"],
+                    {"$set": with_wedding_item_ids(copy.deepcopy(lists))},
+                    projection={"_id": 0, "id": 1, "version": 1},
+                    match=lists,
+                )
+            except HTTPException:
+                continue
+    except Exception as e:
+        logger.warning("⚠️ Failed to backfill wedding item ids: %s", e)
+
 # Guestbook Models
 class GuestbookMessage(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -827,13 +2719,157 @@ class GuestbookMessage(BaseModel):
     relationship: Optional[str] = ""
     message: str
     is_public: bool = True  # True for public landing page, False for private dashboard
+    moderation_state: str = "approved"  # "pending", "approved" or "rejected"
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
+# Guestbook Pagination
+GUESTBOOK_DEFAULT_PAGE_SIZE = 50
+GUESTBOOK_MAX_PAGE_SIZE = 200
+
+def encode_guestbook_cursor(message: dict) -> str:
+    raw = json.dumps([message["created_at"], message["id"]], default=str)
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+def decode_guestbook_cursor(cursor: str) -> tuple:
+    try:
+        created_at, message_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return str(created_at), str(message_id)
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid pagination cursor"
+        )
+
+async def paginate_guestbook(query: dict, limit: int, before: Optional[str], after: Optional[str]) -> dict:
+    """Keyset page of guestbook messages, newest first.
+    
+    ``before`` pages towards older messages, ``after`` towards newer ones (e.g.
+    polling for new posts). Returns the page plus cursors for both directions;
+    count is the page size. total_count (every message the query matches) is only
+    counted for the first page and is None on cursor pages.
+    """
+    if before and after:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Use either before or after, not both"
+        )
+    
+    page_query = dict(query)
+    direction = -1
+    if before:
+        created_at, message_id = decode_guestbook_cursor(before)
+        page_query["$or"] = [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "id": {"$lt": message_id}}
+        ]
+    elif after:
+        created_at, message_id = decode_guestbook_cursor(after)
+        page_query["$or"] = [
+            {"created_at": {"$gt": created_at}},
+            {"created_at": created_at, "id": {"$gt": message_id}}
+        ]
+        # Walk upwards from the cursor, then flip back to newest-first
+        direction = 1
+    
+    guestbook_collection = db.database.guestbook
+    page = guestbook_collection.find(page_query, {"_id": 0}).sort(
+        [("created_at", direction), ("id", direction)]
+    ).limit(limit + 1).to_list(length=limit + 1)
+    if before or after:
+        messages, total_count = await page, None
+    else:
+        messages, total_count = await asyncio.gather(page, guestbook_collection.count_documents(query))
+    
+    has_more = len(messages) > limit
+    messages = messages[:limit]
+    if direction == 1:
+        messages.reverse()
+    return guestbook_page(messages, has_more, total_count, before, after)
+
+def guestbook_page(messages: List[dict], has_more: bool, total_count: Optional[int], before: Optional[str] = None,
+                   after: Optional[str] = None) -> dict:
+    return {
+        "success": True,
+        "messages": messages,
+        "total_count": total_count,
+        "count": len(messages),
+        "has_more": has_more,
+        # Older page: continue below the last message; newer page: above the first
+        "next_cursor": encode_guestbook_cursor(messages[-1]) if messages else before,
+        "prev_cursor": encode_guestbook_cursor(messages[0]) if messages else after,
+    }
+
+# Public Guestbook Feed (landing page)
+PUBLIC_FEED_SIZE = int(os.getenv("PUBLIC_FEED_SIZE", "100"))
+PUBLIC_FEED_RESEED_SECONDS = int(os.getenv("PUBLIC_FEED_RESEED_SECONDS", "60"))
+
+class PublicGuestbookFeed:
+    """Ring buffer of the newest public guestbook messages, newest first"""
+    
+    def __init__(self, size: int):
+        self.size = size
+        self.messages = deque(maxlen=size)
+        self.total_count = 0  # every public message, kept current between reseeds
+        self.seeded = False
+    
+    async def seed(self):
+        guestbook_collection = db.database.guestbook
+        query = {"is_public": True, "moderation_state": "approved"}
+        messages, total_count = await asyncio.gather(
+            guestbook_collection.find(query, {"_id": 0}).sort(
+                [("created_at", -1), ("id", -1)]
+            ).limit(self.size).to_list(length=self.size),
+            guestbook_collection.count_documents(query),
+        )
+        self.messages = deque(messages, maxlen=self.size)
+        self.total_count = total_count
+        self.seeded = True
+    
+    def add(self, message: dict):
+        if self.seeded:
+            self.messages.appendleft({k: v for k, v in message.items() if k != "_id"})
+            self.total_count += 1
+    
+    def page(self, limit: int) -> Optional[dict]:
+        """First page from memory, or None if the buffer can't answer it"""
+        if not self.seeded or limit > self.size:
+            return None
+        messages = list(itertools.islice(self.messages, limit + 1))
+        # A full buffer may have older messages behind it in Mongo
+        has_more = len(messages) > limit or len(self.messages) == self.size
+        return guestbook_page(messages[:limit], has_more, self.total_count)
+
+public_guestbook_feed = PublicGuestbookFeed(PUBLIC_FEED_SIZE)
+
+def publish_guestbook_message(message: dict):
+    """Surface a newly visible message in the public feed, search and event stream"""
+    if message.get("is_public"):
+        public_guestbook_feed.add(message)
+    guestbook_search_cache.invalidate(message.get("wedding_id"))
+    publish_wedding_event("guestbook", message)
+
+guestbook_moderator = GuestbookModerator(
+    moderation.GUESTBOOK_MODERATION_WORKERS,
+    moderation.GUESTBOOK_MODERATION_BATCH_SIZE,
+    moderation.GUESTBOOK_MODERATION_FLUSH_MS,
+    publish_guestbook_message,
+)
+
+async def reseed_public_feed_periodically():
+    # Picks up public messages written by other workers
+    while True:
+        try:
+            await public_guestbook_feed.seed()
+        except Exception as e:
+            logger.warning("⚠️ Failed to seed public guestbook feed: %s", e)
+        await asyncio.sleep(PUBLIC_FEED_RESEED_SECONDS)
+
 # Guestbook Endpoints
 @api_router.post("/guestbook")
-async def create_guestbook_message(message_data: dict):
-    """Create a new guestbook message"""
+async def create_guestbook_message(message_data: dict, request: Request):
+    """Create a new guestbook message (published once moderation approves it)"""
     users_coll, weddings_coll = await get_collections()
+    await require_known_wedding(message_data.get('wedding_id', 'public'))
     
     # Determine if this is a public or private message
     # Public messages: wedding_id is 'public' or 'default'
@@ -846,18 +2882,28 @@ async def create_guestbook_message(message_data: dict):
         name=message_data.get('name', ''),
         relationship=message_data.get('relationship', ''),
         message=message_data.get('message', ''),
-        is_public=is_public
+        is_public=is_public,
+        moderation_state="pending" if GUESTBOOK_MODERATION else "approved"
     )
     
     # Convert to dict
-    message_dict = guestbook_message.dict()
+    message_dict = guestbook_message.model_dump()
     message_dict["created_at"] = message_dict["created_at"].isoformat()
     
     # Store message in guestbook collection
-    guestbook_collection = database.guestbook
+    guestbook_collection = db.database.guestbook
     await guestbook_collection.insert_one(message_dict)
+    if GUESTBOOK_MODERATION:
+        guestbook_moderator.submit(message_dict, client_ip_of(request))
+    else:
+        publish_guestbook_message(message_dict)
     
-    return {"success": True, "message": "Guestbook message added successfully", "message_id": guestbook_message.id}
+    return {
+        "success": True,
+        "message": "Guestbook message added successfully",
+        "message_id": guestbook_message.id,
+        "moderation_state": guestbook_message.moderation_state
+    }
 
 @api_router.post("/guestbook/private")
 async def create_private_guestbook_message(message_data: dict):
@@ -890,71 +2936,70 @@ async def create_private_guestbook_message(message_data: dict):
     )
     
     # Convert to dict
-    message_dict = guestbook_message.dict()
+    message_dict = guestbook_message.model_dump()
     message_dict["created_at"] = message_dict["created_at"].isoformat()
     
     # Store message in guestbook collection
-    guestbook_collection = database.guestbook
+    guestbook_collection = db.database.guestbook
     await guestbook_collection.insert_one(message_dict)
+    publish_guestbook_message(message_dict)
     
     return {"success": True, "message": "Private guestbook message added successfully", "message_id": guestbook_message.id}
 
 @api_router.get("/guestbook/{wedding_id}")
-async def get_guestbook_messages(wedding_id: str):
-    """Get all guestbook messages for a specific wedding"""
+async def get_guestbook_messages(
+    wedding_id: str,
+    limit: int = Query(GUESTBOOK_DEFAULT_PAGE_SIZE, ge=1, le=GUESTBOOK_MAX_PAGE_SIZE),
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+):
+    """Get guestbook messages for a specific wedding, one page at a time"""
     users_coll, weddings_coll = await get_collections()
     
-    # Get messages for this wedding
-    guestbook_collection = database.guestbook
-    messages = await guestbook_collection.find({"wedding_id": wedding_id}).sort("created_at", -1).to_list(length=None)
-    
-    # Remove _id from response and format dates
-    response_data = []
-    for msg in messages:
-        clean_msg = {k: v for k, v in msg.items() if k != "_id"}
-        response_data.append(clean_msg)
-    
-    return {"success": True, "messages": response_data, "total_count": len(response_data)}
+    return await paginate_guestbook(
+        {"wedding_id": wedding_id, "moderation_state": "approved"}, limit, before, after
+    )
 
 @api_router.get("/guestbook/public/messages")
-async def get_public_guestbook_messages():
-    """Get all public guestbook messages (for landing page)"""
+async def get_public_guestbook_messages(
+    limit: int = Query(GUESTBOOK_DEFAULT_PAGE_SIZE, ge=1, le=GUESTBOOK_MAX_PAGE_SIZE),
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+):
+    """Get public guestbook messages (for landing page), one page at a time"""
     users_coll, weddings_coll = await get_collections()
     
-    # Get public messages only
-    guestbook_collection = database.guestbook
-    messages = await guestbook_collection.find({"is_public": True}).sort("created_at", -1).to_list(length=None)
-    
-    # Remove _id from response
-    response_data = []
-    for msg in messages:
-        clean_msg = {k: v for k, v in msg.items() if k != "_id"}
-        response_data.append(clean_msg)
+    # The landing page's first page comes straight from the in-memory feed
+    if not before and not after:
+        page = public_guestbook_feed.page(limit)
+        if page is not None:
+            return page
     
-    return {"success": True, "messages": response_data, "total_count": len(response_data)}
+    return await paginate_guestbook(
+        {"is_public": True, "moderation_state": "approved"}, limit, before, after
+    )
 
 @api_router.get("/guestbook/private/{user_wedding_id}")
-async def get_private_guestbook_messages(user_wedding_id: str):
+async def get_private_guestbook_messages(
+    user_wedding_id: str,
+    limit: int = Query(GUESTBOOK_DEFAULT_PAGE_SIZE, ge=1, le=GUESTBOOK_MAX_PAGE_SIZE),
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+):
     """Get private guestbook messages for a specific user's wedding (dashboard)"""
     users_coll, weddings_coll = await get_collections()
     
-    # Get private messages for this specific wedding
-    guestbook_collection = database.guestbook
-    messages = await guestbook_collection.find({
-        "wedding_id": user_wedding_id, 
-        "is_public": False
-    }).sort("created_at", -1).to_list(length=None)
-    
-    # Remove _id from response
-    response_data = []
-    for msg in messages:
-        clean_msg = {k: v for k, v in msg.items() if k != "_id"}
-        response_data.append(clean_msg)
-    
-    return {"success": True, "messages": response_data, "total_count": len(response_data)}
+    return await paginate_guestbook(
+        {"wedding_id": user_wedding_id, "is_public": False}, limit, before, after
+    )
 
 @api_router.get("/guestbook/shareable/{shareable_id}")  
-async def get_guestbook_by_shareable_id(shareable_id: str):
+async def get_guestbook_by_shareable_id(
+    shareable_id: str,
+    limit: int = Query(GUESTBOOK_DEFAULT_PAGE_SIZE, ge=1, le=GUESTBOOK_MAX_PAGE_SIZE),
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+):
     """Get guestbook messages using shareable ID"""
     users_coll, weddings_coll = await get_collections()
     
@@ -967,21 +3012,278 @@ async def get_guestbook_by_shareable_id(shareable_id: str):
             detail="Wedding not found"
         )
     
-    # Get guestbook messages for this wedding
-    guestbook_collection = database.guestbook
-    messages = await guestbook_collection.find({"wedding_id": wedding["id"]}).sort("created_at", -1).to_list(length=None)
+    return await paginate_guestbook(
+        {"wedding_id": wedding["id"], "moderation_state": "approved"}, limit, before, after
+    )
+
+# Guestbook Reactions
+REACTION_TYPES = ("like", "love")
+REACTION_SHARDS = int(os.getenv("REACTION_SHARDS", "8"))
+REACTION_ROLLUP_SECONDS = int(os.getenv("REACTION_ROLLUP_SECONDS", "5"))
+REACTION_DEDUP_CAPACITY = 1_000_000  # per generation; two are kept
+REACTABLE_MESSAGE_CACHE_SIZE = 10000
+# Cookie-less clients get a guest token; past this many per IP an hour they share the IP's identity
+GUEST_TOKENS_PER_IP_PER_HOUR = int(os.getenv("GUEST_TOKENS_PER_IP_PER_HOUR", "50"))
+
+class ReactionTracker:
+    """Per-guest reaction dedup and the set of messages awaiting roll-up.
+    
+    Dedup uses two generations of Bloom filters: when the current one fills up it
+    becomes the previous one, so the latest reactions are always remembered. A tiny
+    fraction of first-time reactions may be treated as repeats.
+    """
     
-    # Remove _id from response
-    response_data = []
-    for msg in messages:
-        clean_msg = {k: v for k, v in msg.items() if k != "_id"}
-        response_data.append(clean_msg)
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.current = BloomFilter(capacity)
+        self.previous = BloomFilter(capacity)
+        self.current_count = 0
+        self.dirty = set()
+        self.reactable = OrderedDict()  # approved message ids we've already checked
+    
+    def first_reaction(self, guest_key: str, message_id: str, reaction: str) -> bool:
+        key = f"{guest_key}|{message_id}|{reaction}"
+        if key in self.current or key in self.previous:
+            return False
+        if self.current_count >= self.capacity:
+            self.previous = self.current
+            self.current = BloomFilter(self.capacity)
+            self.current_count = 0
+        self.current.add(key)
+        self.current_count += 1
+        return True
     
-    return {"success": True, "messages": response_data, "total_count": len(response_data)}
+    async def is_reactable(self, message_id: str) -> bool:
+        if message_id in self.reactable:
+            self.reactable.move_to_end(message_id)
+            return True
+        guestbook_collection = db.database.guestbook
+        found = await guestbook_collection.find_one(
+            {"id": message_id, "moderation_state": "approved"}, {"_id": 1}
+        )
+        if not found:
+            return False
+        self.reactable[message_id] = True
+        if len(self.reactable) > REACTABLE_MESSAGE_CACHE_SIZE:
+            self.reactable.popitem(last=False)
+        return True
+
+reaction_tracker = ReactionTracker(REACTION_DEDUP_CAPACITY)
+guest_tokens_by_ip = RecentWindow(3600)
+
+def reaction_guest_key(request: Request, response: Response) -> str:
+    """Dedup identity: the signed guest token, minting one for a client without it"""
+    guest_id = guest_id_of(request.cookies.get(GUEST_TOKEN_COOKIE))
+    if guest_id:
+        return f"guest:{guest_id}"
+    client_ip = client_ip_of(request) or ""
+    if len(guest_tokens_by_ip.hit(client_ip)) > GUEST_TOKENS_PER_IP_PER_HOUR:
+        # A client discarding its cookie to react again only gets the IP's one vote
+        return f"ip:{client_ip}"
+    guest_id, token = issue_guest_token()
+    response.set_cookie(
+        GUEST_TOKEN_COOKIE, token, max_age=GUEST_TOKEN_MAX_AGE_SECONDS, httponly=True, samesite="lax"
+    )
+    return f"guest:{guest_id}"
+
+async def rollup_reactions():
+    """Sum the counter shards of recently reacted messages into each message"""
+    if not reaction_tracker.dirty:
+        return
+    message_ids = list(reaction_tracker.dirty)
+    reaction_tracker.dirty.clear()
+    
+    totals = {}
+    try:
+        async for row in db.database.guestbook_reactions.aggregate([
+            {"$match": {"message_id": {"$in": message_ids}}},
+            {"$group": {"_id": {"message_id": "$message_id", "reaction": "$reaction"}, "count": {"$sum": "$count"}}}
+        ]):
+            totals.setdefault(row["_id"]["message_id"], {})[row["_id"]["reaction"]] = row["count"]
+        if totals:
+            await db.database.guestbook.bulk_write([
+                UpdateOne({"id": message_id}, {"$set": {"reactions": reactions}})
+                for message_id, reactions in totals.items()
+            ], ordered=False)
+    except Exception as e:
+        reaction_tracker.dirty.update(message_ids)
+        logger.warning("⚠️ Failed to roll up guestbook reactions: %s", e)
+        return
+    
+    for message in public_guestbook_feed.messages:
+        if message.get("id") in totals:
+            message["reactions"] = totals[message["id"]]
+
+async def rollup_reactions_periodically():
+    while True:
+        await asyncio.sleep(REACTION_ROLLUP_SECONDS)
+        await rollup_reactions()
+
+@api_router.post("/guestbook/{message_id}/reactions")
+async def react_to_guestbook_message(message_id: str, reaction_data: dict, request: Request, response: Response):
+    """Add a reaction (e.g. a like) to an approved guestbook message"""
+    reaction = reaction_data.get('reaction', 'like')
+    if reaction not in REACTION_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported reaction. Allowed: {', '.join(REACTION_TYPES)}"
+        )
+    if not await reaction_tracker.is_reactable(message_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Guestbook message not found"
+        )
+    
+    guest_key = reaction_guest_key(request, response)
+    if not reaction_tracker.first_reaction(guest_key, message_id, reaction):
+        return {"success": True, "message": "Reaction already recorded", "counted": False}
+    
+    # Spread increments over counter shards so a popular message isn't a write hotspot
+    shard = random.randrange(REACTION_SHARDS)
+    await db.database.guestbook_reactions.update_one(
+        {"_id": f"{message_id}:{reaction}:{shard}"},
+        {
+            "$inc": {"count": 1},
+            "$setOnInsert": {"message_id": message_id, "reaction": reaction, "shard": shard}
+        },
+        upsert=True
+    )
+    reaction_tracker.dirty.add(message_id)
+    return {"success": True, "message": "Reaction recorded", "counted": True}
+
+@api_router.get("/guestbook/{message_id}/reactions")
+async def get_guestbook_message_reactions(message_id: str):
+    """Approximate reaction counts as of the last roll-up"""
+    guestbook_collection = db.database.guestbook
+    message = await guestbook_collection.find_one(
+        {"id": message_id, "moderation_state": "approved"}, {"_id": 0, "id": 1, "reactions": 1}
+    )
+    if not message:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Guestbook message not found"
+        )
+    return {"success": True, "message_id": message_id, "reactions": message.get("reactions", {})}
+
+# Guestbook Search
+GUESTBOOK_SEARCH_BACKEND = os.getenv("GUESTBOOK_SEARCH_BACKEND", "mongo")  # "mongo" or "memory"
+GUESTBOOK_SEARCH_WEIGHTS = {"name": 3, "relationship": 2, "message": 1}
+GUESTBOOK_SEARCH_DEFAULT_LIMIT = 20
+GUESTBOOK_SEARCH_MAX_LIMIT = 100
+GUESTBOOK_SEARCH_CACHE_WEDDINGS = 32
+GUESTBOOK_SEARCH_CACHE_MAX_MESSAGES = 10000
+GUESTBOOK_SEARCH_CACHE_TTL_SECONDS = 60
+PHRASE_PATTERN = re.compile(r'"([^"]+)"')
+
+def parse_search_query(q: str) -> tuple:
+    """Split a query into quoted phrases and loose terms, Mongo $text style"""
+    phrases = [search_tokens(phrase) for phrase in PHRASE_PATTERN.findall(q)]
+    phrases = [phrase for phrase in phrases if phrase]
+    terms = set(search_tokens(q))
+    return terms, phrases
+
+def contains_phrase(tokens: List[str], phrase: List[str]) -> bool:
+    width = len(phrase)
+    return any(tokens[i:i + width] == phrase for i in range(len(tokens) - width + 1))
+
+class GuestbookInvertedIndex:
+    """Weighted inverted index over one wedding's approved guestbook messages"""
+    
+    def __init__(self, messages: List[dict]):
+        self.messages = {message["id"]: message for message in messages}
+        self.postings = {}  # token -> {message id: weighted term frequency}
+        self.field_tokens = {}  # message id -> [token lists per field], for phrases
+        self.built_at = time.monotonic()
+        for message in messages:
+            fields = [search_tokens(message.get(field)) for field in GUESTBOOK_SEARCH_WEIGHTS]
+            self.field_tokens[message["id"]] = fields
+            for tokens, weight in zip(fields, GUESTBOOK_SEARCH_WEIGHTS.values()):
+                for token in tokens:
+                    posting = self.postings.setdefault(token, {})
+                    posting[message["id"]] = posting.get(message["id"], 0) + weight
+    
+    def search(self, q: str) -> List[tuple]:
+        """(score, message) pairs matching any term and every phrase, best first"""
+        terms, phrases = parse_search_query(q)
+        scores = {}
+        total = max(len(self.messages), 1)
+        for term in terms:
+            posting = self.postings.get(term, {})
+            if not posting:
+                continue
+            idf = math.log(1 + total / len(posting))
+            for message_id, frequency in posting.items():
+                scores[message_id] = scores.get(message_id, 0) + frequency * idf
+        
+        results = []
+        for message_id, score in scores.items():
+            fields = self.field_tokens[message_id]
+            if all(any(contains_phrase(tokens, phrase) for tokens in fields) for phrase in phrases):
+                results.append((score, self.messages[message_id]))
+        # Newest first among equally relevant messages
+        results.sort(key=lambda pair: pair[1].get("created_at", ""), reverse=True)
+        results.sort(key=lambda pair: pair[0], reverse=True)
+        return results
+
+class GuestbookSearchCache:
+    """LRU of inverted indexes for weddings searched recently"""
+    
+    def __init__(self, max_weddings: int):
+        self.max_weddings = max_weddings
+        self.indexes = OrderedDict()
+    
+    def invalidate(self, wedding_id: Optional[str]):
+        self.indexes.pop(wedding_id, None)
+    
+    async def get(self, wedding_id: str) -> GuestbookInvertedIndex:
+        index = self.indexes.get(wedding_id)
+        if index is not None and time.monotonic() - index.built_at < GUESTBOOK_SEARCH_CACHE_TTL_SECONDS:
+            record_cache("guestbook_search", True)
+            self.indexes.move_to_end(wedding_id)
+            return index
+        record_cache("guestbook_search", False)
+        
+        guestbook_collection = db.database.guestbook
+        messages = await guestbook_collection.find(
+            {"wedding_id": wedding_id, "moderation_state": "approved"}, {"_id": 0}
+        ).sort([("created_at", -1), ("id", -1)]).to_list(length=GUESTBOOK_SEARCH_CACHE_MAX_MESSAGES)
+        index = GuestbookInvertedIndex(messages)
+        self.indexes[wedding_id] = index
+        self.indexes.move_to_end(wedding_id)
+        while len(self.indexes) > self.max_weddings:
+            self.indexes.popitem(last=False)
+        return index
+
+guestbook_search_cache = GuestbookSearchCache(GUESTBOOK_SEARCH_CACHE_WEDDINGS)
+
+@api_router.get("/guestbook/{wedding_id}/search")
+async def search_guestbook_messages(
+    wedding_id: str,
+    q: str = Query(..., min_length=1),
+    limit: int = Query(GUESTBOOK_SEARCH_DEFAULT_LIMIT, ge=1, le=GUESTBOOK_SEARCH_MAX_LIMIT),
+    offset: int = Query(0, ge=0),
+):
+    """Relevance-ranked search over a wedding's guestbook by name, relationship or phrase"""
+    if GUESTBOOK_SEARCH_BACKEND == "memory":
+        index = await guestbook_search_cache.get(wedding_id)
+        ranked = index.search(q)[offset:offset + limit + 1]
+        page = [{**message, "score": round(score, 4)} for score, message in ranked]
+    else:
+        guestbook_collection = db.database.guestbook
+        page = await guestbook_collection.find(
+            {"wedding_id": wedding_id, "moderation_state": "approved", "$text": {"$search": q}},
+            {"_id": 0, "score": {"$meta": "textScore"}}
+        ).sort([("score", {"$meta": "textScore"})]).skip(offset).limit(limit + 1).to_list(length=limit + 1)
+    
+    has_more = len(page) > limit
+    page = page[:limit]
+    return {"success": True, "messages": page, "count": len(page), "has_more": has_more}
 
 # Wedding Party Management Endpoints
+WEDDING_PARTY_FIELDS = ("bridal_party", "groom_party", "special_roles")
+
 @api_router.put("/wedding/party")
-async def update_wedding_party(request_data: dict):
+async def update_wedding_party(request_data: dict, if_match: Optional[str] = Header(None, alias="If-Match")):
     """Update wedding party data (bridal_party, groom_party, special_roles)"""
     session_id = request_data.get('session_id')
     if not session_id:
@@ -991,93 +3293,718 @@ async def update_wedding_party(request_data: dict):
         )
     
     current_user = await get_current_user_simple(session_id)
-    users_coll, weddings_coll = await get_collections()
     
-    # Find existing wedding
-    existing_wedding = await weddings_coll.find_one({"user_id": current_user.id})
-    if not existing_wedding:
+    # Prepare update data with only wedding party fields
+    update_fields = validate_wedding_sections({field: request_data[field] for field in WEDDING_PARTY_FIELDS if field in request_data})
+    
+    updated_wedding = await update_wedding_section(current_user.id, {"$set": update_fields}, parse_if_match(if_match))
+    return {"success": True, "wedding_data": updated_wedding}
+
+# FAQ Management Endpoints
+@api_router.put("/wedding/faq")
+async def update_wedding_faq(request_data: dict, if_match: Optional[str] = Header(None, alias="If-Match")):
+    """Update FAQ data for a wedding"""
+    session_id = request_data.get('session_id')
+    if not session_id:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Wedding data not found"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Session ID required"
         )
     
-    # Prepare update data with only wedding party fields
+    current_user = await get_current_user_simple(session_id)
+    
+    # Prepare update data with FAQ fields
     update_fields = {}
-    if 'bridal_party' in request_data:
-        update_fields['bridal_party'] = request_data['bridal_party']
-    if 'groom_party' in request_data:
-        update_fields['groom_party'] = request_data['groom_party']
-    if 'special_roles' in request_data:
-        update_fields['special_roles'] = request_data['special_roles']
-    
-    update_fields["updated_at"] = datetime.utcnow().isoformat()
-    
-    # Update in MongoDB
-    await weddings_coll.update_one(
-        {"user_id": current_user.id},
-        {"$set": update_fields}
+    if 'faqs' in request_data:
+        update_fields['faqs'] = request_data['faqs']
+    update_fields = validate_wedding_sections(update_fields)
+    
+    updated_wedding = await update_wedding_section(current_user.id, {"$set": update_fields}, parse_if_match(if_match))
+    return {"success": True, "wedding_data": updated_wedding}
+
+# List item endpoints: add/edit/remove/reorder one entry of a wedding list by its id
+WEDDING_LIST_FIELDS = (
+    "story_timeline", "schedule_events", "gallery_photos", "registry_items",
+    "faqs", "bridal_party", "groom_party", "special_roles",
+)
+
+def wedding_list_field(field: str) -> str:
+    if field not in WEDDING_LIST_FIELDS:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Unknown wedding list '{field}'"
+        )
+    return field
+
+async def read_list_item(request: Request) -> dict:
+    try:
+        item = await request.json()
+    except ValueError:
+        item = None
+    if not isinstance(item, dict):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Request body must be a JSON object"
+        )
+    return item
+
+def item_id_values(item_id) -> list:
+    """Every stored form of an id: older clients wrote ints, but paths always carry strings"""
+    item_id = str(item_id)
+    if item_id.isdigit() and str(int(item_id)) == item_id:
+        return [item_id, int(item_id)]
+    return [item_id]
+
+def item_id_condition(item_id) -> Union[str, dict]:
+    values = item_id_values(item_id)
+    return values[0] if len(values) == 1 else {"$in": values}
+
+def list_item_not_found(field: str, item_id: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail=f"No item '{item_id}' in {field}"
     )
+
+def list_item_response(updated_wedding: dict, field: str) -> dict:
+    items = updated_wedding.get(field) or []
+    return {"success": True, "item": items[0] if items else None, "version": updated_wedding.get("version")}
+
+@api_router.post("/wedding/{field}/items")
+async def add_wedding_list_item(
+    field: str,
+    request: Request,
+    session_id: str,
+    position: Optional[int] = Query(None, ge=0),
+    if_match: Optional[str] = Header(None, alias="If-Match"),
+):
+    """Append (or insert at position) one item, giving it an id if it has none"""
+    field = wedding_list_field(field)
+    current_user = await get_current_user_simple(session_id)
+    item = await read_list_item(request)
+    item["id"] = str(item.get("id") or uuid.uuid4())
+    item = validate_wedding_item(field, item)
     
-    # Get updated wedding data
-    updated_wedding = await weddings_coll.find_one({"user_id": current_user.id})
+    push = {"$each": [item]}
+    if position is not None:
+        push["$position"] = position
+    updated_wedding = await update_wedding_section(
+        current_user.id,
+        {"$push": {field: push}},
+        parse_if_match(if_match),
+        projection={"_id": 0, "id": 1, "version": 1, field: {"$elemMatch": {"id": item["id"]}}},
+        match={f"{field}.id": {"$nin": item_id_values(item["id"])}},
+        match_failure=HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"{field} already has an item '{item['id']}'"
+        )
+    )
+    return list_item_response(updated_wedding, field)
+
+@api_router.patch("/wedding/{field}/items/{item_id}")
+async def update_wedding_list_item(
+    field: str,
+    item_id: str,
+    request: Request,
+    session_id: str,
+    if_match: Optional[str] = Header(None, alias="If-Match"),
+):
+    """Change some fields of one item in place with a positional $set"""
+    field = wedding_list_field(field)
+    current_user = await get_current_user_simple(session_id)
+    changes = {k: v for k, v in (await read_list_item(request)).items() if k != "id"}
+    if not changes:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No item fields to update"
+        )
+    changes = validate_wedding_item(field, changes)
     
-    # Also update JSON backup
-    weddings = load_json_file(WEDDINGS_FILE)
-    if updated_wedding["id"] in weddings:
-        weddings[updated_wedding["id"]].update(update_fields)
-        save_json_file(WEDDINGS_FILE, weddings)
+    updated_wedding = await update_wedding_section(
+        current_user.id,
+        {"$set": {f"{field}.$.{key}": value for key, value in changes.items()}},
+        parse_if_match(if_match),
+        projection={"_id": 0, "id": 1, "version": 1, field: {"$elemMatch": {"id": item_id_condition(item_id)}}},
+        match={f"{field}.id": item_id_condition(item_id)},
+        match_failure=list_item_not_found(field, item_id)
+    )
+    return list_item_response(updated_wedding, field)
+
+@api_router.delete("/wedding/{field}/items/{item_id}")
+async def delete_wedding_list_item(
+    field: str,
+    item_id: str,
+    session_id: str,
+    if_match: Optional[str] = Header(None, alias="If-Match"),
+):
+    field = wedding_list_field(field)
+    current_user = await get_current_user_simple(session_id)
     
-    # Remove _id from response
-    response_data = {k: v for k, v in updated_wedding.items() if k != "_id"}
-    return {"success": True, "wedding_data": response_data}
+    updated_wedding = await update_wedding_section(
+        current_user.id,
+        {"$pull": {field: {"id": item_id_condition(item_id)}}},
+        parse_if_match(if_match),
+        projection={"_id": 0, "id": 1, "version": 1},
+        match={f"{field}.id": item_id_condition(item_id)},
+        match_failure=list_item_not_found(field, item_id)
+    )
+    return {"success": True, "version": updated_wedding.get("version")}
 
-# FAQ Management Endpoints
-@api_router.put("/wedding/faq")
-async def update_wedding_faq(request_data: dict):
-    """Update FAQ data for a wedding"""
+@api_router.put("/wedding/{field}/order")
+async def reorder_wedding_list(
+    field: str,
+    request_data: dict,
+    session_id: str,
+    if_match: Optional[str] = Header(None, alias="If-Match"),
+):
+    """Reorder a list given its item ids; unlisted items keep their order at the end"""
+    field = wedding_list_field(field)
+    order = request_data.get("order")
+    if not isinstance(order, list):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="order must be a list of item ids"
+        )
+    current_user = await get_current_user_simple(session_id)
+    users_coll, weddings_coll = await get_collections()
+    
+    # Reordering needs the items themselves; the version check turns a concurrent
+    # edit between this read and the write into a 412 rather than a lost update
+    expected_version = parse_if_match(if_match)
+    wedding = await weddings_coll.find_one(
+        wedding_version_query(current_user.id, expected_version),
+        {"_id": 0, "version": 1, field: 1}
+    )
+    if not wedding:
+        await raise_wedding_write_failure(weddings_coll, current_user.id, expected_version)
+    
+    items = wedding.get(field) or []
+    rank = {str(item_id): index for index, item_id in enumerate(order)}
+    reordered = sorted(items, key=lambda item: rank.get(str(item.get("id")) if isinstance(item, dict) else None, len(rank)))
+    
+    updated_wedding = await update_wedding_section(
+        current_user.id,
+        {"$set": {field: reordered}},
+        wedding.get("version") or 0,
+        projection={"_id": 0, "id": 1, "version": 1}
+    )
+    return {"success": True, "order": [item.get("id") for item in reordered if isinstance(item, dict)], "version": updated_wedding.get("version")}
+
+# Batched autosave: many section edits from the dashboard, written together
+AUTOSAVE_DEBOUNCE_MS = int(os.getenv("AUTOSAVE_DEBOUNCE_MS", "150"))
+AUTOSAVE_MAX_WAIT_MS = int(os.getenv("AUTOSAVE_MAX_WAIT_MS", "1000"))
+AUTOSAVE_MAX_OPERATIONS = 200
+BATCH_OPERATION_TYPES = ("set", "unset", "add_item", "update_item", "remove_item")
+
+def batch_operation_error(index: int, error: HTTPException) -> dict:
+    return {"index": index, "status": "failed", "code": error.status_code, "detail": error.detail}
+
+def compile_batch_operation(operation) -> dict:
+    """Turn one batch operation into a Mongo update fragment plus what it touches"""
+    if not isinstance(operation, dict) or operation.get("op") not in BATCH_OPERATION_TYPES:
+        raise patch_error(f"op must be one of {', '.join(BATCH_OPERATION_TYPES)}")
+    op, field = operation["op"], operation.get("field")
+    
+    if op in ("set", "unset"):
+        if not isinstance(field, str):
+            raise patch_error("field is required")
+        for depth, key in enumerate(field.split(".")):
+            check_patch_key(key, top_level=depth == 0)
+        if op == "set":
+            if "value" not in operation:
+                raise patch_error("set needs a value")
+            update = validate_wedding_update({"$set": {field: operation["value"]}})
+        else:
+            update = {"$unset": {field: ""}}
+        return {"update": update, "path": field, "match": {}, "supersedes": True}
+    
+    field = wedding_list_field(field)
+    if op == "add_item":
+        item = operation.get("item")
+        if not isinstance(item, dict):
+            raise patch_error("add_item needs an item object")
+        item = validate_wedding_item(field, {**item, "id": str(item.get("id") or uuid.uuid4())})
+        position = operation.get("position")
+        if position is not None and (not isinstance(position, int) or position < 0):
+            raise patch_error("position must be a non-negative integer")
+        push = {"$each": [item]} if position is None else {"$each": [item], "$position": position}
+        return {
+            "update": {"$push": {field: push}}, "path": field, "item_id": item["id"],
+            "match": {f"{field}.id": {"$nin": item_id_values(item["id"])}}, "supersedes": False,
+        }
+    
+    item_id = operation.get("id")
+    if isinstance(item_id, int) and not isinstance(item_id, bool):
+        item_id = str(item_id)
+    if not isinstance(item_id, str) or not item_id:
+        raise patch_error(f"{op} needs an item id")
+    if op == "update_item":
+        changes = {k: v for k, v in (operation.get("changes") or {}).items() if k != "id"}
+        if not changes:
+            raise patch_error("update_item needs changes")
+        for key in changes:
+            check_patch_key(key, top_level=False)
+        changes = validate_wedding_item(field, changes)
+        update = {"$set": {f"{field}.$.{key}": value for key, value in changes.items()}}
+    else:
+        update = {"$pull": {field: {"id": item_id_condition(item_id)}}}
+    return {"update": update, "path": field, "item_id": item_id, "match": {f"{field}.id": item_id_condition(item_id)}, "supersedes": False}
+
+def _paths_overlap(a: str, b: str) -> bool:
+    return a == b or a.startswith(b + ".") or b.startswith(a + ".")
+
+def coalesce_batch(operations: list) -> set:
+    """Indexes of operations a later set/unset of the same (or an enclosing) path makes moot"""
+    covered, coalesced = [], set()
+    for index in range(len(operations) - 1, -1, -1):
+        compiled = operations[index]
+        if any(compiled["path"] == path or compiled["path"].startswith(path + ".") for path in covered):
+            coalesced.add(index)
+        elif compiled["supersedes"]:
+            covered.append(compiled["path"])
+    return coalesced
+
+def plan_batch_rounds(operations: list, skip: set) -> list:
+    """Pack operations, in order, into as few non-conflicting combined updates as possible.
+    
+    Mongo rejects one update touching overlapping paths, and a positional "$" can
+    only refer to one matched item, so each conflict starts a new round.
+    """
+    rounds = []
+    for index, compiled in enumerate(operations):
+        if index in skip:
+            continue
+        current = rounds[-1] if rounds else None
+        pushed = compiled["update"].get("$push", {}).get(compiled["path"])
+        if current is not None and pushed is not None and "$position" not in pushed:
+            # Plain appends to the same list merge into one $each; nothing else in the
+            # round can touch that list, or it would have started a new round
+            existing = current["update"].get("$push", {}).get(compiled["path"])
+            if existing is not None and "$position" not in existing:
+                existing["$each"].append(pushed["$each"][0])
+                current["match"][f"{compiled['path']}.id"]["$nin"].extend(item_id_values(compiled["item_id"]))
+                current["indexes"].append(index)
+                continue
+        
+        conflicts = current is None or any(_paths_overlap(compiled["path"], path) for path in current["paths"])
+        if conflicts:
+            current = {"update": {}, "match": {}, "paths": [], "indexes": []}
+            rounds.append(current)
+        for operator, fields in compiled["update"].items():
+            current["update"].setdefault(operator, {}).update(copy.deepcopy(fields))
+        for key, condition in compiled["match"].items():
+            current["match"][key] = copy.deepcopy(condition)
+        current["paths"].append(compiled["path"])
+        current["indexes"].append(index)
+    return rounds
+
+transactions_supported = True
+BATCH_ROUND_MISMATCH = HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Combined batch update did not match")
+
+def batch_write_rejected(error: OperationFailure) -> HTTPException:
+    """A per-operation error for an update MongoDB refused outright (e.g. a path conflict)"""
+    return HTTPException(
+        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        detail=f"The database rejected this operation: {(error.details or {}).get('errmsg') or error}"
+    )
+
+def batch_match_failure(compiled: dict) -> Optional[HTTPException]:
+    """The error for an item operation whose id condition did not hold"""
+    if not compiled.get("item_id"):
+        return None
+    if "$push" in compiled["update"]:
+        return patch_error(f"{compiled['path']} already has an item '{compiled['item_id']}'", status.HTTP_409_CONFLICT)
+    return list_item_not_found(compiled["path"], compiled["item_id"])
+
+async def run_batch_rounds(user_id: str, operations: list, rounds: list, expected_version: Optional[int]) -> tuple:
+    """Apply each round as one conditional write, chaining versions so nothing slips in between.
+    
+    Several rounds run in one transaction where the deployment supports it. A round
+    that matches nothing is retried operation by operation to report which one failed.
+    """
+    global transactions_supported
+    projection = {"_id": 0, "id": 1, "version": 1}
+    
+    if len(rounds) > 1 and transactions_supported and db.mongodb_client is not None:
+        try:
+            async with await db.mongodb_client.start_session() as session:
+                async with session.start_transaction():
+                    version, applied = expected_version, []
+                    for batch_round in rounds:
+                        wedding = await update_wedding_section(
+                            user_id, batch_round["update"], version, projection,
+                            match=batch_round["match"], session=session
+                        )
+                        version = wedding["version"]
+                        applied.append((wedding, batch_round))
+            for wedding, batch_round in applied:
+                journal_wedding_update(wedding["id"], batch_round["update"], batch_round["match"])
+                await record_wedding_revision(wedding["id"], wedding["version"], batch_round["update"], batch_round["match"])
+            return {i: None for r in rounds for i in r["indexes"]}, version
+        except (NotImplementedError, OperationFailure) as e:
+            if isinstance(e, NotImplementedError) or e.code == 20:
+                transactions_supported = False  # standalone server: no transactions
+        except HTTPException:
+            pass  # fall through to per-round writes, which pinpoint the failing operation
+    
+    failures, version = {}, expected_version
+    for batch_round in rounds:
+        indexes = batch_round["indexes"]
+        round_failure = batch_match_failure(operations[indexes[0]]) if len(indexes) == 1 else BATCH_ROUND_MISMATCH
+        try:
+            wedding = await update_wedding_section(
+                user_id, batch_round["update"], version, projection,
+                match=batch_round["match"], match_failure=round_failure
+            )
+            version = wedding["version"]
+            failures.update({i: None for i in indexes})
+            continue
+        except HTTPException as e:
+            if e is not BATCH_ROUND_MISMATCH:
+                failures.update({i: e for i in indexes})
+                if e.status_code == status.HTTP_412_PRECONDITION_FAILED:
+                    break
+                continue
+        except OperationFailure as e:
+            if len(indexes) == 1:
+                failures[indexes[0]] = batch_write_rejected(e)
+                continue
+            # Some operation in the round is unacceptable; the one-by-one retry finds which
+        for index in indexes:
+            try:
+                wedding = await update_wedding_section(
+                    user_id, operations[index]["update"], version, projection,
+                    match=operations[index]["match"], match_failure=batch_match_failure(operations[index])
+                )
+                version = wedding["version"]
+                failures[index] = None
+            except HTTPException as e:
+                failures[index] = e
+            except OperationFailure as e:
+                failures[index] = batch_write_rejected(e)
+    for index in (i for r in rounds for i in r["indexes"]):
+        failures.setdefault(index, HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail="Not applied: an earlier operation hit a version conflict"
+        ))
+    # Only report a version this batch actually produced
+    return failures, (version if version != expected_version else None)
+
+async def apply_wedding_batch(user_id: str, operations: list, expected_version: Optional[int] = None) -> tuple:
+    """Apply compiled operations; returns per-operation results and the final version"""
+    coalesced = coalesce_batch(operations)
+    rounds = plan_batch_rounds(operations, coalesced)
+    failures, version = await run_batch_rounds(user_id, operations, rounds, expected_version) if rounds else ({}, None)
+    
+    results = []
+    for index in range(len(operations)):
+        if index in coalesced:
+            results.append({"index": index, "status": "coalesced"})
+        elif failures.get(index) is not None:
+            results.append(batch_operation_error(index, failures[index]))
+        else:
+            results.append({"index": index, "status": "applied"})
+    return results, version
+
+class AutosaveCoalescer:
+    """Holds each user's autosave batches through a short quiet period and writes them as one.
+    
+    Every caller waits for the write that includes its operations, so responses still
+    report what was stored; rapid edits to the same field collapse to the last one. If
+    the combined write fails outright, each caller's operations are retried on their
+    own so one bad submit can't fail the batches it was merged with.
+    """
+    
+    def __init__(self, debounce_ms: int, max_wait_ms: int):
+        self.debounce = debounce_ms / 1000
+        self.max_wait = max_wait_ms / 1000
+        self.pending = {}  # user_id -> {"operations", "waiters": [(future, start, end)], "first_at", "timer"}
+    
+    async def submit(self, user_id: str, operations: list) -> tuple:
+        entry = self.pending.get(user_id)
+        if entry is None:
+            entry = self.pending[user_id] = {"operations": [], "waiters": [], "first_at": time.monotonic(), "timer": None}
+        start = len(entry["operations"])
+        entry["operations"].extend(operations)
+        waiter = asyncio.get_running_loop().create_future()
+        entry["waiters"].append((waiter, start, len(entry["operations"])))
+        
+        if entry["timer"] is not None:
+            entry["timer"].cancel()
+        if len(entry["operations"]) >= AUTOSAVE_MAX_OPERATIONS:
+            delay = 0
+        else:
+            delay = max(0, min(self.debounce, entry["first_at"] + self.max_wait - time.monotonic()))
+        entry["timer"] = asyncio.create_task(self._flush_after(user_id, delay))
+        
+        return await waiter
+    
+    async def _flush_after(self, user_id: str, delay: float):
+        await asyncio.sleep(delay)
+        await self.flush(user_id)
+    
+    async def flush(self, user_id: str):
+        entry = self.pending.pop(user_id, None)
+        if entry is None:
+            return
+        try:
+            results, version = await apply_wedding_batch(user_id, entry["operations"])
+        except Exception as e:
+            logger.warning("⚠️ Combined autosave for %s failed, retrying each batch alone: %s", user_id, e)
+            await self._flush_separately(user_id, entry)
+            return
+        for waiter, start, end in entry["waiters"]:
+            if not waiter.done():
+                waiter.set_result((results[start:end], version))
+    
+    async def _flush_separately(self, user_id: str, entry: dict):
+        for waiter, start, end in entry["waiters"]:
+            if waiter.done():
+                continue
+            try:
+                waiter.set_result(await apply_wedding_batch(user_id, entry["operations"][start:end]))
+            except Exception as e:
+                waiter.set_exception(e)
+    
+    async def stop(self):
+        for user_id in list(self.pending):
+            timer = self.pending[user_id]["timer"]
+            if timer is not None:
+                timer.cancel()
+            await self.flush(user_id)
+
+autosave_coalescer = AutosaveCoalescer(AUTOSAVE_DEBOUNCE_MS, AUTOSAVE_MAX_WAIT_MS)
+
+@api_router.post("/wedding/batch")
+async def batch_update_wedding(
+    request_data: dict,
+    response: Response,
+    if_match: Optional[str] = Header(None, alias="If-Match"),
+):
+    """Apply an ordered list of section edits with one session lookup and combined writes.
+    
+    Operations: {"op": "set"|"unset", "field"}, {"op": "add_item", "field", "item", "position"?},
+    {"op": "update_item", "field", "id", "changes"} and {"op": "remove_item", "field", "id"}.
+    Without If-Match, batches arriving within AUTOSAVE_DEBOUNCE_MS are merged into one write.
+    """
     session_id = request_data.get('session_id')
     if not session_id:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Session ID required"
         )
+    operations = request_data.get("operations")
+    if not isinstance(operations, list) or not operations:
+        raise patch_error("operations must be a non-empty list")
+    if len(operations) > AUTOSAVE_MAX_OPERATIONS:
+        raise patch_error(f"At most {AUTOSAVE_MAX_OPERATIONS} operations per batch")
     
     current_user = await get_current_user_simple(session_id)
-    users_coll, weddings_coll = await get_collections()
+    expected_version = parse_if_match(if_match)
     
-    # Find existing wedding
-    existing_wedding = await weddings_coll.find_one({"user_id": current_user.id})
-    if not existing_wedding:
+    results, compiled, positions = [None] * len(operations), [], []
+    for index, operation in enumerate(operations):
+        try:
+            compiled.append(compile_batch_operation(operation))
+            positions.append(index)
+        except HTTPException as e:
+            results[index] = batch_operation_error(index, e)
+    
+    version = None
+    if compiled:
+        if expected_version is None and AUTOSAVE_DEBOUNCE_MS > 0:
+            outcomes, version = await autosave_coalescer.submit(current_user.id, compiled)
+        else:
+            outcomes, version = await apply_wedding_batch(current_user.id, compiled, expected_version)
+        for index, outcome in zip(positions, outcomes):
+            results[index] = {**outcome, "index": index}
+    
+    if version is not None:
+        response.headers["ETag"] = f'"{version}"'
+    return {
+        "success": all(result["status"] != "failed" for result in results),
+        "version": version,
+        "results": results,
+    }
+
+# Edit history endpoints
+@api_router.get("/wedding/revisions")
+async def list_wedding_revisions(
+    session_id: str,
+    limit: int = Query(WEDDING_REVISIONS_PAGE_SIZE, ge=1, le=200),
+    before: Optional[int] = Query(None, description="Only revisions older than this one"),
+):
+    """Newest-first list of saved edits and which sections each one touched"""
+    current_user = await get_current_user_simple(session_id)
+    users_coll, weddings_coll = await get_collections()
+    wedding = await weddings_coll.find_one({"user_id": current_user.id}, {"_id": 0, "id": 1, "version": 1})
+    if not wedding:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Wedding data not found"
         )
     
-    # Prepare update data with FAQ fields
-    update_fields = {}
-    if 'faqs' in request_data:
-        update_fields['faqs'] = request_data['faqs']
+    query = {"wedding_id": wedding["id"], "kind": "delta"}
+    if before is not None:
+        query["revision"] = {"$lt": before}
+    revisions = await db.database.wedding_revisions.find(
+        query, {"_id": 0, "revision": 1, "fields": 1, "created_at": 1}
+    ).sort("revision", -1).limit(limit + 1).to_list(length=limit + 1)
+    
+    return {
+        "success": True,
+        "version": wedding.get("version"),
+        "revisions": revisions[:limit],
+        "has_more": len(revisions) > limit,
+    }
+
+@api_router.post("/wedding/revisions/{revision}/restore")
+async def restore_wedding_revision(
+    revision: int,
+    session_id: str,
+    response: Response,
+    if_match: Optional[str] = Header(None, alias="If-Match"),
+):
+    """Put the wedding back the way it was at a revision; the restore is itself a new revision"""
+    current_user = await get_current_user_simple(session_id)
+    users_coll, weddings_coll = await get_collections()
+    expected_version = parse_if_match(if_match)
+    current = await weddings_coll.find_one(wedding_version_query(current_user.id, expected_version), {"_id": 0})
+    if not current:
+        await raise_wedding_write_failure(weddings_coll, current_user.id, expected_version)
+    if revision < 1 or revision > (current.get("version") or 0):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"No revision {revision}"
+        )
     
-    update_fields["updated_at"] = datetime.utcnow().isoformat()
+    state = await wedding_state_at(current["id"], revision)
+    update = {"$set": {k: v for k, v in state.items() if k not in WEDDING_PROTECTED_FIELDS}}
+    removed = {k: "" for k in current if k not in state and k not in WEDDING_PROTECTED_FIELDS}
+    if removed:
+        update["$unset"] = removed
     
-    # Update in MongoDB
-    await weddings_coll.update_one(
-        {"user_id": current_user.id},
-        {"$set": update_fields}
+    # Conditional on the version just read, so a concurrent edit isn't silently undone
+    updated_wedding = await update_wedding_section(
+        current_user.id, update, current.get("version") or 0, minimize=True
     )
+    response.headers["ETag"] = wedding_etag(updated_wedding)
+    return {"success": True, "restored_revision": revision, "wedding_data": updated_wedding}
+
+async def load_wedding_image_sources():
+    """Startup: build the image URL index, retrying until Mongo answers"""
+    while True:
+        try:
+            await wedding_images.load(await asyncio.to_thread(load_wedding_backup))
+            logger.info("🖼️ Indexed %d wedding image URLs", len(wedding_images.counts))
+            return
+        except Exception as e:
+            logger.warning("⚠️ Failed to index wedding image URLs: %s", e)
+            await asyncio.sleep(WEDDING_ID_REFRESH_SECONDS)
+
+# Layout placeholders: intrinsic size plus a 16px preview stored on each image entry, so
+# public pages can reserve space and paint something before the real image arrives
+IMAGE_PLACEHOLDER_FIELDS = ("gallery_photos", "story_timeline", "bridal_party", "groom_party", "special_roles")
+IMAGE_PLACEHOLDER_DELAY_SECONDS = 2  # let a burst of edits settle before computing placeholders
+
+IMAGE_SOURCE_KEYS = ("src", "url", "image", "photo")
+
+def image_source_key(item) -> Optional[str]:
+    if not isinstance(item, dict):
+        return None
+    return next((key for key in IMAGE_SOURCE_KEYS if isinstance(item.get(key), str) and item[key]), None)
+
+def image_source(item) -> Optional[str]:
+    key = image_source_key(item)
+    return item[key] if key else None
+
+def placeholder_source_key(src: str) -> str:
+    """Identifies which src a stored placeholder was computed for, so edits to src redo it"""
+    return hashlib.sha256(src.encode()).hexdigest()[:16]
+
+def needs_placeholder(item) -> bool:
+    src = image_source(item)
+    return bool(src) and item.get("id") is not None and (item.get("placeholder") or {}).get("source") != placeholder_source_key(src)
+
+class ImagePlaceholderJob:
+    """Computes placeholders for weddings whose images changed.
     
-    # Get updated wedding data
-    updated_wedding = await weddings_coll.find_one({"user_id": current_user.id})
+    Writes mark the wedding dirty; the job waits a moment, then renders missing
+    placeholders in the image process pool and $sets them onto the matching items.
+    That write is derived data, so it neither bumps the version nor records a revision,
+    and it only lands if the item still has the src the placeholder was made from. It
+    bumps placeholders_version instead, which the ETag includes.
+    """
     
-    # Also update JSON backup
-    weddings = load_json_file(WEDDINGS_FILE)
-    if updated_wedding["id"] in weddings:
-        weddings[updated_wedding["id"]].update(update_fields)
-        save_json_file(WEDDINGS_FILE, weddings)
+    def __init__(self):
+        self.dirty = set()
+        self.wakeup = asyncio.Event()
     
-    # Remove _id from response
-    response_data = {k: v for k, v in updated_wedding.items() if k != "_id"}
-    return {"success": True, "wedding_data": response_data}
+    def mark(self, wedding_id: str):
+        if Image is None:
+            return
+        self.dirty.add(wedding_id)
+        self.wakeup.set()
+    
+    async def resolve_digest(self, src: str) -> Optional[str]:
+        uploaded = UPLOAD_REFERENCE_PATTERN.search(src)
+        if uploaded and src.startswith("/api/"):
+            return uploaded.group(1)
+        if src.startswith(("http://", "https://")):
+            # Same guarded fetch as /images: public addresses only, pinned, redirects re-checked
+            return await image_cache.fetch_original(src)
+        return None  # inline data: URIs and relative paths are left alone
+    
+    async def refresh(self, wedding_id: str) -> int:
+        projection = {"_id": 0, **{field: 1 for field in IMAGE_PLACEHOLDER_FIELDS}}
+        wedding = await db.database.weddings.find_one({"id": wedding_id}, projection)
+        written = 0
+        for field in IMAGE_PLACEHOLDER_FIELDS:
+            for item in (wedding or {}).get(field) or []:
+                if not needs_placeholder(item):
+                    continue
+                src = image_source(item)
+                try:
+                    digest = await self.resolve_digest(src)
+                    if digest is None:
+                        continue
+                    placeholder = await image_cache.placeholder(digest)
+                except Exception as e:
+                    logger.warning("⚠️ No placeholder for %s: %s", src[:80], e, extra={"wedding_id": wedding_id})
+                    continue
+                
+                update = {
+                    "$set": {f"{field}.$.placeholder": {**placeholder, "source": placeholder_source_key(src)}},
+                    "$inc": {"placeholders_version": 1},
+                }
+                query = {"id": wedding_id, field: {"$elemMatch": {"id": item["id"], image_source_key(item): src}}}
+                result = await db.database.weddings.update_one(query, update)
+                if result.modified_count:
+                    journal_wedding_update(wedding_id, update, match={f"{field}.id": item["id"]})
+                    written += 1
+        return written
+    
+    async def run(self):
+        while True:
+            await self.wakeup.wait()
+            await asyncio.sleep(IMAGE_PLACEHOLDER_DELAY_SECONDS)
+            self.wakeup.clear()
+            while self.dirty:
+                wedding_id = self.dirty.pop()
+                try:
+                    written = await self.refresh(wedding_id)
+                    if written:
+                        logger.info("🖼️ Stored %d image placeholders", written, extra={"wedding_id": wedding_id})
+                except Exception as e:
+                    logger.warning("⚠️ Placeholder refresh failed: %s", e, extra={"wedding_id": wedding_id})
+    
+    async def backfill(self):
+        """Queue weddings saved before placeholders existed (or while the job was down)"""
+        projection = {"_id": 0, "id": 1, **{field: 1 for field in IMAGE_PLACEHOLDER_FIELDS}}
+        async for wedding in db.database.weddings.find({}, projection):
+            if any(needs_placeholder(item) for field in IMAGE_PLACEHOLDER_FIELDS for item in wedding.get(field) or []):
+                self.mark(wedding["id"])
+
+image_placeholders = ImagePlaceholderJob()
 
 # Test endpoint to verify connectivity
 @api_router.get("/test")
@@ -1089,62 +4016,95 @@ FRONTEND_BUILD_PATH = ROOT_DIR.parent / "frontend" / "build"
 
 # Include the API router first (higher priority)
 app.include_router(api_router)
+app.include_router(body_limits_router)
+app.include_router(metrics_router)
+app.include_router(uploads_router)
+app.include_router(images_router)
+
+# Oversized bodies are refused before the app reads them; it sits inside CORS so the
+# 413 carries CORS headers and the browser lets the frontend see why it failed
+app.add_middleware(BodySizeLimitMiddleware)
 
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=["http://localhost:3000", "http://127.0.0.1:3000", "*"],
-    allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+    allow_methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
     allow_headers=["*"],
     expose_headers=["*"],
 )
 
+# Outermost, so even rejected requests are logged and answered with their id
+app.add_middleware(RequestIdMiddleware)
+app.add_middleware(MetricsMiddleware)
+
 # Serve static files and React app
 if FRONTEND_BUILD_PATH.exists():
-    print(f"✅ Frontend build found at: {FRONTEND_BUILD_PATH}")
-    app.mount("/static", StaticFiles(directory=str(FRONTEND_BUILD_PATH / "static")), name="static")
+    logger.info("✅ Frontend build found at: %s", FRONTEND_BUILD_PATH)
+    static_assets = StaticAssetIndex(FRONTEND_BUILD_PATH)
+    logger.info("📦 Indexed %d frontend files (%d KiB held in memory)", len(static_assets.assets), static_assets.memory_bytes // KIB)
     
-    @app.get("/{full_path:path}")
-    async def serve_react_app(full_path: str):
+    @app.api_route("/{full_path:path}", methods=["GET", "HEAD"])
+    async def serve_react_app(full_path: str, request: Request):
         """Serve React app for all non-API routes"""
-        print(f"🌐 Serving route: {full_path}")
-        
         # Skip API routes (they are handled by api_router)
         if full_path.startswith("api"):
-            print(f"❌ API route not found: {full_path}")
             raise HTTPException(status_code=404, detail="API endpoint not found")
         
-        # Check if it's a direct file request
-        if full_path and not full_path.startswith("api"):
-            static_file_path = FRONTEND_BUILD_PATH / full_path
-            if static_file_path.exists() and static_file_path.is_file():
-                print(f"📁 Serving static file: {static_file_path}")
-                return FileResponse(static_file_path)
-        
-        # For all other routes (including custom wedding URLs), serve React index.html
-        index_path = FRONTEND_BUILD_PATH / "index.html"
-        print(f"⚛️ Serving React app: {index_path}")
-        return FileResponse(index_path)
+        asset = static_assets.assets.get(full_path)
+        if asset is None:
+            if full_path.startswith("static/"):
+                raise HTTPException(status_code=404, detail="Asset not found")
+            # For all other routes (including custom wedding URLs), serve React index.html
+            asset = static_assets.index_html
+        return static_assets.response(asset, request)
 else:
-    print(f"❌ Frontend build not found at: {FRONTEND_BUILD_PATH}")
-    print("React static file serving disabled")
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-logger = logging.getLogger(__name__)
+    logger.warning("❌ Frontend build not found at %s; React static file serving disabled", FRONTEND_BUILD_PATH)
 
 # Startup and shutdown events for MongoDB
 @app.on_event("startup")
 async def startup_event():
     await connect_to_mongo()
+    await ensure_indexes()
+    if Image is not None:
+        background_tasks.append(asyncio.create_task(image_cache.load()))
+        background_tasks.append(asyncio.create_task(load_wedding_image_sources()))
+    if db.database is not None:
+        background_tasks.append(asyncio.create_task(refresh_wedding_registry_periodically()))
+        if rsvp_ingest_queue is not None:
+            rsvp_ingest_queue.start()
+        background_tasks.append(asyncio.create_task(backfill_rsvp_search_prefixes()))
+        background_tasks.append(asyncio.create_task(backfill_wedding_item_ids()))
+        background_tasks.append(asyncio.create_task(reseed_public_feed_periodically()))
+        if GUESTBOOK_MODERATION:
+            guestbook_moderator.start()
+            background_tasks.append(asyncio.create_task(guestbook_moderator.recover()))
+        background_tasks.append(asyncio.create_task(rollup_reactions_periodically()))
+        background_tasks.append(asyncio.create_task(maintain_uploads_periodically()))
+        if Image is not None:
+            background_tasks.append(asyncio.create_task(image_placeholders.run()))
+            background_tasks.append(asyncio.create_task(image_placeholders.backfill()))
+        if WEDDING_EVENTS_SOURCE == "changestream":
+            background_tasks.append(asyncio.create_task(watch_wedding_events()))
     logger.info("✅ Wedding Card API started successfully")
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    # Write any autosave edits still waiting out their debounce window
+    await autosave_coalescer.stop()
+    image_cache.shutdown()
+    if rsvp_ingest_queue is not None:
+        # Flush acknowledged RSVPs before the connection goes away
+        await rsvp_ingest_queue.stop()
+    if guestbook_moderator.tasks:
+        await guestbook_moderator.stop()
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    background_tasks.clear()
+    if db.database is not None:
+        await rollup_reactions()
     await close_mongo_connection()
     active_sessions.clear()
     # Note: Sessions are persisted in MongoDB and will be restored on restart
@@ -0,0 +1,133 @@
+"""The React build, indexed into memory with its cache policy and precompressed variants"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+from pathlib import Path
+from typing import Optional
+
+from fastapi import Request, Response, status
+from fastapi.responses import FileResponse
+
+from body_limits import KIB, MIB
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+STATIC_MEMORY_MAX_FILE_BYTES = 1 * MIB  # larger files are streamed from disk
+STATIC_MEMORY_MAX_BYTES = int(os.getenv("STATIC_MEMORY_MAX_BYTES", str(64 * MIB)))
+STATIC_HASHED_NAME = re.compile(r"\.[0-9a-f]{8,}\.(?:chunk\.)?[a-z0-9]+$")  # main.3f2a9c1b.js, 512.8e1d.chunk.css
+STATIC_COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "application/manifest+json", "image/svg+xml")
+STATIC_CACHE_CONTROL = {
+    "immutable": "public, max-age=31536000, immutable",
+    "index": "no-cache",  # always revalidate, so a deploy is picked up on the next load
+    "default": "public, max-age=3600",
+}
+STATIC_ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+class StaticAsset:
+    __slots__ = ("path", "media_type", "cache_control", "etag", "size", "body", "encoded")
+    
+    def __init__(self, path: Path, media_type: str, cache_control: str):
+        self.path = path
+        self.media_type = media_type
+        self.cache_control = cache_control
+        self.etag = None
+        self.size = 0
+        self.body = None  # bytes when held in memory, else served from path
+        self.encoded = {}  # "br"/"gzip" -> bytes or Path
+
+class StaticAssetIndex:
+    """The React build, indexed once: paths, types, ETags and cache policy are resolved up
+    front and small files (with their .br/.gz variants) are held in memory, so a request
+    is a dict lookup and no filesystem calls."""
+    
+    def __init__(self, root: Path):
+        self.root = root
+        self.assets = {}
+        self.memory_bytes = 0
+        self.index_html = None
+        self.load()
+    
+    def cache_policy(self, relative: str) -> str:
+        if relative == "index.html":
+            return STATIC_CACHE_CONTROL["index"]
+        if relative.startswith("static/") or STATIC_HASHED_NAME.search(relative):
+            return STATIC_CACHE_CONTROL["immutable"]
+        return STATIC_CACHE_CONTROL["default"]
+    
+    def hold(self, size: int) -> bool:
+        if size > STATIC_MEMORY_MAX_FILE_BYTES or self.memory_bytes + size > STATIC_MEMORY_MAX_BYTES:
+            return False
+        self.memory_bytes += size
+        return True
+    
+    def load(self):
+        for path in sorted(self.root.rglob("*")):
+            if not path.is_file() or path.suffix in (".br", ".gz"):
+                continue
+            relative = path.relative_to(self.root).as_posix()
+            media_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+            if media_type.startswith("text/") or media_type in ("application/javascript", "application/json"):
+                media_type += "; charset=utf-8"
+            asset = StaticAsset(path, media_type, self.cache_policy(relative))
+            stat = path.stat()
+            asset.size = stat.st_size
+            
+            if self.hold(asset.size):
+                asset.body = path.read_bytes()
+                asset.etag = f'"{hashlib.sha256(asset.body).hexdigest()[:20]}"'
+            else:
+                asset.etag = f'"{stat.st_size:x}-{int(stat.st_mtime):x}"'
+            
+            for encoding, suffix in STATIC_ENCODINGS:
+                variant = path.with_name(path.name + suffix)
+                if variant.exists():
+                    size = variant.stat().st_size
+                    asset.encoded[encoding] = variant.read_bytes() if self.hold(size) else variant
+            # CRA doesn't precompress, so compress small text files here, once
+            if asset.body is not None and asset.size > 1 * KIB and media_type.startswith(STATIC_COMPRESSIBLE_TYPES):
+                if "gzip" not in asset.encoded:
+                    compressed = gzip.compress(asset.body, compresslevel=9, mtime=0)
+                    if len(compressed) < asset.size and self.hold(len(compressed)):
+                        asset.encoded["gzip"] = compressed
+                if "br" not in asset.encoded and brotli is not None:
+                    compressed = brotli.compress(asset.body)
+                    if len(compressed) < asset.size and self.hold(len(compressed)):
+                        asset.encoded["br"] = compressed
+            self.assets[relative] = asset
+        
+        self.index_html = self.assets.get("index.html")
+    
+    @staticmethod
+    def accepted_encodings(header: Optional[str]) -> set:
+        accepted = set()
+        for part in (header or "").split(","):
+            coding, _, params = part.strip().partition(";")
+            if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+                continue
+            accepted.add(coding.strip().lower())
+        return accepted
+    
+    def response(self, asset: StaticAsset, request: Request) -> Response:
+        headers = {"Cache-Control": asset.cache_control, "ETag": asset.etag}
+        if asset.encoded:
+            headers["Vary"] = "Accept-Encoding"
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and (if_none_match.strip() == "*" or asset.etag in if_none_match):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        
+        body = asset.body if asset.body is not None else asset.path
+        accepted = self.accepted_encodings(request.headers.get("accept-encoding"))
+        for encoding, _ in STATIC_ENCODINGS:
+            if encoding in asset.encoded and encoding in accepted:
+                body = asset.encoded[encoding]
+                headers["Content-Encoding"] = encoding
+                break
+        
+        if isinstance(body, Path):
+            return FileResponse(body, media_type=asset.media_type, headers=headers)
+        return Response(body, media_type=asset.media_type, headers=headers)
@@ -0,0 +1,20 @@
+"""Text normalisation shared by RSVP search, guestbook search and moderation."""
+import unicodedata
+from typing import List, Optional
+
+
+def search_tokens(text: Optional[str]) -> List[str]:
+    """Accent-stripped, case-folded alphanumeric tokens"""
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    folded = "".join(ch for ch in decomposed if not unicodedata.combining(ch)).casefold()
+    tokens = []
+    current = []
+    for ch in folded:
+        if ch.isalnum():
+            current.append(ch)
+        elif current:
+            tokens.append("".join(current))
+            current = []
+    if current:
+        tokens.append("".join(current))
+    return tokens
@@ -0,0 +1,504 @@
+"""Photo uploads: streamed to disk, stored once per SHA-256, reference-counted against weddings"""
+import asyncio
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List, Optional
+
+from fastapi import APIRouter, HTTPException, Query, Request, status
+from fastapi.responses import FileResponse
+from pymongo import UpdateOne
+
+import db
+from auth import get_current_user_simple
+from body_limits import MIB
+
+try:
+    from multipart.multipart import MultipartParser, parse_options_header
+except ImportError:
+    MultipartParser = parse_options_header = None
+
+ROOT_DIR = Path(__file__).parent
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/api")
+
+UPLOADS_DIR = Path(os.getenv("UPLOADS_DIR", str(ROOT_DIR / "uploads")))
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(25 * MIB)))
+UPLOAD_CHUNK_MAX_BYTES = int(os.getenv("UPLOAD_CHUNK_MAX_BYTES", str(8 * MIB)))
+UPLOAD_GC_GRACE_SECONDS = int(os.getenv("UPLOAD_GC_GRACE_SECONDS", str(24 * 3600)))  # time to save an upload into a wedding
+UPLOAD_SESSION_TTL_SECONDS = 24 * 3600
+UPLOAD_REFS_INTERVAL_SECONDS = 30
+UPLOAD_GC_INTERVAL_SECONDS = 3600
+UPLOAD_GC_BATCH_SIZE = 500  # orphan blob candidates looked up per query
+UPLOAD_DIGEST_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+UPLOAD_CACHE_CONTROL = "public, max-age=31536000, immutable"
+UPLOAD_REFERENCE_PATTERN = re.compile(r"/api/(?:uploads|images)/([0-9a-f]{64})")
+
+def sniff_image_type(head: bytes) -> Optional[str]:
+    """Content type from the file's magic bytes; the client's claim is not trusted"""
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head.startswith((b"GIF87a", b"GIF89a")):
+        return "image/gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head[4:12] in (b"ftypheic", b"ftypheix", b"ftypmif1", b"ftypavif"):
+        return "image/avif" if head[8:12] == b"avif" else "image/heic"
+    return None
+
+def upload_response(metadata: dict, deduplicated: bool) -> dict:
+    digest = metadata["sha256"]
+    return {
+        "success": True,
+        "sha256": digest,
+        "size": metadata["size"],
+        "content_type": metadata["content_type"],
+        "url": f"/api/uploads/{digest}",
+        "thumbnail": f"/api/images/{digest}/640.webp",
+        "deduplicated": deduplicated,
+    }
+
+class UploadStore:
+    """Uploaded files under UPLOADS_DIR/blobs, named by SHA-256 so a photo used in several
+    places (or uploaded twice) is stored once; metadata and ref counts live in Mongo."""
+    
+    def __init__(self, root: Path):
+        self.root = root
+    
+    def blob_path(self, digest: str) -> Path:
+        return self.root / "blobs" / digest[:2] / digest
+    
+    def temp_path(self) -> Path:
+        path = self.root / "tmp" / f"{uuid.uuid4().hex}.part"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return path
+    
+    async def store(self, temp_path: Path, digest: str, size: int, content_type: str, user_id: str) -> dict:
+        """Move a finished upload into place, or drop it if those bytes are already stored"""
+        path = self.blob_path(digest)
+        deduplicated = path.exists()
+        if deduplicated:
+            temp_path.unlink(missing_ok=True)
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(temp_path, path)
+        
+        metadata = {"sha256": digest, "size": size, "content_type": content_type}
+        if db.database is not None:
+            await db.database.uploads.update_one(
+                {"sha256": digest},
+                {"$setOnInsert": {
+                    **metadata,
+                    "ref_count": 0,
+                    "uploaded_by": user_id,
+                    "created_at": datetime.utcnow(),
+                }},
+                upsert=True
+            )
+        return upload_response(metadata, deduplicated)
+
+upload_store = UploadStore(UPLOADS_DIR)
+
+class StreamedFile:
+    """Accumulates one uploaded file on disk, hashing and sniffing it as bytes arrive"""
+    
+    def __init__(self, path: Path, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.file = open(path, "wb")
+        self.digest = hashlib.sha256()
+        self.size = 0
+        self.head = b""
+    
+    async def write(self, data: bytes):
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"Uploads are limited to {self.max_bytes} bytes"
+            )
+        if len(self.head) < 16:
+            self.head += data[:16 - len(self.head)]
+        self.digest.update(data)
+        await asyncio.to_thread(self.file.write, data)
+    
+    def close(self):
+        self.file.close()
+    
+    def discard(self):
+        self.file.close()
+        self.path.unlink(missing_ok=True)
+
+async def stream_multipart_file(request: Request, field_name: str = "file") -> StreamedFile:
+    """Parse multipart/form-data from the raw request stream, writing the named file part
+    straight to disk; nothing larger than one network chunk is held in memory."""
+    if MultipartParser is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Uploads are not available (python-multipart is not installed)"
+        )
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Expected a multipart/form-data body"
+        )
+    
+    state = {"header_field": b"", "header_value": b"", "headers": {}, "target": None}
+    pending = []  # file bytes parsed from the current network chunk
+    streamed = None
+    
+    def on_part_begin():
+        state["headers"] = {}
+        state["target"] = None
+    
+    def on_header_field(data, start, end):
+        state["header_field"] += data[start:end]
+    
+    def on_header_value(data, start, end):
+        state["header_value"] += data[start:end]
+    
+    def on_header_end():
+        state["headers"][state["header_field"].lower()] = state["header_value"]
+        state["header_field"] = state["header_value"] = b""
+    
+    def on_headers_finished():
+        _, disposition = parse_options_header(state["headers"].get(b"content-disposition", b""))
+        if disposition.get(b"name", b"").decode() == field_name and b"filename" in disposition:
+            state["target"] = "file"
+    
+    def on_part_data(data, start, end):
+        if state["target"] == "file":
+            pending.append(data[start:end])
+    
+    parser = MultipartParser(boundary, {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+    })
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            if pending and streamed is None:
+                streamed = StreamedFile(upload_store.temp_path(), UPLOAD_MAX_BYTES)
+            for data in pending:
+                await streamed.write(data)
+            pending.clear()
+        parser.finalize()
+    except Exception:
+        if streamed is not None:
+            streamed.discard()
+        raise
+    
+    if streamed is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"No file in form field '{field_name}'"
+        )
+    streamed.close()
+    return streamed
+
+async def finish_upload(path: Path, digest: str, size: int, head: bytes, user_id: str) -> dict:
+    content_type = sniff_image_type(head)
+    if content_type is None:
+        path.unlink(missing_ok=True)
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Only JPEG, PNG, GIF, WebP, HEIC and AVIF images can be uploaded"
+        )
+    return await upload_store.store(path, digest, size, content_type, user_id)
+
+@router.post("/uploads")
+async def upload_photo(request: Request, session_id: str):
+    """Upload one photo as multipart/form-data (field "file"), streamed to disk"""
+    current_user = await get_current_user_simple(session_id)
+    streamed = await stream_multipart_file(request)
+    return await finish_upload(streamed.path, streamed.digest.hexdigest(), streamed.size, streamed.head, current_user.id)
+
+# Resumable uploads: create a session, PUT chunks at increasing offsets, then complete.
+# State is the .part file itself plus a small JSON sidecar, so it survives restarts.
+def upload_session_paths(upload_id: str) -> tuple:
+    if not re.fullmatch(r"[0-9a-f]{32}", upload_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Upload session not found"
+        )
+    folder = upload_store.root / "sessions"
+    return folder / f"{upload_id}.json", folder / f"{upload_id}.part"
+
+upload_session_locks = {}  # upload_id -> asyncio.Lock, kept only while a request holds or awaits it
+upload_session_waiters = Counter()
+
+@contextlib.asynccontextmanager
+async def upload_session_lock(upload_id: str):
+    """One writer per session; the lock is dropped again once nobody needs it"""
+    lock = upload_session_locks.setdefault(upload_id, asyncio.Lock())
+    upload_session_waiters[upload_id] += 1
+    try:
+        async with lock:
+            yield
+    finally:
+        upload_session_waiters[upload_id] -= 1
+        if not upload_session_waiters[upload_id]:
+            del upload_session_waiters[upload_id]
+            del upload_session_locks[upload_id]
+
+def load_upload_session(upload_id: str, user_id: str) -> tuple:
+    info_path, part_path = upload_session_paths(upload_id)
+    try:
+        info = json.loads(info_path.read_text())
+    except (OSError, ValueError):
+        info = None
+    if not info or info["user_id"] != user_id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Upload session not found"
+        )
+    offset = part_path.stat().st_size if part_path.exists() else 0
+    return info, part_path, offset
+
+@router.post("/uploads/sessions")
+async def create_upload_session(request_data: dict, session_id: str):
+    """Start a resumable upload of `size` bytes; pass `sha256` to skip bytes already stored"""
+    current_user = await get_current_user_simple(session_id)
+    size = request_data.get("size")
+    if not isinstance(size, int) or not 0 < size <= UPLOAD_MAX_BYTES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"size must be between 1 and {UPLOAD_MAX_BYTES} bytes"
+        )
+    
+    digest = request_data.get("sha256")
+    if isinstance(digest, str) and UPLOAD_DIGEST_PATTERN.match(digest) and upload_store.blob_path(digest).exists():
+        existing = await db.database.uploads.find_one({"sha256": digest}, {"_id": 0}) if db.database is not None else None
+        if existing:
+            return {**upload_response(existing, True), "complete": True}
+    
+    upload_id = uuid.uuid4().hex
+    info_path, part_path = upload_session_paths(upload_id)
+    info_path.parent.mkdir(parents=True, exist_ok=True)
+    info_path.write_text(json.dumps({"user_id": current_user.id, "size": size, "created_at": time.time()}))
+    part_path.touch()
+    return {"success": True, "upload_id": upload_id, "offset": 0, "chunk_size": UPLOAD_CHUNK_MAX_BYTES, "complete": False}
+
+@router.get("/uploads/sessions/{upload_id}")
+async def get_upload_session(upload_id: str, session_id: str):
+    """Where to resume: the number of bytes received so far"""
+    current_user = await get_current_user_simple(session_id)
+    info, part_path, offset = load_upload_session(upload_id, current_user.id)
+    return {"success": True, "upload_id": upload_id, "offset": offset, "size": info["size"]}
+
+@router.put("/uploads/sessions/{upload_id}")
+async def upload_session_chunk(upload_id: str, request: Request, session_id: str, offset: int = Query(..., ge=0)):
+    """Append the raw request body at offset; a mismatched offset returns 409 with the right one"""
+    current_user = await get_current_user_simple(session_id)
+    # One writer per session: a retried chunk waits here, then sees the new offset and gets 409
+    async with upload_session_lock(upload_id):
+        info, part_path, current_offset = load_upload_session(upload_id, current_user.id)
+        if offset != current_offset:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail={"message": "Offset does not match the bytes received", "offset": current_offset}
+            )
+        
+        received = 0
+        # Written at the offset rather than appended, and cut back to it if the chunk fails,
+        # so the part file only ever holds whole chunks
+        with open(part_path, "r+b") as f:
+            f.seek(current_offset)
+            try:
+                async for chunk in request.stream():
+                    received += len(chunk)
+                    if current_offset + received > info["size"]:
+                        raise HTTPException(
+                            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                            detail="Chunk goes past the declared upload size"
+                        )
+                    await asyncio.to_thread(f.write, chunk)
+            except BaseException:
+                f.truncate(current_offset)
+                raise
+    return {"success": True, "upload_id": upload_id, "offset": current_offset + received, "size": info["size"]}
+
+def hash_file(path: Path) -> tuple:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        head = f.read(16)
+        digest.update(head)
+        while chunk := f.read(1 * MIB):
+            digest.update(chunk)
+    return digest, head
+
+@router.post("/uploads/sessions/{upload_id}/complete")
+async def complete_upload_session(upload_id: str, session_id: str):
+    current_user = await get_current_user_simple(session_id)
+    async with upload_session_lock(upload_id):
+        info, part_path, offset = load_upload_session(upload_id, current_user.id)
+        if offset != info["size"]:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail={"message": "Upload is incomplete", "offset": offset}
+            )
+        
+        digest, head = await asyncio.to_thread(hash_file, part_path)
+        result = await finish_upload(part_path, digest.hexdigest(), offset, head, current_user.id)
+        upload_session_paths(upload_id)[0].unlink(missing_ok=True)
+    return {**result, "complete": True}
+
+@router.get("/uploads/{digest}")
+async def get_upload(digest: str):
+    """An uploaded file; its URL is its hash, so it never changes"""
+    path = upload_store.blob_path(digest) if UPLOAD_DIGEST_PATTERN.match(digest) else None
+    if path is None or not path.exists():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Upload not found"
+        )
+    with open(path, "rb") as f:
+        media_type = sniff_image_type(f.read(16)) or "application/octet-stream"
+    return FileResponse(
+        path,
+        media_type=media_type,
+        headers={"Cache-Control": UPLOAD_CACHE_CONTROL, "ETag": f'"{digest}"'}
+    )
+
+class UploadReferenceTracker:
+    """Keeps uploads.ref_count equal to the number of weddings that use each upload.
+    
+    Writes only mark the wedding dirty; a background pass re-reads dirty weddings,
+    diffs their upload hashes against upload_refs and applies $inc to the counts.
+    """
+    
+    def __init__(self):
+        self.dirty = set()
+    
+    def mark(self, wedding_id: str):
+        self.dirty.add(wedding_id)
+    
+    async def refresh(self, wedding_id: str):
+        wedding = await db.database.weddings.find_one({"id": wedding_id}, {"_id": 0, "rsvp_responses": 0})
+        current = set(UPLOAD_REFERENCE_PATTERN.findall(json.dumps(wedding, default=str))) if wedding else set()
+        previous = await db.database.upload_refs.find_one({"wedding_id": wedding_id})
+        previous = set(previous["uploads"]) if previous else set()
+        
+        operations = [UpdateOne({"sha256": digest}, {"$inc": {"ref_count": 1}}) for digest in current - previous]
+        operations += [UpdateOne({"sha256": digest}, {"$inc": {"ref_count": -1}}) for digest in previous - current]
+        if operations:
+            await db.database.uploads.bulk_write(operations, ordered=False)
+        if current or previous:
+            await db.database.upload_refs.update_one(
+                {"wedding_id": wedding_id}, {"$set": {"uploads": sorted(current)}}, upsert=True
+            )
+    
+    async def flush(self):
+        while self.dirty:
+            wedding_id = self.dirty.pop()
+            try:
+                await self.refresh(wedding_id)
+            except Exception as e:
+                self.dirty.add(wedding_id)
+                logger.warning("⚠️ Upload reference refresh failed: %s", e, extra={"wedding_id": wedding_id})
+                return
+    
+    async def reconcile(self):
+        """Recount everything from the weddings themselves (startup, or after a crash)"""
+        counts = Counter()
+        async for wedding in db.database.weddings.find({}, {"_id": 0, "rsvp_responses": 0}):
+            uploads = sorted(set(UPLOAD_REFERENCE_PATTERN.findall(json.dumps(wedding, default=str))))
+            counts.update(uploads)
+            await db.database.upload_refs.update_one(
+                {"wedding_id": wedding["id"]}, {"$set": {"uploads": uploads}}, upsert=True
+            )
+        # Write the real counts first and only then zero the rest: a blanket reset would leave
+        # a window in which another worker's GC sees every upload as unreferenced
+        operations = [UpdateOne({"sha256": digest}, {"$set": {"ref_count": n}}) for digest, n in counts.items()]
+        if operations:
+            await db.database.uploads.bulk_write(operations, ordered=False)
+        await db.database.uploads.update_many(
+            {"sha256": {"$nin": list(counts)}, "ref_count": {"$ne": 0}}, {"$set": {"ref_count": 0}}
+        )
+
+upload_references = UploadReferenceTracker()
+
+def files_older_than(folder: Path, pattern: str, cutoff: float) -> List[Path]:
+    """Files under folder matching pattern last modified before cutoff (blocking; run in a thread)"""
+    found = []
+    for path in folder.glob(pattern):
+        try:
+            if path.stat().st_mtime < cutoff:
+                found.append(path)
+        except FileNotFoundError:
+            continue
+    return found
+
+def remove_files(paths: List[Path]):
+    for path in paths:
+        path.unlink(missing_ok=True)
+
+async def collect_upload_garbage() -> dict:
+    """Delete uploads no wedding references once their grace period is over, blobs with no
+    metadata (a crash between move and insert) and abandoned resumable sessions"""
+    await upload_references.flush()
+    stats = {"uploads": 0, "orphan_blobs": 0, "sessions": 0}
+    cutoff = datetime.utcnow() - timedelta(seconds=UPLOAD_GC_GRACE_SECONDS)
+    
+    async for upload in db.database.uploads.find({"ref_count": {"$lte": 0}, "created_at": {"$lt": cutoff}}, {"sha256": 1}):
+        # Re-check under the filter so an upload referenced meanwhile survives
+        result = await db.database.uploads.delete_one({"_id": upload["_id"], "ref_count": {"$lte": 0}})
+        if result.deleted_count:
+            await asyncio.to_thread(remove_files, [upload_store.blob_path(upload["sha256"])])
+            stats["uploads"] += 1
+    
+    # Directory walks and stats block, so they run off the event loop
+    old_blobs = await asyncio.to_thread(
+        files_older_than, upload_store.root / "blobs", "*/*", time.time() - UPLOAD_GC_GRACE_SECONDS
+    )
+    orphans = []
+    for start in range(0, len(old_blobs), UPLOAD_GC_BATCH_SIZE):
+        batch = old_blobs[start:start + UPLOAD_GC_BATCH_SIZE]
+        known = {
+            upload["sha256"]
+            async for upload in db.database.uploads.find({"sha256": {"$in": [path.name for path in batch]}}, {"sha256": 1})
+        }
+        orphans += [path for path in batch if path.name not in known]
+    await asyncio.to_thread(remove_files, orphans)
+    stats["orphan_blobs"] = len(orphans)
+    
+    session_cutoff = time.time() - UPLOAD_SESSION_TTL_SECONDS
+    stale = await asyncio.to_thread(files_older_than, upload_store.root / "sessions", "*.json", session_cutoff)
+    stale += await asyncio.to_thread(files_older_than, upload_store.root / "tmp", "*.part", session_cutoff)
+    await asyncio.to_thread(remove_files, stale + [path.with_suffix(".part") for path in stale])
+    stats["sessions"] = len(stale)
+    return stats
+
+async def maintain_uploads_periodically():
+    try:
+        await upload_references.reconcile()
+    except Exception as e:
+        logger.warning("⚠️ Upload reference reconcile failed: %s", e)
+    last_gc = time.monotonic()
+    while True:
+        await asyncio.sleep(UPLOAD_REFS_INTERVAL_SECONDS)
+        await upload_references.flush()
+        if time.monotonic() - last_gc >= UPLOAD_GC_INTERVAL_SECONDS:
+            last_gc = time.monotonic()
+            try:
+                stats = await collect_upload_garbage()
+                if any(stats.values()):
+                    logger.info("🧹 Upload GC removed %s", stats)
+            except Exception as e:
+                logger.warning("⚠️ Upload GC failed: %s", e)
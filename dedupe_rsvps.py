@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+One-off job: collapse duplicate RSVPs created before RSVP submissions became
+idempotent. Keeps the latest submission per (wedding_id, guest email/phone)
+and deletes the older copies, working through the collection in batches.
+
+Usage: python dedupe_rsvps.py [batch_size]
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).parent
+sys.path.insert(0, str(ROOT_DIR / 'backend'))
+
+import server
+
+
+async def main():
+    batch_size = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    await server.connect_to_mongo()
+    if server.db.database is None:
+        print("❌ MongoDB is not available, nothing to deduplicate")
+        return
+    
+    try:
+        stats = await server.deduplicate_rsvps(batch_size=batch_size)
+        print(f"✅ Scanned {stats['scanned']} RSVPs: kept {stats['kept']}, deleted {stats['deleted']} duplicates")
+        
+        # The unique guest index can only be built once duplicates are gone
+        await server.ensure_indexes()
+    finally:
+        await server.close_mongo_connection()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
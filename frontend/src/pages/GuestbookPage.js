@@ -15,7 +15,11 @@ const GuestbookPage = ({ isPrivate = false, isDashboard = false }) => {
   });
 
   const [messages, setMessages] = useState([]);
+  const [totalCount, setTotalCount] = useState(0);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [hasMore, setHasMore] = useState(false);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [submitting, setSubmitting] = useState(false);
   const [error, setError] = useState('');
 
@@ -26,37 +30,71 @@ const GuestbookPage = ({ isPrivate = false, isDashboard = false }) => {
     fetchMessages();
   }, [weddingId]);
 
+  // Messages come back one page at a time, newest first
+  const messagesUrl = (before) => {
+    const backendUrl = process.env.REACT_APP_BACKEND_URL || 'http://localhost:8001';
+    
+    let url;
+    if (isPrivate && isDashboard) {
+      // Private dashboard guestbook - get messages for user's specific wedding
+      url = `${backendUrl}/api/guestbook/private/${weddingId}`;
+    } else if (isPrivate) {
+      // Private wedding page (shareable link) - get messages for specific wedding
+      url = `${backendUrl}/api/guestbook/${weddingId}`;
+    } else {
+      // Public landing page guestbook - get all public messages
+      url = `${backendUrl}/api/guestbook/public/messages`;
+    }
+    return before ? `${url}?before=${encodeURIComponent(before)}` : url;
+  };
+
+  const applyPage = (data, append) => {
+    setMessages(previous => append ? [...previous, ...(data.messages || [])] : (data.messages || []));
+    // Only the first page is counted; older pages keep its total
+    if (!append) setTotalCount(data.total_count || 0);
+    setNextCursor(data.next_cursor || null);
+    setHasMore(Boolean(data.has_more));
+  };
+
   const fetchMessages = async () => {
     setLoading(true);
     setError('');
     
     try {
-      const backendUrl = process.env.REACT_APP_BACKEND_URL || 'http://localhost:8001';
+      const response = await fetch(messagesUrl());
+      const data = await response.json();
       
-      let response;
-      if (isPrivate && isDashboard) {
-        // Private dashboard guestbook - get messages for user's specific wedding
-        response = await fetch(`${backendUrl}/api/guestbook/private/${weddingId}`);
-      } else if (isPrivate) {
-        // Private wedding page (shareable link) - get messages for specific wedding
-        response = await fetch(`${backendUrl}/api/guestbook/${weddingId}`);
+      if (data.success) {
+        applyPage(data, false);
       } else {
-        // Public landing page guestbook - get all public messages
-        response = await fetch(`${backendUrl}/api/guestbook/public/messages`);
+        setError('Failed to load messages');
       }
-      
+    } catch (err) {
+      console.error('Error fetching messages:', err);
+      setError('Failed to load messages');
+    } finally {
+      setLoading(false);
+    }
+  };
+
+  const loadMoreMessages = async () => {
+    if (!nextCursor || loadingMore) return;
+    setLoadingMore(true);
+    
+    try {
+      const response = await fetch(messagesUrl(nextCursor));
       const data = await response.json();
       
       if (data.success) {
-        setMessages(data.messages || []);
+        applyPage(data, true);
       } else {
         setError('Failed to load messages');
       }
     } catch (err) {
-      console.error('Error fetching messages:', err);
+      console.error('Error fetching older messages:', err);
       setError('Failed to load messages');
     } finally {
-      setLoading(false);
+      setLoadingMore(false);
     }
   };
 
@@ -401,6 +439,22 @@ const GuestbookPage = ({ isPrivate = false, isDashboard = false }) => {
                 </div>
               ))
             )}
+            
+            {!loading && !error && hasMore && (
+              <div className="text-center">
+                <button
+                  onClick={loadMoreMessages}
+                  disabled={loadingMore}
+                  className="px-6 py-3 rounded-xl font-semibold transition-all duration-300 hover:scale-105 disabled:opacity-60"
+                  style={{
+                    background: theme.gradientAccent,
+                    color: theme.primary
+                  }}
+                >
+                  {loadingMore ? 'Loading...' : `Load older messages (${messages.length} of ${totalCount})`}
+                </button>
+              </div>
+            )}
           </div>
         </div>
 
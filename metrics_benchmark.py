@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Benchmark the per-request cost of MetricsMiddleware.
+
+Drives a minimal ASGI app directly (no sockets, no HTTP parsing), with and
+without the middleware, so the difference is the middleware alone:
+
+    python metrics_benchmark.py --requests 200000 --routes 50
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+import metrics  # noqa: E402
+
+
+class Route:
+    def __init__(self, path):
+        self.path = path
+
+
+BODY = b'{"success": true}'
+
+
+async def endpoint(scope, receive, send):
+    # Stands in for the router, which records the matched route on the scope
+    scope["route"] = scope["bench_route"]
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json")]})
+    await send({"type": "http.response.body", "body": BODY})
+
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def send(message):
+    pass
+
+
+async def drive(app, scopes, requests):
+    started = time.perf_counter()
+    for i in range(requests):
+        await app(dict(scopes[i % len(scopes)]), receive, send)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200000)
+    parser.add_argument("--routes", type=int, default=50, help="distinct route templates to spread requests over")
+    args = parser.parse_args()
+
+    scopes = [
+        {"type": "http", "method": "GET", "path": f"/api/bench/{i}", "headers": [], "bench_route": Route(f"/api/bench/{i}")}
+        for i in range(args.routes)
+    ]
+    measured = metrics.MetricsMiddleware(endpoint)
+    asyncio.run(drive(measured, scopes, 1000))  # warm up
+
+    print(f"🔄 {args.requests} requests over {args.routes} routes")
+    bare = asyncio.run(drive(endpoint, scopes, args.requests))
+    with_metrics = asyncio.run(drive(measured, scopes, args.requests))
+    overhead = (with_metrics - bare) / args.requests * 1e6
+    print(f"{'bare app':<22} {bare / args.requests * 1e6:8.2f} µs/request")
+    print(f"{'with MetricsMiddleware':<22} {with_metrics / args.requests * 1e6:8.2f} µs/request")
+    print(f"{'overhead':<22} {overhead:8.2f} µs/request")
+
+    rounds = 100
+    started = time.perf_counter()
+    for _ in range(rounds):
+        text = metrics.render_metrics()
+    elapsed = (time.perf_counter() - started) / rounds
+    print(f"{'/metrics render':<22} {elapsed * 1000:8.2f} ms ({len(text) // 1024} KB, {text.count(chr(10))} lines)")
+
+
+if __name__ == "__main__":
+    main()
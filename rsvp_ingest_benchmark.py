@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Benchmark RSVP submissions per second against a running backend.
+
+Run it once with the default per-request path and once with the server
+started with RSVP_INGEST_MODE=batched, then compare the reported rates:
+
+    python rsvp_ingest_benchmark.py --requests 2000 --concurrency 50
+"""
+
+import argparse
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+def submit(session, base_url, wedding_id, run_id, i):
+    response = session.post(f"{base_url}/api/rsvp", json={
+        "wedding_id": wedding_id,
+        "guest_name": f"Benchmark Guest {i}",
+        "guest_email": f"bench-{run_id}-{i}@example.com",
+        "attendance": "yes",
+        "guest_count": 1
+    }, timeout=30)
+    return response.status_code
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--base-url", default=os.getenv("REACT_APP_BACKEND_URL", "http://localhost:8001"))
+    parser.add_argument("--wedding-id", default="default")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+    
+    run_id = uuid.uuid4().hex[:8]
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_maxsize=args.concurrency)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    
+    print(f"🔄 Submitting {args.requests} RSVPs with concurrency {args.concurrency} to {args.base_url}")
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        statuses = list(pool.map(
+            lambda i: submit(session, args.base_url, args.wedding_id, run_id, i),
+            range(args.requests)
+        ))
+    elapsed = time.perf_counter() - started
+    
+    ok = sum(1 for code in statuses if code == 200)
+    throttled = sum(1 for code in statuses if code == 503)
+    print(f"✅ {ok}/{args.requests} accepted, {throttled} throttled (503)")
+    print(f"⏱️ {elapsed:.2f}s total, {ok / elapsed:.1f} RSVPs/sec")
+
+
+if __name__ == "__main__":
+    main()
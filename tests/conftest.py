@@ -0,0 +1,5 @@
+import os
+import sys
+
+# server.py lives in backend/ and is imported as a top-level module, as uvicorn does
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
@@ -0,0 +1,167 @@
+import asyncio
+
+import pytest
+from pymongo.errors import OperationFailure
+
+import server
+
+
+def compile_all(*operations):
+    return [server.compile_batch_operation(operation) for operation in operations]
+
+
+def test_later_sets_coalesce_earlier_ones_and_appends_share_a_round():
+    operations = compile_all(
+        {"op": "set", "field": "theme", "value": "rustic"},
+        {"op": "add_item", "field": "faqs", "item": {"id": "a", "question": "Parking?"}},
+        {"op": "add_item", "field": "faqs", "item": {"id": "b", "question": "Kids?"}},
+        {"op": "set", "field": "theme", "value": "modern"},
+        {"op": "remove_item", "field": "faqs", "id": "c"},
+    )
+    skip = server.coalesce_batch(operations)
+    assert skip == {0}
+    rounds = server.plan_batch_rounds(operations, skip)
+    assert [batch_round["indexes"] for batch_round in rounds] == [[1, 2, 3], [4]]
+    assert [item["id"] for item in rounds[0]["update"]["$push"]["faqs"]["$each"]] == ["a", "b"]
+    assert rounds[0]["match"] == {"faqs.id": {"$nin": ["a", "b"]}}
+
+
+@pytest.fixture
+def writes(monkeypatch):
+    """update_wedding_section against a wedding whose faqs hold only item "a" """
+    writes = []
+
+    async def update(user_id, update, expected_version=None, projection=None, match=None, match_failure=None, session=None):
+        if match and match.get("faqs.id") not in (None, "a") and "$nin" not in match["faqs.id"]:
+            raise match_failure or server.list_item_not_found("faqs", "?")
+        writes.append((update, session))
+        return {"id": "w1", "version": (expected_version or 0) + 1}
+
+    async def record(wedding_id, version, update, match=None):
+        pass
+
+    monkeypatch.setattr(server, "update_wedding_section", update)
+    monkeypatch.setattr(server, "journal_wedding_update", lambda wedding_id, update, match=None: None)
+    monkeypatch.setattr(server, "record_wedding_revision", record)
+    monkeypatch.setattr(server, "transactions_supported", True)
+    return writes
+
+
+class Session:
+    def __init__(self):
+        self.committed = False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    def start_transaction(self):
+        session = self
+
+        class Transaction:
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, exc_type, *rest):
+                session.committed = exc_type is None
+                return False
+
+        return Transaction()
+
+
+class Client:
+    def __init__(self, error=None):
+        self.error = error
+        self.sessions = []
+
+    async def start_session(self):
+        if self.error:
+            raise self.error
+        self.sessions.append(Session())
+        return self.sessions[-1]
+
+
+MULTI_ROUND = (
+    {"op": "set", "field": "honeymoon_fund", "value": {"title": "Fund"}},
+    {"op": "update_item", "field": "faqs", "id": "a", "changes": {"answer": "Yes"}},
+    {"op": "set", "field": "honeymoon_fund.goal", "value": 500},
+)
+
+
+def run(operations, expected_version=1):
+    rounds = server.plan_batch_rounds(operations, set())
+    return asyncio.run(server.run_batch_rounds("u1", operations, rounds, expected_version))
+
+
+def test_rounds_run_in_one_transaction(writes, monkeypatch):
+    client = Client()
+    monkeypatch.setattr(server.db, "mongodb_client", client)
+    failures, version = run(compile_all(*MULTI_ROUND))
+    assert failures == {0: None, 1: None, 2: None} and version == 3
+    assert client.sessions[0].committed and all(session is client.sessions[0] for _, session in writes)
+
+
+def test_standalone_servers_fall_back_to_chained_writes(writes, monkeypatch):
+    monkeypatch.setattr(server.db, "mongodb_client", Client(OperationFailure("no replica set", code=20)))
+    failures, version = run(compile_all(*MULTI_ROUND))
+    assert failures == {0: None, 1: None, 2: None} and version == 3
+    assert not server.transactions_supported and all(session is None for _, session in writes)
+
+
+def test_a_round_that_misses_is_retried_one_by_one(writes, monkeypatch):
+    monkeypatch.setattr(server.db, "mongodb_client", None)
+    operations = compile_all(
+        {"op": "set", "field": "theme", "value": "rustic"},
+        {"op": "update_item", "field": "faqs", "id": "gone", "changes": {"answer": "Yes"}},
+    )
+    failures, version = run(operations)
+    assert failures[0] is None and failures[1].status_code == 404
+    # The combined attempt wrote nothing; the lone good operation is the only write
+    assert len(writes) == 1 and version == 2
+
+
+def test_autosaves_inside_the_debounce_window_share_one_write(monkeypatch):
+    calls = []
+
+    async def apply(user_id, operations, expected_version=None):
+        calls.append(len(operations))
+        return [{"status": "applied", "n": n} for n in range(len(operations))], 7
+
+    monkeypatch.setattr(server, "apply_wedding_batch", apply)
+    coalescer = server.AutosaveCoalescer(debounce_ms=20, max_wait_ms=1000)
+
+    async def scenario():
+        return await asyncio.gather(
+            coalescer.submit("u1", ["a"]),
+            coalescer.submit("u1", ["b", "c"]),
+            coalescer.submit("u2", ["d"]),
+        )
+
+    first, second, other = asyncio.run(scenario())
+    assert sorted(calls) == [1, 3]
+    assert first == ([{"status": "applied", "n": 0}], 7)
+    assert second == ([{"status": "applied", "n": 1}, {"status": "applied", "n": 2}], 7)
+    assert other[1] == 7 and not coalescer.pending
+
+
+def test_failed_combined_autosave_is_retried_per_caller(monkeypatch):
+    async def apply(user_id, operations, expected_version=None):
+        if "bad" in operations:
+            raise RuntimeError("rejected")
+        return [{"status": "applied"}] * len(operations), 2
+
+    monkeypatch.setattr(server, "apply_wedding_batch", apply)
+    coalescer = server.AutosaveCoalescer(debounce_ms=10, max_wait_ms=1000)
+
+    async def scenario():
+        return await asyncio.gather(
+            coalescer.submit("u1", ["good"]),
+            coalescer.submit("u1", ["bad"]),
+            return_exceptions=True,
+        )
+
+    good, bad = asyncio.run(scenario())
+    assert good == ([{"status": "applied"}], 2)
+    assert isinstance(bad, RuntimeError)
@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+
+import body_limits
+
+
+@pytest.mark.parametrize("path, route", [
+    ("/api/wedding", "wedding"),
+    ("/api/wedding/batch", "wedding"),
+    ("/api/wedding/faq", "wedding_section"),
+    ("/api/wedding/faqs/items", "wedding_item"),
+    ("/api/wedding/faqs/items/abc", "wedding_item"),
+    ("/api/wedding/faqs/order", "wedding_item"),
+    ("/api/uploads", "upload"),
+    ("/api/uploads/sessions/s1", "upload_chunk"),
+    ("/api/auth/login", "auth"),
+    ("/api/rsvp", "rsvp"),
+    ("/api/guestbook/m1/reactions", "guestbook_reaction"),
+    ("/api/guestbook", "guestbook"),
+    ("/api/guestbook/private", "guestbook"),
+    ("/api/wedding/faq/extra", "default"),
+    ("/api/rsvp/w1/search", "default"),
+])
+def test_routes_get_their_own_limit(path, route):
+    assert body_limits.body_limit_for(path)[0] == route
+
+
+def run(middleware, method, path, chunks, content_length=None):
+    """Drive the middleware directly; returns (status, bytes the app read)"""
+    headers = [] if content_length is None else [(b"content-length", str(content_length).encode())]
+    scope = {"type": "http", "method": method, "path": path, "headers": headers}
+    messages = [{"type": "http.request", "body": chunk, "more_body": i < len(chunks) - 1} for i, chunk in enumerate(chunks)]
+    sent, read = [], []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    async def app(scope, receive, send):
+        while True:
+            message = await receive()
+            read.append(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    asyncio.run(middleware(app)(scope, receive, send))
+    return sent[0]["status"], b"".join(read)
+
+
+def test_declared_length_over_the_limit_is_refused_unread():
+    limit = body_limits.body_limit_for("/api/rsvp")[1]
+    status, read = run(body_limits.BodySizeLimitMiddleware, "POST", "/api/rsvp", [b"x"], content_length=limit + 1)
+    assert status == 413 and read == b""
+
+
+def test_streamed_body_is_cut_off_at_the_limit():
+    limit = body_limits.body_limit_for("/api/rsvp")[1]
+    chunks = [b"x" * (limit // 2)] * 3
+    status, read = run(body_limits.BodySizeLimitMiddleware, "POST", "/api/rsvp", chunks)
+    assert status == 413 and len(read) < limit * 1.5
+
+
+def test_bodies_within_the_limit_and_bodyless_methods_pass():
+    assert run(body_limits.BodySizeLimitMiddleware, "POST", "/api/rsvp", [b"{}"], content_length=2)[0] == 200
+    assert run(body_limits.BodySizeLimitMiddleware, "GET", "/api/rsvp", [b""], content_length=10 ** 9)[0] == 200
@@ -0,0 +1,49 @@
+import server
+
+
+def trie(*rows):
+    guests = server.GuestTrie()
+    for row in rows:
+        guests.add(row)
+    return guests
+
+
+ASHA = {"id": "1", "guest_key": "asha@example.com", "guest_name": "Asha Rao", "guest_email": "asha@example.com", "guest_phone": "+1 415 555 0100"}
+BEN = {"id": "2", "guest_key": "ben@example.com", "guest_name": "Ben Ashworth", "guest_email": "ben@example.com", "guest_phone": ""}
+
+
+def ids(rows):
+    return sorted(row["id"] for row in rows)
+
+
+def test_prefix_matches_any_searchable_term():
+    guests = trie(ASHA, BEN)
+    assert ids(guests.search(["ash"])) == ["1", "2"]
+    assert ids(guests.search(["rao"])) == ["1"]
+    assert ids(guests.search(["1415555"])) == ["1"]
+
+
+def test_every_token_must_match():
+    guests = trie(ASHA, BEN)
+    assert ids(guests.search(["ash", "ben"])) == ["2"]
+    assert guests.search(["ash", "zed"]) == []
+
+
+def test_re_adding_a_guest_replaces_their_old_terms():
+    guests = trie(ASHA)
+    guests.add({**ASHA, "guest_name": "Asha Menon"})
+    assert guests.search(["rao"]) == []
+    assert ids(guests.search(["menon"])) == ["1"]
+
+
+def test_removed_guests_no_longer_match():
+    guests = trie(ASHA, BEN)
+    guests.remove("2")
+    assert ids(guests.search(["ash"])) == ["1"]
+    assert "ben@example.com" not in guests.ids_by_guest_key
+
+
+def test_stored_prefixes_agree_with_the_trie():
+    prefixes = server.rsvp_search_prefixes(ASHA)
+    assert "ash" in prefixes and "rao" in prefixes
+    assert all(len(prefix) <= server.RSVP_SEARCH_MAX_PREFIX for prefix in prefixes)
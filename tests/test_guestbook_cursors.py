@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import server
+
+
+def message(created_at, message_id):
+    return {"created_at": created_at, "id": message_id, "message": "hi"}
+
+
+def test_cursor_round_trips_the_sort_key():
+    cursor = server.encode_guestbook_cursor(message("2026-05-01T10:00:00", "m1"))
+    assert server.decode_guestbook_cursor(cursor) == ("2026-05-01T10:00:00", "m1")
+
+
+def test_cursor_is_url_safe():
+    cursor = server.encode_guestbook_cursor(message("2026-05-01T10:00:00", "??>>//"))
+    assert set(cursor) <= set("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_=")
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", "", "W10=", "eyJhIjogMX0="])
+def test_malformed_cursor_is_a_400(cursor):
+    with pytest.raises(HTTPException) as error:
+        server.decode_guestbook_cursor(cursor)
+    assert error.value.status_code == 400
+
+
+def test_page_cursors_point_past_both_ends():
+    page = [message("2026-05-03", "c"), message("2026-05-02", "b")]
+    result = server.guestbook_page(page, has_more=True, total_count=5)
+    assert result["count"] == 2 and result["total_count"] == 5 and result["has_more"]
+    assert server.decode_guestbook_cursor(result["next_cursor"]) == ("2026-05-02", "b")
+    assert server.decode_guestbook_cursor(result["prev_cursor"]) == ("2026-05-03", "c")
+
+
+def test_empty_page_keeps_the_cursors_it_was_given():
+    result = server.guestbook_page([], has_more=False, total_count=0, before="older", after="newer")
+    assert result["next_cursor"] == "older" and result["prev_cursor"] == "newer"
+
+
+class Guestbook:
+    def __init__(self, messages):
+        self.messages = messages
+        self.counts = 0
+
+    def find(self, query, projection):
+        return self
+
+    def sort(self, keys):
+        return self
+
+    def limit(self, count):
+        self.page_size = count
+        return self
+
+    async def to_list(self, length):
+        return self.messages[:self.page_size]
+
+    async def count_documents(self, query):
+        self.counts += 1
+        return len(self.messages)
+
+
+def test_only_the_first_page_is_counted(monkeypatch):
+    guestbook = Guestbook([message(f"2026-05-0{n}", f"m{n}") for n in range(9, 0, -1)])
+    monkeypatch.setattr(server.db, "database", type("Database", (), {"guestbook": guestbook})())
+    first = asyncio.run(server.paginate_guestbook({"wedding_id": "w1"}, 3, None, None))
+    assert first["total_count"] == 9 and first["count"] == 3 and first["has_more"]
+    older = asyncio.run(server.paginate_guestbook({"wedding_id": "w1"}, 3, first["next_cursor"], None))
+    assert older["total_count"] is None and guestbook.counts == 1
@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+
+import server
+
+MESSAGES = [
+    {"id": "m1", "created_at": "2026-05-01", "name": "Zoë Park", "relationship": "Friend", "message": "Congratulations!"},
+    {"id": "m2", "created_at": "2026-05-02", "name": "Sam", "relationship": "College friend", "message": "So happy for you"},
+    {"id": "m3", "created_at": "2026-05-03", "name": "Lee", "relationship": "Cousin", "message": "Happy for you, my friend"},
+    {"id": "m4", "created_at": "2026-05-04", "name": "Ada", "relationship": "Aunt", "message": "You two, happy forever"},
+]
+
+
+def ranked_ids(q):
+    return [message["id"] for _, message in server.GuestbookInvertedIndex(MESSAGES).search(q)]
+
+
+def test_relationship_matches_outrank_message_matches():
+    assert ranked_ids("friend") == ["m2", "m1", "m3"]
+    # Accents and case don't matter
+    assert ranked_ids("ZOE") == ["m1"]
+
+
+def test_phrases_must_appear_in_order():
+    assert ranked_ids('"happy for you"') == ["m3", "m2"]
+    assert ranked_ids('"you happy"') == []
+
+
+def test_equally_relevant_messages_list_newest_first():
+    assert ranked_ids("happy") == ["m4", "m3", "m2"]
+
+
+class Guestbook:
+    def __init__(self):
+        self.reads = 0
+
+    def find(self, query, projection):
+        self.reads += 1
+        self.wedding_id = query["wedding_id"]
+        return self
+
+    def sort(self, keys):
+        return self
+
+    async def to_list(self, length):
+        return [{**message, "id": f"{self.wedding_id}-{message['id']}"} for message in MESSAGES]
+
+
+@pytest.fixture
+def guestbook(monkeypatch):
+    guestbook = Guestbook()
+    monkeypatch.setattr(server.db, "database", type("Database", (), {"guestbook": guestbook})())
+    return guestbook
+
+
+def test_indexes_are_reused_until_invalidated_or_evicted(guestbook):
+    cache = server.GuestbookSearchCache(max_weddings=2)
+
+    async def scenario():
+        first = await cache.get("w1")
+        assert await cache.get("w1") is first and guestbook.reads == 1
+        cache.invalidate("w1")
+        assert await cache.get("w1") is not first and guestbook.reads == 2
+        await cache.get("w2")
+        await cache.get("w1")
+        await cache.get("w3")  # w2 is the least recently searched
+        assert list(cache.indexes) == ["w1", "w3"]
+
+    asyncio.run(scenario())
+
+
+def test_stale_index_is_rebuilt(guestbook, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(server.time, "monotonic", lambda: clock[0])
+    cache = server.GuestbookSearchCache(max_weddings=2)
+    asyncio.run(cache.get("w1"))
+    clock[0] += server.GUESTBOOK_SEARCH_CACHE_TTL_SECONDS
+    asyncio.run(cache.get("w1"))
+    assert guestbook.reads == 2
+
+
+def test_memory_backend_pages_ranked_results(guestbook, monkeypatch):
+    monkeypatch.setattr(server, "GUESTBOOK_SEARCH_BACKEND", "memory")
+    monkeypatch.setattr(server, "guestbook_search_cache", server.GuestbookSearchCache(2))
+    first = asyncio.run(server.search_guestbook_messages("w1", q="happy", limit=2, offset=0))
+    assert [m["id"] for m in first["messages"]] == ["w1-m4", "w1-m3"] and first["has_more"]
+    assert all(m["score"] > 0 for m in first["messages"])
+    rest = asyncio.run(server.search_guestbook_messages("w1", q="happy", limit=2, offset=2))
+    assert [m["id"] for m in rest["messages"]] == ["w1-m2"] and not rest["has_more"]
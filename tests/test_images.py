@@ -0,0 +1,202 @@
+import asyncio
+import hashlib
+import os
+
+import pytest
+
+import images
+
+A, B = "https://a.example/1.jpg", "https://b.example/2.jpg"
+
+
+def test_sources_are_counted_across_weddings():
+    sources = images.WeddingImageSources()
+    sources.update("w1", {"gallery_photos": [{"src": A}, {"url": B}], "bridal_party": [{"photo": "/api/uploads/x"}]})
+    sources.update("w2", {"registry_items": [{"image": A}]})
+    assert sources.counts == {A: 2, B: 1}
+    sources.update("w1", {"gallery_photos": [{"src": A}]})
+    sources.update("w2", None)
+    assert sources.counts == {A: 1} and set(sources.by_wedding) == {"w1"}
+
+
+class Weddings:
+    def __init__(self, *weddings):
+        self.weddings = {wedding["id"]: wedding for wedding in weddings}
+        self.reads = 0
+
+    def find(self, query, projection):
+        return self._iterate()
+
+    async def _iterate(self):
+        for wedding in self.weddings.values():
+            yield wedding
+
+    async def find_one(self, query, projection):
+        self.reads += 1
+        return self.weddings.get(query["id"])
+
+
+@pytest.fixture
+def weddings(monkeypatch):
+    weddings = Weddings({"id": "w1", "gallery_photos": [{"src": A}]})
+    monkeypatch.setattr(images.db, "database", type("Database", (), {"weddings": weddings})())
+    return weddings
+
+
+def test_lookups_refresh_only_marked_weddings(weddings):
+    sources = images.WeddingImageSources()
+
+    async def scenario():
+        await sources.load({"w9": {"story_timeline": [{"image": B}]}})
+        assert await sources.contains(A) and await sources.contains(B)
+        assert not await sources.contains("https://evil.example/x") and weddings.reads == 0
+        weddings.weddings["w1"]["gallery_photos"] = []
+        sources.mark("w1")
+        assert not await sources.contains(A) and weddings.reads == 1
+
+    asyncio.run(scenario())
+
+
+def test_lookups_before_the_load_finishes_are_refused(monkeypatch):
+    monkeypatch.setattr(images, "IMAGE_SOURCES_LOAD_WAIT_SECONDS", 0.01)
+    assert not asyncio.run(images.WeddingImageSources().contains(A))
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return images.ImageCache(tmp_path, 10_000)
+
+
+def fake_download(monkeypatch, outcomes):
+    calls = []
+
+    def download(url, directory):
+        calls.append(url)
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        directory.mkdir(parents=True, exist_ok=True)
+        temp_path = directory / "fetch.tmp"
+        temp_path.write_bytes(outcome)
+        return hashlib.sha256(outcome).hexdigest(), temp_path
+
+    monkeypatch.setattr(images, "download_image", download)
+    return calls
+
+
+def test_concurrent_fetches_share_one_download(cache, monkeypatch):
+    calls = fake_download(monkeypatch, [b"jpeg"])
+
+    async def scenario():
+        return await asyncio.gather(*(cache.fetch_original(A) for _ in range(5)))
+
+    digests = asyncio.run(scenario())
+    assert calls == [A] and set(digests) == {hashlib.sha256(b"jpeg").hexdigest()}
+    assert not cache.inflight
+    # Later requests are answered from the source record
+    assert asyncio.run(cache.fetch_original(A)) == digests[0] and calls == [A]
+
+
+def test_failed_fetch_is_not_retried_until_its_backoff_passes(cache, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(images.time, "monotonic", lambda: clock[0])
+    calls = fake_download(monkeypatch, [ValueError("Image host answered 404"), b"jpeg"])
+    for _ in range(2):
+        with pytest.raises(ValueError, match="404"):
+            asyncio.run(cache.fetch_original(A))
+    assert calls == [A]
+    clock[0] += images.IMAGE_FETCH_RETRY_SECONDS + 1
+    asyncio.run(cache.fetch_original(A))
+    assert calls == [A, A] and not cache.failed_fetches
+
+
+class Response:
+    def __init__(self, status, location=None):
+        self.status = status
+        self.headers = {"Location": location, "Content-Type": "image/jpeg"}
+
+    def getheader(self, name):
+        return self.headers.get(name)
+
+
+class Connection:
+    """Answers from a host -> response table, recording which address it was pinned to"""
+
+    routes = {}
+    opened = []
+
+    def __init__(self, host, address, port=None, timeout=None):
+        self.host = host
+        Connection.opened.append((host, address))
+
+    def request(self, method, target, headers):
+        pass
+
+    def getresponse(self):
+        return Connection.routes[self.host]
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def network(monkeypatch):
+    addresses = {"images.example": "93.184.216.34", "cdn.example": "93.184.216.35", "internal.example": "10.0.0.5"}
+
+    def resolve(host):
+        if addresses[host].startswith("10."):
+            raise ValueError("Only public image hosts can be fetched")
+        return addresses[host]
+
+    monkeypatch.setattr(images, "resolve_public_address", resolve)
+    monkeypatch.setattr(images, "PinnedHTTPConnection", Connection)
+    monkeypatch.setattr(images, "PinnedHTTPSConnection", Connection)
+    Connection.opened = []
+    return Connection.routes
+
+
+def test_redirects_are_followed_to_a_pinned_public_address(network):
+    network.update({
+        "images.example": Response(302, "https://cdn.example/1.jpg"),
+        "cdn.example": Response(200),
+    })
+    connection, response = images.open_public_image("https://images.example/1.jpg")
+    assert response.status == 200
+    assert Connection.opened == [("images.example", "93.184.216.34"), ("cdn.example", "93.184.216.35")]
+
+
+@pytest.mark.parametrize("location", [
+    "http://internal.example/latest/meta-data",
+    "file:///etc/passwd",
+])
+def test_redirects_to_private_or_non_http_targets_are_refused(network, location):
+    network["images.example"] = Response(301, location)
+    with pytest.raises(ValueError, match="public"):
+        images.open_public_image("https://images.example/1.jpg")
+    assert Connection.opened == [("images.example", "93.184.216.34")]
+
+
+def test_redirect_loops_give_up(network):
+    network["images.example"] = Response(302, "/again")
+    with pytest.raises(ValueError, match="Too many redirects"):
+        images.open_public_image("https://images.example/1.jpg")
+    assert len(Connection.opened) == images.IMAGE_FETCH_MAX_REDIRECTS + 1
+
+
+def test_load_keeps_files_added_during_the_scan_as_most_recent(cache):
+    paths = []
+    for n in range(3):
+        path = cache.variant_path(f"{n}" * 64, 320, "webp")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"x" * 100)
+        os.utime(path, (1000 + n, 1000 + n))
+        paths.append(path)
+    fresh = cache.variant_path("f" * 64, 320, "webp")
+    fresh.parent.mkdir(parents=True, exist_ok=True)
+    fresh.write_bytes(b"x" * 50)
+    cache.add(fresh, 50)
+    cache.max_bytes = 260
+    asyncio.run(cache.load())
+    # The oldest scanned file is evicted; the one added while loading is kept, last in line
+    assert list(cache.entries) == [paths[1], paths[2], fresh]
+    assert cache.total_bytes == 250 and not paths[0].exists()
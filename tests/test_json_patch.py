@@ -0,0 +1,96 @@
+import pytest
+from fastapi import HTTPException
+
+import server
+
+
+def wedding():
+    return {
+        "couple_name_1": "Asha",
+        "honeymoon_fund": {"goal": 100},
+        "story_timeline": [{"id": "a", "title": "first"}, {"id": "b", "title": "second"}],
+        "faqs": [],
+    }
+
+
+def patch(operations, document=None):
+    return server.json_patch_to_update(document or wedding(), operations)
+
+
+def test_numeric_key_on_an_object_is_a_member_not_an_index():
+    update, patched = patch([{"op": "add", "path": "/honeymoon_fund/2019", "value": "x"}])
+    assert update == {"$set": {"honeymoon_fund.2019": "x"}}
+    assert patched["honeymoon_fund"] == {"goal": 100, "2019": "x"}
+
+
+def test_replace_past_the_end_of_an_array_is_an_error():
+    with pytest.raises(HTTPException) as error:
+        patch([{"op": "replace", "path": "/story_timeline/2", "value": {"title": "x"}}])
+    assert error.value.status_code == 409
+
+
+def test_add_may_append_at_the_length_but_not_beyond():
+    update, patched = patch([{"op": "add", "path": "/story_timeline/2", "value": {"title": "third"}}])
+    assert [item["title"] for item in patched["story_timeline"]] == ["first", "second", "third"]
+    assert list(update["$set"]) == ["story_timeline"]
+    with pytest.raises(HTTPException):
+        patch([{"op": "add", "path": "/story_timeline/3", "value": {}}])
+
+
+def test_index_with_leading_zero_is_rejected():
+    with pytest.raises(HTTPException):
+        patch([{"op": "replace", "path": "/story_timeline/01", "value": {}}])
+
+
+def test_test_uses_exact_equality():
+    document = {**wedding(), "tags": ["x", "y"], "flag": True}
+    with pytest.raises(HTTPException):
+        patch([{"op": "test", "path": "/tags", "value": "x"}], document)
+    with pytest.raises(HTTPException):
+        patch([{"op": "test", "path": "/flag", "value": 1}], document)
+    update, _ = patch([{"op": "test", "path": "/tags", "value": ["x", "y"]}], document)
+    assert update == {}
+
+
+def test_operations_apply_in_order():
+    update, patched = patch([
+        {"op": "add", "path": "/story_timeline/0", "value": {"title": "zero"}},
+        {"op": "test", "path": "/story_timeline/1/title", "value": "first"},
+        {"op": "remove", "path": "/story_timeline/2"},
+    ])
+    assert [item["title"] for item in patched["story_timeline"]] == ["zero", "first"]
+    # Index-shifting changes rewrite the array once rather than clashing paths
+    assert update == {"$set": {"story_timeline": patched["story_timeline"]}}
+
+
+def test_remove_object_member_unsets_it():
+    update, _ = patch([{"op": "remove", "path": "/honeymoon_fund/goal"}])
+    assert update == {"$unset": {"honeymoon_fund.goal": ""}}
+
+
+def test_move_and_copy():
+    update, patched = patch([
+        {"op": "copy", "from": "/couple_name_1", "path": "/couple_name_2"},
+        {"op": "move", "from": "/story_timeline/1", "path": "/faqs/-"},
+    ])
+    assert patched["couple_name_2"] == "Asha"
+    assert patched["faqs"] == [{"id": "b", "title": "second"}]
+    assert set(update["$set"]) == {"couple_name_2", "story_timeline", "faqs"}
+
+
+def test_missing_target_and_protected_fields_are_rejected():
+    with pytest.raises(HTTPException) as error:
+        patch([{"op": "replace", "path": "/theme", "value": "x"}])
+    assert error.value.status_code == 409
+    with pytest.raises(HTTPException) as error:
+        patch([{"op": "replace", "path": "/version", "value": 9}])
+    assert error.value.status_code == 400
+
+
+def test_update_replays_onto_the_backup_like_mongo():
+    document = wedding()
+    update, patched = patch([
+        {"op": "replace", "path": "/story_timeline/1/title", "value": "2nd"},
+        {"op": "add", "path": "/honeymoon_fund/2019", "value": "x"},
+    ], document)
+    assert server.apply_update_to_document(document, update) == patched
@@ -0,0 +1,58 @@
+import asyncio
+import copy
+
+import server
+
+
+def test_item_ids_match_in_either_stored_form():
+    assert server.item_id_values("7") == ["7", 7]
+    assert server.item_id_values("07") == ["07"]
+    assert server.item_id_condition("abc") == "abc"
+    document = {"faqs": [{"id": 7}, {"id": "x"}]}
+    server.apply_update_to_document(document, {"$pull": {"faqs": {"id": server.item_id_condition("7")}}})
+    assert document == {"faqs": [{"id": "x"}]}
+
+
+FAQS = [{"question": "Parking?", "answer": "Yes"}, {"id": 7, "question": "Kids?"}, {"question": "Parking?", "answer": "Yes"}]
+
+
+def test_saving_the_same_list_twice_gives_the_same_ids():
+    first = server.validate_wedding_field("faqs", copy.deepcopy(FAQS))
+    second = server.validate_wedding_field("faqs", copy.deepcopy(FAQS))
+    assert [item["id"] for item in first] == [item["id"] for item in second]
+    # Ids already given are kept; equal items at different positions still differ
+    assert first[1]["id"] == 7 and first[0]["id"] != first[2]["id"]
+    # Editing an id-less item is what gives it a new id
+    edited = server.validate_wedding_field("faqs", [{"question": "Parking?", "answer": "No"}])
+    assert edited[0]["id"] != first[0]["id"]
+    # The same content in another list is another item
+    assert server.validate_wedding_field("story_timeline", [{"title": "Met"}])[0]["id"] != \
+        server.validate_wedding_field("schedule_events", [{"title": "Met"}])[0]["id"]
+
+
+class Weddings:
+    def __init__(self, wedding):
+        self.wedding = wedding
+
+    async def find_one_and_update(self, query, update, return_document, projection, session):
+        before = copy.deepcopy(self.wedding)
+        server.apply_update_to_document(self.wedding, update)
+        return before
+
+
+def test_resaving_an_id_less_list_journals_no_change(monkeypatch):
+    stored = {"id": "w1", "user_id": "u1", "version": 1, "faqs": server.validate_wedding_field("faqs", copy.deepcopy(FAQS))}
+    journaled = []
+
+    async def collections():
+        return None, Weddings(stored)
+
+    async def record(wedding_id, version, update, match=None):
+        pass
+
+    monkeypatch.setattr(server, "get_collections", collections)
+    monkeypatch.setattr(server, "journal_wedding_update", lambda wedding_id, update, match=None: journaled.append(update))
+    monkeypatch.setattr(server, "record_wedding_revision", record)
+    update = {"$set": server.validate_wedding_sections({"faqs": copy.deepcopy(FAQS)})}
+    asyncio.run(server.update_wedding_section("u1", update, minimize=True))
+    assert "faqs" not in journaled[0]["$set"]
@@ -0,0 +1,81 @@
+import asyncio
+import json
+import logging
+import queue
+
+import logging_config
+
+
+def record(name="server", level=logging.INFO, message="hello %s", args=("world",), **extra):
+    entry = logging.LogRecord(name, level, __file__, 1, message, args, None)
+    entry.__dict__.update(extra)
+    return entry
+
+
+def test_json_formatter_writes_one_object_with_extra_keys():
+    line = logging_config.JsonLogFormatter().format(record(wedding_id="w1", request_id=None))
+    entry = json.loads(line)
+    assert entry["message"] == "hello world" and entry["level"] == "INFO" and entry["logger"] == "server"
+    assert entry["wedding_id"] == "w1"
+    assert "request_id" not in entry and "args" not in entry
+
+
+def test_context_filter_tags_records_with_the_request_id():
+    token = logging_config.request_id_var.set("abc")
+    try:
+        entry = record(level=logging.WARNING)
+        assert logging_config.LogContextFilter().filter(entry)
+        assert entry.request_id == "abc"
+    finally:
+        logging_config.request_id_var.reset(token)
+
+
+def test_context_filter_samples_only_chatty_loggers_below_warning(monkeypatch):
+    monkeypatch.setattr(logging_config, "LOG_SAMPLE_RATES", {"server.sessions": 0.0})
+    log_filter = logging_config.LogContextFilter()
+    assert not log_filter.filter(record(name="server.sessions"))
+    assert not log_filter.filter(record(name="server.sessions.store"))
+    assert log_filter.filter(record(name="server.sessions", level=logging.WARNING))
+    assert log_filter.filter(record(name="server.sessionsx"))
+
+
+def test_queue_handler_drops_records_instead_of_blocking():
+    handler = logging_config.LoopSafeQueueHandler(queue.Queue(1))
+    handler.emit(record(message="first", args=()))
+    handler.emit(record(message="second", args=()))
+    assert handler.queue.qsize() == 1
+    assert handler.queue.get_nowait().getMessage() == "first"
+
+
+def test_logger_settings_parse_and_skip_blanks():
+    assert logging_config.parse_logger_settings("server.sessions=0.1, uvicorn.access=WARNING,,x=") == {
+        "server.sessions": "0.1",
+        "uvicorn.access": "WARNING",
+    }
+
+
+def run_request(headers):
+    sent = []
+    seen = []
+
+    async def app(scope, receive, send):
+        seen.append(logging_config.request_id_var.get())
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": headers}
+    asyncio.run(logging_config.RequestIdMiddleware(app)(scope, None, send))
+    return seen[0], dict(sent[0]["headers"])[b"x-request-id"].decode()
+
+
+def test_request_id_from_a_proxy_is_kept_and_echoed():
+    assert run_request([(b"x-request-id", b"edge-42")]) == ("edge-42", "edge-42")
+
+
+def test_malformed_request_id_is_replaced():
+    bound, echoed = run_request([(b"x-request-id", b"bad id\nwith newline")])
+    assert bound == echoed and len(bound) == 32
+    assert logging_config.request_id_var.get() is None
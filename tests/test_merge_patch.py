@@ -0,0 +1,29 @@
+import pytest
+from fastapi import HTTPException
+
+import server
+
+
+def test_nested_objects_become_dotted_sets_and_nulls_unsets():
+    update = server.merge_patch_to_update({"couple_name_1": "Asha", "honeymoon_fund": {"goal": 100, "title": None}})
+    assert update == {
+        "$set": {"couple_name_1": "Asha", "honeymoon_fund.goal": 100},
+        "$unset": {"honeymoon_fund.title": ""},
+    }
+
+
+def test_without_nesting_objects_are_set_whole_minus_their_nulls():
+    update = server.merge_patch_to_update({"honeymoon_fund": {"goal": 100, "title": None}}, nested=False)
+    assert update == {"$set": {"honeymoon_fund": {"goal": 100}}}
+
+
+def test_arrays_are_replaced_not_merged():
+    update = server.merge_patch_to_update({"faqs": [{"question": "q"}]})
+    assert update == {"$set": {"faqs": [{"question": "q"}]}}
+
+
+@pytest.mark.parametrize("patch", [{"version": 3}, {"id": "x"}, {"$where": 1}, {"a.b": 1}, {"honeymoon_fund": {"$inc": 1}}])
+def test_protected_and_operator_keys_are_rejected(patch):
+    with pytest.raises(HTTPException) as error:
+        server.merge_patch_to_update(patch)
+    assert error.value.status_code == 400
@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+
+import metrics
+
+
+@pytest.fixture(autouse=True)
+def fresh_registry(monkeypatch):
+    monkeypatch.setattr(metrics, "route_metrics", {})
+    monkeypatch.setattr(metrics, "requests_in_flight", metrics.Counter())
+    monkeypatch.setattr(metrics, "cache_metrics", metrics.Counter())
+
+
+class Route:
+    def __init__(self, path):
+        self.path = path
+
+
+def run(path="/api/wedding/x/items", template="/api/wedding/{field}/items", status=201, body=b"12345", fail=False):
+    async def app(scope, receive, send):
+        if template is not None:
+            scope["route"] = Route(template)
+        if fail:
+            raise RuntimeError("boom")
+        await send({"type": "http.response.start", "status": status, "headers": []})
+        await send({"type": "http.response.body", "body": body})
+
+    async def send(message):
+        pass
+
+    scope = {"type": "http", "method": "POST", "path": path, "headers": []}
+    asyncio.run(metrics.MetricsMiddleware(app)(scope, None, send))
+
+
+def test_histogram_buckets_are_cumulative_on_export():
+    histogram = metrics.Histogram((1, 10))
+    for value in (0.5, 1, 5, 50):
+        histogram.observe(value)
+    assert histogram.export("x", 'a="b"') == [
+        'x_bucket{a="b",le="1"} 2',
+        'x_bucket{a="b",le="10"} 3',
+        'x_bucket{a="b",le="+Inf"} 4',
+        'x_sum{a="b"} 56.5',
+        'x_count{a="b"} 4',
+    ]
+
+
+def test_requests_are_labelled_by_route_template():
+    run()
+    run()
+    route = metrics.route_metrics[("POST", "/api/wedding/{field}/items")]
+    assert route.statuses == {201: 2}
+    assert route.response_size.total == 10
+    assert metrics.requests_in_flight["POST"] == 0
+
+
+def test_unmatched_and_failed_requests_are_counted():
+    run(template=None, status=404)
+    with pytest.raises(RuntimeError):
+        run(fail=True)
+    assert metrics.route_metrics[("POST", "unmatched")].statuses == {404: 1}
+    assert metrics.route_metrics[("POST", "/api/wedding/{field}/items")].statuses == {500: 1}
+    assert metrics.requests_in_flight["POST"] == 0
+
+
+def test_render_escapes_labels_and_includes_cache_counts():
+    run(template='/api/"odd"\\route')
+    metrics.record_cache("sessions", True)
+    metrics.record_cache("sessions", False)
+    metrics.record_cache("sessions", False)
+    text = metrics.render_metrics()
+    assert 'http_requests_total{method="POST",route="/api/\\"odd\\"\\\\route",status="201"} 1' in text
+    assert 'cache_requests_total{cache="sessions",result="miss"} 2' in text
+    assert text.endswith("\n")
+
+
+def test_scrape_requires_the_token_when_one_is_set(monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_TOKEN", "secret")
+    with pytest.raises(metrics.HTTPException) as error:
+        asyncio.run(metrics.prometheus_metrics(authorization="Bearer wrong"))
+    assert error.value.status_code == 401
+    response = asyncio.run(metrics.prometheus_metrics(authorization="Bearer secret"))
+    assert response.media_type.startswith("text/plain")
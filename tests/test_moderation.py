@@ -0,0 +1,171 @@
+import asyncio
+import ipaddress
+
+import pytest
+from starlette.requests import Request
+
+import moderation
+
+
+@pytest.fixture(autouse=True)
+def fresh_windows(monkeypatch):
+    monkeypatch.setattr(moderation, "recent_message_hashes", moderation.RecentWindow(3600))
+    monkeypatch.setattr(moderation, "recent_posts_by_ip", moderation.RecentWindow(600))
+
+
+def message(text, name="Ana", wedding_id="w1", message_id="m1"):
+    return {"id": message_id, "wedding_id": wedding_id, "name": name, "message": text}
+
+
+def moderate(entry, client_ip=None):
+    return moderation.GuestbookModerator(1, 10, 250, print).moderate(entry, client_ip)
+
+
+def test_clean_message_is_approved():
+    assert moderate(message("So happy for you both, see you in June!")) is None
+
+
+def test_link_heavy_and_blocklisted_messages_are_rejected():
+    assert moderate(message("www.a.example http://b.example")) == "too_many_links"
+    assert moderate(message("Free CASINO bonus")) == "blocked_term"
+
+
+def test_same_guest_posting_twice_is_a_duplicate():
+    assert moderate(message("Congratulations!")) is None
+    assert moderate(message("congratulations")) == "duplicate_message"
+    assert moderate(message("Congratulations!", name="Ben")) is None
+
+
+def test_long_text_sprayed_across_weddings_is_a_duplicate():
+    text = "Visit my shop for the best wedding deals around"
+    for wedding_id in ("w1", "w2", "w3"):
+        assert moderate(message(text, wedding_id=wedding_id)) is None
+    assert moderate(message(text, wedding_id="w4")) == "duplicate_message"
+
+
+def test_posts_from_one_ip_are_rate_limited():
+    reasons = [moderate(message(f"note {n}", message_id=str(n)), "203.0.113.9") for n in range(6)]
+    assert reasons == [None] * 5 + ["rate_limited"]
+
+
+def test_failing_check_is_skipped(monkeypatch):
+    def broken(entry, client_ip):
+        raise ValueError("boom")
+
+    monkeypatch.setattr(moderation, "GUESTBOOK_MODERATION_CHECKS", [broken, moderation.check_blocklist])
+    assert moderate(message("xxx")) == "blocked_term"
+
+
+def request(peer, *forwarded):
+    headers = [(b"x-forwarded-for", value.encode()) for value in forwarded]
+    return Request({"type": "http", "headers": headers, "client": (peer, 1234)})
+
+
+@pytest.fixture
+def behind_proxy(monkeypatch):
+    monkeypatch.setattr(moderation, "TRUSTED_PROXIES", [ipaddress.ip_network("10.0.0.0/8")])
+
+
+def test_forwarded_header_from_an_untrusted_peer_is_ignored(behind_proxy):
+    assert moderation.client_ip_of(request("198.51.100.7", "1.2.3.4")) == "198.51.100.7"
+
+
+def test_trusted_proxy_gives_the_rightmost_untrusted_hop(behind_proxy):
+    spoofed = request("10.0.0.2", "1.2.3.4, 198.51.100.7, 10.0.0.5", "10.0.0.3")
+    assert moderation.client_ip_of(spoofed) == "198.51.100.7"
+    assert moderation.client_ip_of(request("10.0.0.2", "10.0.0.9")) == "10.0.0.9"
+    assert moderation.client_ip_of(request("10.0.0.2")) == "10.0.0.2"
+
+
+class Cursor:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def sort(self, key, direction):
+        self.documents = sorted(self.documents, key=lambda document: document[key], reverse=direction < 0)
+        return self
+
+    def limit(self, count):
+        self.documents = self.documents[:count]
+        return self
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for document in self.documents:
+            yield dict(document)
+
+
+class FakeGuestbook:
+    def __init__(self, messages):
+        self.messages = {entry["id"]: entry for entry in messages}
+        self.fail_writes = False
+
+    def find(self, query, projection):
+        created_before = query.get("created_at", {}).get("$lt", "~")
+        return Cursor([
+            entry for entry in self.messages.values()
+            if entry["moderation_state"] == query["moderation_state"] and entry["created_at"] < created_before
+        ])
+
+    async def bulk_write(self, operations, ordered):
+        if self.fail_writes:
+            raise OSError("primary stepped down")
+        for operation in operations:
+            entry = self.messages[operation._filter["id"]]
+            if entry["moderation_state"] == operation._filter["moderation_state"]:
+                entry.update(operation._doc["$set"])
+
+
+@pytest.fixture
+def guestbook(monkeypatch):
+    messages = [
+        dict(message(f"hello {n}", message_id=f"m{n}"), created_at=f"2026-05-01T10:00:0{n}", moderation_state="pending")
+        for n in range(3)
+    ]
+    collection = FakeGuestbook(messages)
+    monkeypatch.setattr(moderation.db, "database", type("Database", (), {"guestbook": collection})())
+    return collection
+
+
+def test_messages_dropped_by_a_full_queue_are_requeued(guestbook):
+    async def scenario():
+        published = []
+        moderator = moderation.GuestbookModerator(1, 10, 250, published.append)
+        moderator.queue = asyncio.Queue(maxsize=2)
+        assert await moderator.requeue_pending() == 2
+        assert await moderator.requeue_pending() == 0
+        # Moderate and write back what was queued; the third message is still pending
+        while not moderator.queue.empty():
+            entry, client_ip = moderator.queue.get_nowait()
+            moderator.decisions.append((entry, "approved", None))
+        await moderator.flush()
+        assert [entry["id"] for entry in published] == ["m0", "m1"]
+        assert await moderator.requeue_pending() == 1
+        assert moderator.queue.get_nowait()[0]["id"] == "m2"
+
+    asyncio.run(scenario())
+
+
+def test_failed_decision_write_leaves_messages_for_the_next_poll(guestbook):
+    async def scenario():
+        published = []
+        moderator = moderation.GuestbookModerator(1, 10, 250, published.append)
+        await moderator.requeue_pending()
+        while not moderator.queue.empty():
+            entry, client_ip = moderator.queue.get_nowait()
+            moderator.decisions.append((entry, "rejected", "blocked_term"))
+        guestbook.fail_writes = True
+        await moderator.flush()
+        assert not moderator.queued and not published
+        assert {entry["moderation_state"] for entry in guestbook.messages.values()} == {"pending"}
+        assert await moderator.requeue_pending() == 3
+
+    asyncio.run(scenario())
+
+
+def test_fresh_messages_are_left_to_the_worker_that_received_them(guestbook):
+    moderator = moderation.GuestbookModerator(1, 10, 250, print)
+    guestbook.messages["m2"]["created_at"] = "9999-01-01T00:00:00"
+    assert asyncio.run(moderator.requeue_pending(min_age_seconds=60)) == 2
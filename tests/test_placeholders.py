@@ -0,0 +1,115 @@
+import asyncio
+import io
+from types import SimpleNamespace
+
+import pytest
+
+import images
+import server
+
+DIGEST = "a" * 64
+UPLOADED = f"/api/uploads/{DIGEST}"
+REMOTE = "https://images.example/1.jpg"
+PLACEHOLDER = {"width": 1200, "height": 800, "preview": "data:image/webp;base64,AA=="}
+
+
+def test_placeholders_are_redone_when_the_src_changes():
+    item = {"id": "p1", "src": UPLOADED}
+    assert server.needs_placeholder(item)
+    item["placeholder"] = {**PLACEHOLDER, "source": server.placeholder_source_key(UPLOADED)}
+    assert not server.needs_placeholder(item)
+    item["src"] = REMOTE
+    assert server.needs_placeholder(item)
+    # Items without an image, or without an id to write back to, are skipped
+    assert not server.needs_placeholder({"id": "p2", "caption": "x"})
+    assert not server.needs_placeholder({"src": UPLOADED})
+
+
+class Weddings:
+    def __init__(self, wedding):
+        self.wedding = wedding
+
+    async def find_one(self, query, projection):
+        return self.wedding
+
+    async def update_one(self, query, update):
+        (field, condition), = [(k, v) for k, v in query.items() if k != "id"]
+        wanted = condition["$elemMatch"]
+        for item in self.wedding[field]:
+            if all(item.get(key) == value for key, value in wanted.items()):
+                item["placeholder"] = update["$set"][f"{field}.$.placeholder"]
+                self.wedding["placeholders_version"] = self.wedding.get("placeholders_version", 0) + 1
+                return SimpleNamespace(modified_count=1)
+        return SimpleNamespace(modified_count=0)
+
+
+@pytest.fixture
+def job(monkeypatch):
+    rendered = []
+
+    async def placeholder(digest):
+        rendered.append(digest)
+        return dict(PLACEHOLDER)
+
+    async def fetch_original(src):
+        return "b" * 64
+
+    monkeypatch.setattr(server.image_cache, "placeholder", placeholder)
+    monkeypatch.setattr(server.image_cache, "fetch_original", fetch_original)
+    monkeypatch.setattr(server, "journal_wedding_update", lambda wedding_id, update, match=None: None)
+    job = server.ImagePlaceholderJob()
+    job.rendered = rendered
+    return job
+
+
+def use_wedding(monkeypatch, wedding):
+    monkeypatch.setattr(server.db, "database", type("Database", (), {"weddings": Weddings(wedding)})())
+    return wedding
+
+
+def test_refresh_stores_placeholders_without_bumping_the_version(job, monkeypatch):
+    wedding = use_wedding(monkeypatch, {"id": "w1", "version": 4, "gallery_photos": [
+        {"id": "p1", "src": UPLOADED},
+        {"id": "p2", "src": REMOTE},
+        {"id": "p3", "src": "data:image/png;base64,AA=="},
+    ]})
+    assert asyncio.run(job.refresh("w1")) == 2
+    assert job.rendered == [DIGEST, "b" * 64]
+    first = wedding["gallery_photos"][0]["placeholder"]
+    assert first["width"] == 1200 and first["source"] == server.placeholder_source_key(UPLOADED)
+    assert "placeholder" not in wedding["gallery_photos"][2]
+    assert wedding["version"] == 4 and server.wedding_etag(wedding) == '"4.2"'
+    # Nothing left to do on the next pass
+    assert asyncio.run(job.refresh("w1")) == 0 and len(job.rendered) == 2
+
+
+def test_placeholder_for_a_src_edited_meanwhile_is_dropped(job, monkeypatch):
+    wedding = use_wedding(monkeypatch, {"id": "w1", "bridal_party": [{"id": "b1", "photo": UPLOADED}]})
+
+    async def placeholder(digest):
+        wedding["bridal_party"][0]["photo"] = REMOTE  # an edit lands while rendering
+        return dict(PLACEHOLDER)
+
+    monkeypatch.setattr(server.image_cache, "placeholder", placeholder)
+    assert asyncio.run(job.refresh("w1")) == 0
+    assert "placeholder" not in wedding["bridal_party"][0]
+
+
+def test_failed_images_are_skipped(job, monkeypatch):
+    async def fetch_original(src):
+        raise ValueError("Image host answered 404")
+
+    monkeypatch.setattr(server.image_cache, "fetch_original", fetch_original)
+    use_wedding(monkeypatch, {"id": "w1", "story_timeline": [{"id": "t1", "image": REMOTE}, {"id": "t2", "image": UPLOADED}]})
+    assert asyncio.run(job.refresh("w1")) == 1
+
+
+@pytest.mark.skipif(images.Image is None, reason="Pillow is not installed")
+def test_rendered_placeholder_is_tiny_and_keeps_the_real_size(tmp_path):
+    path = tmp_path / "photo.jpg"
+    images.Image.new("RGB", (1200, 800), "navy").save(path, format="JPEG")
+    placeholder = images.render_image_placeholder(str(path))
+    assert (placeholder["width"], placeholder["height"]) == (1200, 800)
+    assert placeholder["preview"].startswith("data:image/webp;base64,") and len(placeholder["preview"]) < 1000
+    preview = images.Image.open(io.BytesIO(images.base64.b64decode(placeholder["preview"].partition(",")[2])))
+    assert max(preview.size) == images.IMAGE_PLACEHOLDER_SIZE
@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+
+import server
+
+
+def message(n, **fields):
+    return {"id": f"m{n}", "created_at": f"2026-05-{n:02d}", "message": "hi", "is_public": True, **fields}
+
+
+class Guestbook:
+    def __init__(self, messages):
+        self.messages = messages  # newest first, as the feed query sorts them
+        self.reads = 0
+
+    def find(self, query, projection):
+        self.reads += 1
+        return self
+
+    def sort(self, keys):
+        return self
+
+    def limit(self, count):
+        self.page_size = count
+        return self
+
+    async def to_list(self, length):
+        return self.messages[:self.page_size]
+
+    async def count_documents(self, query):
+        return len(self.messages)
+
+
+@pytest.fixture
+def guestbook(monkeypatch):
+    guestbook = Guestbook([message(n) for n in range(9, 0, -1)])
+    monkeypatch.setattr(server.db, "database", type("Database", (), {"guestbook": guestbook})())
+    return guestbook
+
+
+def test_first_page_is_served_from_the_seeded_buffer(guestbook):
+    feed = server.PublicGuestbookFeed(size=5)
+    assert feed.page(3) is None
+    asyncio.run(feed.seed())
+    page = feed.page(3)
+    assert [m["id"] for m in page["messages"]] == ["m9", "m8", "m7"]
+    assert page["total_count"] == 9 and page["has_more"]
+    # A full buffer can't tell whether Mongo holds more, so it says there may be
+    assert feed.page(5)["has_more"]
+    assert feed.page(6) is None
+
+
+def test_new_messages_go_to_the_front_and_the_oldest_drops_off(guestbook):
+    feed = server.PublicGuestbookFeed(size=3)
+    feed.add(message(10))  # ignored until seeded
+    asyncio.run(feed.seed())
+    feed.add({**message(10), "_id": object()})
+    assert [m["id"] for m in feed.messages] == ["m10", "m9", "m8"]
+    assert "_id" not in feed.messages[0] and feed.total_count == 10
+
+
+def test_short_feed_knows_there_is_nothing_older(monkeypatch):
+    guestbook = Guestbook([message(2), message(1)])
+    monkeypatch.setattr(server.db, "database", type("Database", (), {"guestbook": guestbook})())
+    feed = server.PublicGuestbookFeed(size=5)
+    asyncio.run(feed.seed())
+    page = feed.page(5)
+    assert page["count"] == 2 and not page["has_more"]
+
+
+def test_only_cursor_pages_reach_the_database(guestbook, monkeypatch):
+    feed = server.PublicGuestbookFeed(size=5)
+    asyncio.run(feed.seed())
+    monkeypatch.setattr(server, "public_guestbook_feed", feed)
+
+    async def collections():
+        return None, None
+
+    monkeypatch.setattr(server, "get_collections", collections)
+    reads = guestbook.reads
+    first = asyncio.run(server.get_public_guestbook_messages(limit=2, before=None, after=None))
+    assert guestbook.reads == reads and first["count"] == 2
+    older = asyncio.run(server.get_public_guestbook_messages(limit=2, before=first["next_cursor"], after=None))
+    assert guestbook.reads == reads + 1 and older["total_count"] is None
+
+
+def test_only_public_messages_are_published_to_the_feed(guestbook, monkeypatch):
+    feed = server.PublicGuestbookFeed(size=5)
+    asyncio.run(feed.seed())
+    monkeypatch.setattr(server, "public_guestbook_feed", feed)
+    monkeypatch.setattr(server, "publish_wedding_event", lambda event_type, entry: None)
+    server.publish_guestbook_message(message(10, wedding_id="w1", is_public=False))
+    server.publish_guestbook_message(message(11, wedding_id="public"))
+    assert [m["id"] for m in feed.messages][:2] == ["m11", "m9"]
@@ -0,0 +1,142 @@
+import asyncio
+from collections import Counter
+
+import pytest
+from starlette.requests import Request
+from starlette.responses import Response
+
+import auth
+import server
+
+
+def test_dedup_survives_a_generation_rotation():
+    tracker = server.ReactionTracker(capacity=2)
+    assert tracker.first_reaction("g1", "m1", "like")
+    assert tracker.first_reaction("g2", "m1", "like")
+    # The third key starts a new generation; the first two are still remembered
+    assert tracker.first_reaction("g3", "m1", "like")
+    assert not tracker.first_reaction("g1", "m1", "like")
+    assert not tracker.first_reaction("g3", "m1", "like")
+    assert tracker.first_reaction("g1", "m1", "love")
+    # After a second rotation the oldest generation is gone
+    tracker.first_reaction("g4", "m1", "like")
+    assert tracker.first_reaction("g2", "m1", "like")
+
+
+def test_guest_tokens_are_signed():
+    guest_id, token = auth.issue_guest_token()
+    assert auth.guest_id_of(token) == guest_id
+    assert auth.guest_id_of(f"{guest_id}.{'0' * 32}") is None
+    assert auth.guest_id_of(f"other{token}") is None
+    assert auth.guest_id_of(None) is None and auth.guest_id_of("") is None
+
+
+class Reactions:
+    def __init__(self):
+        self.shards = Counter()
+
+    async def update_one(self, query, update, upsert):
+        self.shards[query["_id"]] += update["$inc"]["count"]
+
+    def aggregate(self, pipeline):
+        message_ids = pipeline[0]["$match"]["message_id"]["$in"]
+        totals = Counter()
+        for shard_id, count in self.shards.items():
+            message_id, reaction, _ = shard_id.split(":")
+            if message_id in message_ids:
+                totals[(message_id, reaction)] += count
+        return self._rows(totals)
+
+    async def _rows(self, totals):
+        for (message_id, reaction), count in totals.items():
+            yield {"_id": {"message_id": message_id, "reaction": reaction}, "count": count}
+
+
+class Guestbook:
+    def __init__(self):
+        self.messages = {"m1": {"id": "m1", "moderation_state": "approved"}}
+
+    async def find_one(self, query, projection):
+        message = self.messages.get(query["id"])
+        return message if message and message["moderation_state"] == query["moderation_state"] else None
+
+    async def bulk_write(self, operations, ordered):
+        for operation in operations:
+            self.messages[operation._filter["id"]].update(operation._doc["$set"])
+
+
+@pytest.fixture
+def database(monkeypatch):
+    database = type("Database", (), {"guestbook": Guestbook(), "guestbook_reactions": Reactions()})()
+    monkeypatch.setattr(server.db, "database", database)
+    monkeypatch.setattr(server, "reaction_tracker", server.ReactionTracker(100))
+    monkeypatch.setattr(server, "guest_tokens_by_ip", server.RecentWindow(3600))
+    return database
+
+
+def react(message_id="m1", reaction="like", cookie=None, peer="198.51.100.7"):
+    headers = [(b"cookie", f"{auth.GUEST_TOKEN_COOKIE}={cookie}".encode())] if cookie else []
+    request = Request({"type": "http", "headers": headers, "client": (peer, 1234)})
+    response = Response()
+    result = asyncio.run(server.react_to_guestbook_message(message_id, {"reaction": reaction}, request, response))
+    cookie = response.headers.get("set-cookie", "").partition("=")[2].partition(";")[0]
+    return result["counted"], cookie or None
+
+
+def test_repeat_reaction_with_the_issued_token_is_not_counted(database):
+    counted, token = react()
+    assert counted and auth.guest_id_of(token)
+    assert react(cookie=token) == (False, None)
+    # Another guest on the same venue Wi-Fi still counts
+    assert react()[0]
+
+
+def test_client_ids_in_the_body_no_longer_pick_the_identity(database):
+    counted, token = react()
+    request = Request({"type": "http", "headers": [
+        (b"cookie", f"{auth.GUEST_TOKEN_COOKIE}={token}".encode()),
+    ], "client": ("198.51.100.7", 1234)})
+    result = asyncio.run(server.react_to_guestbook_message(
+        "m1", {"reaction": "like", "session_id": "fresh"}, request, Response()
+    ))
+    assert not result["counted"]
+
+
+def test_clients_discarding_cookies_share_one_vote_per_ip(database, monkeypatch):
+    monkeypatch.setattr(server, "GUEST_TOKENS_PER_IP_PER_HOUR", 2)
+    assert [react()[0] for _ in range(5)] == [True, True, True, False, False]
+    assert react(peer="203.0.113.1")[0]
+
+
+def test_forged_token_is_replaced(database):
+    counted, token = react(cookie="abc.def")
+    assert counted and token and token != "abc.def"
+
+
+def test_unknown_message_and_reaction_are_rejected(database):
+    with pytest.raises(server.HTTPException) as error:
+        react(message_id="missing")
+    assert error.value.status_code == 404
+    with pytest.raises(server.HTTPException) as error:
+        react(reaction="angry")
+    assert error.value.status_code == 400
+
+
+def test_rollup_sums_shards_into_the_message(database, monkeypatch):
+    monkeypatch.setattr(server.public_guestbook_feed, "messages", [{"id": "m1"}])
+    for reaction in ("like", "like", "love"):
+        react(reaction=reaction)
+    asyncio.run(server.rollup_reactions())
+    assert database.guestbook.messages["m1"]["reactions"] == {"like": 2, "love": 1}
+    assert server.public_guestbook_feed.messages[0]["reactions"] == {"like": 2, "love": 1}
+    assert not server.reaction_tracker.dirty
+
+
+def test_failed_rollup_keeps_messages_dirty(database):
+    async def broken(operations, ordered):
+        raise OSError("down")
+
+    react()
+    database.guestbook.bulk_write = broken
+    asyncio.run(server.rollup_reactions())
+    assert server.reaction_tracker.dirty == {"m1"}
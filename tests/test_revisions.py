@@ -0,0 +1,152 @@
+import asyncio
+import copy
+
+import pytest
+from fastapi import HTTPException
+
+import server
+
+
+def test_changes_round_trip_through_storage():
+    update = {
+        "$set": {"theme": "rose", "faqs.$.answer": "A"},
+        "$unset": {"venue_name": ""},
+        "$inc": {"version": 1},
+        "$push": {"story_timeline": {"$each": [{"id": "t"}], "$position": 0}},
+        "$pull": {"gallery_photos": {"id": "p"}},
+    }
+    changes = server.encode_revision_changes(update)
+    assert all("$" not in key for change in changes for key in change)
+    assert server.decode_revision_changes(changes) == {k: v for k, v in update.items() if k != "$inc"}
+
+
+def test_replaying_deltas_over_a_checkpoint_rebuilds_each_edit():
+    checkpoint = {"theme": "classic", "faqs": [{"id": 1, "question": "q"}], "story_timeline": [{"id": "a"}]}
+    edits = [
+        ({"$set": {"theme": "rose"}}, None),
+        ({"$push": {"story_timeline": {"$each": [{"id": "b"}], "$position": 0}}}, None),
+        ({"$set": {"faqs.$.answer": "A"}}, {"faqs.id": server.item_id_condition("1")}),
+        ({"$pull": {"story_timeline": {"id": server.item_id_condition("a")}}}, None),
+    ]
+    expected = copy.deepcopy(checkpoint)
+    for update, match in edits:
+        server.apply_update_to_document(expected, update, match)
+
+    state = copy.deepcopy(checkpoint)
+    for update, match in edits:
+        stored = server.encode_revision_changes(update)
+        # What record_wedding_revision keeps of the match, and how wedding_state_at widens it
+        kept = [[key, value["$in"][0] if isinstance(value, dict) else value] for key, value in (match or {}).items()]
+        replay_match = {key: server.item_id_condition(value) for key, value in kept}
+        server.apply_update_to_document(state, server.decode_revision_changes(stored), replay_match)
+
+    assert state == expected == {
+        "theme": "rose",
+        "faqs": [{"id": 1, "question": "q", "answer": "A"}],
+        "story_timeline": [{"id": "b"}],
+    }
+
+
+
+class Revisions:
+    def __init__(self):
+        self.entries = []
+        self.fail = False
+
+    def _matching(self, query):
+        bounds = query.get("revision", {})
+        return sorted(
+            (entry for entry in self.entries
+             if entry["wedding_id"] == query["wedding_id"] and entry["kind"] == query["kind"]
+             and entry["revision"] <= bounds.get("$lte", entry["revision"])
+             and entry["revision"] > bounds.get("$gt", entry["revision"] - 1)),
+            key=lambda entry: entry["revision"],
+        )
+
+    async def insert_one(self, entry):
+        if self.fail:
+            raise OSError("down")
+        self.entries.append(copy.deepcopy(entry))
+
+    async def find_one(self, query, projection=None, sort=None):
+        matching = self._matching(query)
+        return matching[-1] if matching else None
+
+    def find(self, query):
+        matching = self._matching(query)
+
+        class Cursor:
+            def sort(self, key, direction):
+                return self
+
+            async def to_list(self, length):
+                return matching
+
+        return Cursor()
+
+
+class Weddings:
+    def __init__(self, wedding):
+        self.wedding = wedding
+
+    async def find_one(self, query, projection):
+        return copy.deepcopy(self.wedding)
+
+
+@pytest.fixture
+def history(monkeypatch):
+    wedding = {"id": "w1", "version": 1, "theme": "classic"}
+    database = type("Database", (), {"wedding_revisions": Revisions(), "weddings": Weddings(wedding)})()
+    monkeypatch.setattr(server.db, "database", database)
+    monkeypatch.setattr(server, "WEDDING_CHECKPOINT_INTERVAL", 3)
+    monkeypatch.setattr(server, "wedding_checkpoint_versions", {})
+    monkeypatch.setattr(server, "wedding_checkpoints_due", set())
+    for tracker in (server.upload_references, server.image_placeholders, server.wedding_images):
+        monkeypatch.setattr(tracker, "mark", lambda wedding_id: None)
+
+    async def edit(theme):
+        wedding["version"] += 1
+        wedding["theme"] = theme
+        await server.record_wedding_revision("w1", wedding["version"], {"$set": {"theme": theme}})
+
+    database.edit = edit
+    return database
+
+
+def checkpoints(history):
+    return [entry["revision"] for entry in history.wedding_revisions.entries if entry["kind"] == "checkpoint"]
+
+
+def test_checkpoints_are_taken_every_interval_and_after_a_gap(history):
+    async def scenario():
+        for theme in ("a", "b", "c", "d", "e"):
+            await history.edit(theme)
+        assert checkpoints(history) == [2, 5]
+        history.wedding_revisions.fail = True
+        await history.edit("f")
+        history.wedding_revisions.fail = False
+        await history.edit("g")
+
+    asyncio.run(scenario())
+    # The lost delta for 7 is bridged by a checkpoint at 8
+    assert checkpoints(history) == [2, 5, 8]
+
+
+def test_state_is_rebuilt_from_the_nearest_checkpoint(history):
+    async def scenario():
+        for theme in ("a", "b", "c", "d"):
+            await history.edit(theme)
+        assert (await server.wedding_state_at("w1", 4))["theme"] == "c"
+        assert (await server.wedding_state_at("w1", 5))["theme"] == "d"
+        with pytest.raises(HTTPException) as error:
+            await server.wedding_state_at("w1", 1)
+        assert error.value.status_code == 404
+        # A missing delta means the history can't vouch for that revision
+        history.wedding_revisions.entries = [
+            entry for entry in history.wedding_revisions.entries if entry["revision"] != 3 or entry["kind"] != "delta"
+        ]
+        with pytest.raises(HTTPException) as error:
+            await server.wedding_state_at("w1", 4)
+        assert error.value.status_code == 409
+
+    asyncio.run(scenario())
@@ -0,0 +1,107 @@
+import asyncio
+import csv
+import io
+import json
+
+import pytest
+from fastapi import HTTPException
+
+import server
+
+RSVPS = [
+    {"id": "r1", "guest_name": "Ana", "guest_email": "ana@example.com", "guest_phone": "+1 415 555 0100",
+     "attendance": "yes", "guest_count": 2, "special_message": "=HYPERLINK(\"http://x\")"},
+    {"id": "r2", "guest_name": "@Ben", "guest_email": "ben@example.com", "guest_phone": "",
+     "attendance": "no", "guest_count": -1, "special_message": "Sorry!"},
+]
+
+
+class Cursor:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def sort(self, key, direction):
+        return self
+
+    def batch_size(self, size):
+        return self
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for document in self.documents:
+            yield document
+
+
+class Rsvps:
+    def __init__(self, documents):
+        self.documents = documents
+        self.queries = []
+
+    def find(self, query, projection):
+        self.queries.append((query, projection))
+        return Cursor([
+            {key: value for key, value in document.items() if key in projection}
+            for document in self.documents
+        ])
+
+
+@pytest.fixture
+def rsvps(monkeypatch):
+    rsvps = Rsvps(RSVPS)
+    monkeypatch.setattr(server.db, "database", type("Database", (), {"rsvps": rsvps})())
+    return rsvps
+
+
+def export(export_format="csv", columns=None):
+    async def read():
+        response = await server.export_wedding_rsvps("w1", format=export_format, columns=columns)
+        body = b"".join([chunk async for chunk in response.body_iterator])
+        return response, body.decode("utf-8")
+
+    return asyncio.run(read())
+
+
+def test_csv_streams_the_selected_columns_in_order(rsvps):
+    response, body = export(columns="guest_name, attendance")
+    assert response.media_type == "text/csv"
+    assert response.headers["content-disposition"] == 'attachment; filename="rsvps-w1.csv"'
+    assert list(csv.reader(io.StringIO(body))) == [["guest_name", "attendance"], ["Ana", "yes"], ["'@Ben", "no"]]
+    query, projection = rsvps.queries[0]
+    assert query == {"wedding_id": "w1"}
+    assert projection == {"_id": 0, "guest_name": 1, "attendance": 1}
+
+
+def test_csv_neutralises_formula_cells(rsvps):
+    rows = list(csv.DictReader(io.StringIO(export()[1])))
+    assert rows[0]["special_message"] == "'=HYPERLINK(\"http://x\")"
+    assert rows[0]["guest_phone"] == "'+1 415 555 0100"
+    # Numbers are written as numbers, only text is quoted
+    assert rows[1]["guest_count"] == "-1"
+    assert list(rows[0]) == server.RSVP_EXPORT_COLUMNS
+
+
+def test_ndjson_keeps_values_as_typed(rsvps):
+    response, body = export("NDJSON", columns="id,guest_count,special_message")
+    assert response.media_type == "application/x-ndjson"
+    assert [json.loads(line) for line in body.splitlines()] == [
+        {"id": "r1", "guest_count": 2, "special_message": "=HYPERLINK(\"http://x\")"},
+        {"id": "r2", "guest_count": -1, "special_message": "Sorry!"},
+    ]
+
+
+def test_large_exports_are_flushed_in_batches(rsvps, monkeypatch):
+    monkeypatch.setattr(server, "RSVP_EXPORT_BATCH_SIZE", 1)
+
+    async def chunks():
+        return [chunk async for chunk in server.iter_rsvp_export("w1", ["id"], "ndjson")]
+
+    assert asyncio.run(chunks()) == [b'{"id": "r1"}\n', b'{"id": "r2"}\n']
+
+
+@pytest.mark.parametrize("export_format, columns", [("xlsx", None), ("csv", "id,password"), ("csv", " , ")])
+def test_bad_format_or_columns_are_a_400(rsvps, export_format, columns):
+    with pytest.raises(HTTPException) as error:
+        export(export_format, columns)
+    assert error.value.status_code == 400
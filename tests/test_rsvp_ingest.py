@@ -0,0 +1,145 @@
+import asyncio
+import json
+
+import pytest
+from pymongo.errors import BulkWriteError
+
+import server
+
+
+def rsvp(rsvp_id, guest_key=None, wedding_id="w1", **fields):
+    return {"id": rsvp_id, "wedding_id": wedding_id, "guest_key": guest_key, **fields}
+
+
+def test_guest_rsvp_id_is_stable_per_wedding_and_guest():
+    assert server.guest_rsvp_id("w1", "ana@example.com") == server.guest_rsvp_id("w1", "ana@example.com")
+    assert server.guest_rsvp_id("w1", "ana@example.com") != server.guest_rsvp_id("w2", "ana@example.com")
+
+
+def test_batch_coalesces_each_guest_to_the_last_write():
+    operations = server.rsvp_bulk_operations([
+        rsvp("a", "ana", attendance="yes"),
+        rsvp("x"),
+        rsvp("a", "ana", attendance="no"),
+    ])
+    assert [entry["id"] for _, entry in operations] == ["x", "a"]
+    update = operations[1][0]._doc
+    assert update["$set"]["attendance"] == "no" and update["$set"]["id"] == "a"
+    assert update["$inc"] == {"revision": 2}
+
+
+class Rsvps:
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.writes = []
+
+    async def bulk_write(self, operations, ordered):
+        self.writes.append(len(operations))
+        outcome = self.outcomes.pop(0) if self.outcomes else None
+        if outcome is not None:
+            raise outcome
+
+
+@pytest.fixture
+def ingest(monkeypatch, tmp_path):
+    published = []
+    monkeypatch.setattr(server, "RSVP_DEAD_LETTER_FILE", tmp_path / "dead.jsonl")
+    monkeypatch.setattr(server, "publish_wedding_event", lambda event_type, entry: published.append(entry["id"]))
+    monkeypatch.setattr(server.rsvp_search_cache, "record", lambda entry: None)
+    queue = server.RSVPIngestQueue(max_size=10, batch_size=5, flush_ms=10)
+    queue.published = published
+    return queue
+
+
+def use_rsvps(monkeypatch, rsvps):
+    monkeypatch.setattr(server.db, "database", type("Database", (), {"rsvps": rsvps})())
+
+
+def parked():
+    if not server.RSVP_DEAD_LETTER_FILE.exists():
+        return []
+    return [json.loads(line)["id"] for line in server.RSVP_DEAD_LETTER_FILE.read_text().splitlines()]
+
+
+def test_duplicate_key_races_are_retried_and_rejects_parked(ingest, monkeypatch):
+    errors = BulkWriteError({"writeErrors": [
+        {"index": 0, "code": 11000, "errmsg": "duplicate"},
+        {"index": 1, "code": 121, "errmsg": "validation failed"},
+    ]})
+    rsvps = Rsvps(errors)
+    use_rsvps(monkeypatch, rsvps)
+    asyncio.run(ingest._write([rsvp("a", "ana"), rsvp("b", "ben"), rsvp("c", "cy")]))
+    assert rsvps.writes == [3, 1]
+    assert ingest.published == ["c", "a"]
+    assert parked() == ["b"]
+
+
+def test_batch_that_keeps_failing_is_parked(ingest, monkeypatch):
+    monkeypatch.setattr(server, "RSVP_INGEST_MAX_RETRIES", 2)
+    rsvps = Rsvps(OSError("down"), OSError("down"))
+    use_rsvps(monkeypatch, rsvps)
+    asyncio.run(ingest._write([rsvp("a"), rsvp("b", "ben")]))
+    assert rsvps.writes == [2, 2] and not ingest.published
+    assert parked() == ["a", "b"]
+
+    # The next start replays them
+    use_rsvps(monkeypatch, Rsvps())
+    asyncio.run(ingest.replay_dead_letters())
+    assert ingest.published == ["a", "b"] and not server.RSVP_DEAD_LETTER_FILE.exists()
+
+
+def test_parking_failure_is_logged_not_raised(ingest, monkeypatch, tmp_path, caplog):
+    monkeypatch.setattr(server, "RSVP_DEAD_LETTER_FILE", tmp_path / "missing" / "dead.jsonl")
+    asyncio.run(ingest._dead_letter([rsvp("a")]))
+    assert "Failed to park 1 RSVPs" in caplog.text
+
+
+def test_worker_survives_a_failing_batch(ingest, monkeypatch):
+    written = []
+
+    async def write(batch):
+        if batch[0]["id"] == "bad":
+            raise RuntimeError("boom")
+        written.extend(entry["id"] for entry in batch)
+
+    async def scenario():
+        monkeypatch.setattr(ingest, "_write", write)
+        ingest.start()
+        await ingest.submit(rsvp("bad"))
+        await asyncio.sleep(0.05)
+        await ingest.submit(rsvp("good"))
+        await ingest.stop()
+
+    asyncio.run(scenario())
+    assert written == ["good"] and ingest.worker is None
+
+
+def test_stop_gives_up_on_a_stuck_write_and_parks_the_rest(ingest, monkeypatch):
+    monkeypatch.setattr(server, "RSVP_INGEST_STOP_TIMEOUT", 0.1)
+
+    async def write(batch):
+        await asyncio.sleep(3600)
+
+    async def scenario():
+        monkeypatch.setattr(ingest, "_write", write)
+        ingest.start()
+        await ingest.submit(rsvp("a"))
+        await asyncio.sleep(0.05)
+        await ingest.submit(rsvp("b"))
+        await ingest.stop()
+
+    asyncio.run(scenario())
+    assert sorted(parked()) == ["a", "b"]
+    with pytest.raises(server.HTTPException) as error:
+        asyncio.run(ingest.submit(rsvp("c")))
+    assert error.value.status_code == 503
+
+
+def test_cached_search_row_moves_to_the_stable_id():
+    cache = server.RSVPSearchCache(1)
+    guests = server.GuestTrie()
+    guests.add({"id": "legacy", "guest_key": "ana", "guest_name": "Ana", "guest_email": "", "guest_phone": ""})
+    cache.tries["w1"] = guests
+    stable_id = server.guest_rsvp_id("w1", "ana")
+    cache.record(rsvp(stable_id, "ana", guest_name="Ana Lee", guest_email="", guest_phone=""))
+    assert [row["id"] for row in guests.search(["ana"])] == [stable_id]
@@ -0,0 +1,137 @@
+import asyncio
+
+import pytest
+from pymongo import DeleteOne
+from pymongo.errors import DuplicateKeyError
+
+import server
+
+
+def test_guest_key_prefers_email_then_phone_digits():
+    assert server.normalize_guest_key(" Ana@Example.COM ", "+1 415") == "email:ana@example.com"
+    assert server.normalize_guest_key("", "+1 (415) 555-0100") == "phone:14155550100"
+    assert server.normalize_guest_key("  ", "n/a") is None
+
+
+class Rsvps:
+    """Upserts keyed on (wedding_id, guest_key), optionally losing the first insert race"""
+
+    def __init__(self, race=False):
+        self.documents = []
+        self.race = race
+
+    async def find_one_and_update(self, query, update, upsert, return_document, projection):
+        document = next((d for d in self.documents if all(d.get(k) == v for k, v in query.items())), None)
+        if document is None:
+            if self.race:
+                self.race = False
+                self.documents.append({**query, "revision": 0})
+                raise DuplicateKeyError("E11000 duplicate key")
+            document = dict(query)
+            self.documents.append(document)
+        document.update(update["$set"])
+        for key, amount in update["$inc"].items():
+            document[key] = document.get(key, 0) + amount
+        return {key: document[key] for key in ("id", "revision")}
+
+    async def insert_one(self, document):
+        self.documents.append(dict(document))
+
+
+@pytest.fixture
+def rsvps(monkeypatch):
+    rsvps = Rsvps()
+
+    async def known(wedding_id):
+        pass
+
+    async def collections():
+        return None, None
+
+    monkeypatch.setattr(server, "require_known_wedding", known)
+    monkeypatch.setattr(server, "get_collections", collections)
+    monkeypatch.setattr(server, "rsvp_ingest_queue", None)
+    monkeypatch.setattr(server.rsvp_search_cache, "record", lambda entry: None)
+    monkeypatch.setattr(server, "publish_wedding_event", lambda event_type, entry: None)
+    monkeypatch.setattr(server.db, "database", type("Database", (), {"rsvps": rsvps})())
+    return rsvps
+
+
+def submit(**fields):
+    return asyncio.run(server.submit_rsvp({"wedding_id": "w1", "guest_name": "Ana", **fields}))
+
+
+def test_resubmitting_updates_the_guests_one_rsvp(rsvps):
+    first = submit(guest_email="ana@example.com", attendance="yes")
+    second = submit(guest_email="ANA@example.com ", attendance="no")
+    assert first["rsvp_id"] == second["rsvp_id"] == server.guest_rsvp_id("w1", "email:ana@example.com")
+    assert (first["revision"], second["revision"]) == (1, 2)
+    assert len(rsvps.documents) == 1 and rsvps.documents[0]["attendance"] == "no"
+
+
+def test_guests_without_email_or_phone_are_always_inserted(rsvps):
+    first, second = submit(), submit()
+    assert first["rsvp_id"] != second["rsvp_id"] and len(rsvps.documents) == 2
+
+
+def test_losing_the_insert_race_is_applied_as_an_update(rsvps):
+    rsvps.race = True
+    assert submit(guest_phone="555 0100")["revision"] == 1
+    assert len(rsvps.documents) == 1
+
+
+class LegacyRsvps:
+    def __init__(self, legacy, upserted=()):
+        self.legacy = legacy
+        self.upserted = list(upserted)
+        self.operations = []
+
+    def find(self, query, projection):
+        documents = self.upserted if "$type" in str(query) else self.legacy
+        return Cursor([d for d in documents if d.get("wedding_id") == query.get("wedding_id", d.get("wedding_id"))])
+
+    async def bulk_write(self, operations, ordered):
+        self.operations.extend(operations)
+
+
+class Cursor:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def sort(self, keys):
+        return self
+
+    def batch_size(self, size):
+        return self
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for document in self.documents:
+            yield document
+
+
+def test_legacy_duplicates_collapse_onto_the_newest(monkeypatch):
+    # Already in (wedding_id, submitted_at desc) order, as the query sorts them
+    rsvps = LegacyRsvps([
+        {"_id": 1, "wedding_id": "w1", "guest_email": "ana@example.com"},
+        {"_id": 2, "wedding_id": "w1", "guest_email": "Ana@Example.com"},
+        {"_id": 3, "wedding_id": "w1", "guest_phone": "555 0100"},
+        {"_id": 4, "wedding_id": "w1"},
+        {"_id": 5, "wedding_id": "w2", "guest_email": "ana@example.com"},
+    ], upserted=[{"wedding_id": "w1", "guest_key": "phone:5550100"}])
+    monkeypatch.setattr(server.db, "database", type("Database", (), {"rsvps": rsvps})())
+    stats = asyncio.run(server.deduplicate_rsvps(batch_size=2))
+    assert stats == {"scanned": 5, "kept": 2, "deleted": 2}
+    deleted = [operation._filter["_id"] for operation in rsvps.operations if isinstance(operation, DeleteOne)]
+    assert deleted == [2, 3]
+    updates = {}
+    for operation in rsvps.operations:
+        if not isinstance(operation, DeleteOne):
+            updates.setdefault(operation._filter["_id"], {}).update(operation._doc["$set"])
+    assert updates == {
+        1: {"guest_key": "email:ana@example.com", "revision": 2},
+        4: {"revision": 1},
+        5: {"guest_key": "email:ana@example.com", "revision": 1},
+    }
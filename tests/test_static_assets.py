@@ -0,0 +1,69 @@
+import gzip
+
+import pytest
+from starlette.requests import Request
+
+import static_assets
+
+
+@pytest.fixture
+def build(tmp_path):
+    (tmp_path / "static" / "js").mkdir(parents=True)
+    (tmp_path / "index.html").write_text("<html>" + "x" * 4000 + "</html>")
+    (tmp_path / "static" / "js" / "main.3f2a9c1b.js").write_text("console.log(1);" * 200)
+    (tmp_path / "static" / "js" / "main.3f2a9c1b.js.br").write_bytes(b"brotli bytes")
+    (tmp_path / "favicon.ico").write_bytes(b"\x00" * 10)
+    (tmp_path / "manifest.json").write_text("{}")
+    return static_assets.StaticAssetIndex(tmp_path)
+
+
+def request(**headers):
+    raw = [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()]
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": raw})
+
+
+def test_cache_policy_by_path(build):
+    assert build.assets["index.html"].cache_control == "no-cache"
+    assert "immutable" in build.assets["static/js/main.3f2a9c1b.js"].cache_control
+    assert build.assets["favicon.ico"].cache_control == "public, max-age=3600"
+    assert "static/js/main.3f2a9c1b.js.br" not in build.assets
+
+
+def test_small_files_are_held_in_memory_with_text_charsets(build):
+    asset = build.assets["manifest.json"]
+    assert asset.body == b"{}" and asset.media_type == "application/json; charset=utf-8"
+    assert build.index_html is build.assets["index.html"]
+
+
+def test_precompressed_variant_wins_over_gzip(build):
+    asset = build.assets["static/js/main.3f2a9c1b.js"]
+    response = build.response(asset, request(accept_encoding="gzip, br"))
+    assert response.headers["content-encoding"] == "br" and response.body == b"brotli bytes"
+    assert response.headers["vary"] == "Accept-Encoding"
+
+
+def test_text_is_gzipped_once_at_load(build):
+    asset = build.assets["index.html"]
+    response = build.response(asset, request(accept_encoding="gzip"))
+    assert response.headers["content-encoding"] == "gzip"
+    assert gzip.decompress(response.body) == asset.body
+
+
+def test_refused_encodings_are_not_used(build):
+    asset = build.assets["index.html"]
+    response = build.response(asset, request(accept_encoding="gzip;q=0, identity"))
+    assert "content-encoding" not in response.headers and response.body == asset.body
+
+
+def test_matching_etag_is_a_304(build):
+    asset = build.assets["favicon.ico"]
+    response = build.response(asset, request(if_none_match=asset.etag))
+    assert response.status_code == 304 and response.headers["etag"] == asset.etag
+
+
+def test_large_files_are_served_from_disk(build, monkeypatch, tmp_path):
+    monkeypatch.setattr(static_assets, "STATIC_MEMORY_MAX_FILE_BYTES", 100)
+    index = static_assets.StaticAssetIndex(tmp_path)
+    asset = index.assets["index.html"]
+    assert asset.body is None and asset.etag.startswith('"')
+    assert index.response(asset, request()).path == asset.path
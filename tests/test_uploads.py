@@ -0,0 +1,216 @@
+import asyncio
+import os
+import time
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+import uploads
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 56
+
+
+def matches(document, query):
+    for key, condition in query.items():
+        value = document.get(key)
+        if isinstance(condition, dict):
+            for operator, operand in condition.items():
+                if operator == "$in" and value not in operand:
+                    return False
+                if operator == "$nin" and value in operand:
+                    return False
+                if operator == "$ne" and value == operand:
+                    return False
+                if operator == "$lte" and not value <= operand:
+                    return False
+                if operator == "$lt" and not value < operand:
+                    return False
+        elif value != condition:
+            return False
+    return True
+
+
+class Collection:
+    """Just enough of a Motor collection for the upload bookkeeping"""
+
+    def __init__(self, *documents):
+        self.documents = [dict(document) for document in documents]
+
+    def find(self, query, projection=None):
+        return self._iterate([document for document in self.documents if matches(document, query)])
+
+    async def _iterate(self, documents):
+        for document in documents:
+            yield dict(document)
+
+    async def find_one(self, query, projection=None):
+        return next((dict(document) for document in self.documents if matches(document, query)), None)
+
+    def _apply(self, document, update):
+        document.update(update.get("$set", {}))
+        for key, amount in update.get("$inc", {}).items():
+            document[key] = document.get(key, 0) + amount
+
+    async def update_one(self, query, update, upsert=False):
+        document = next((document for document in self.documents if matches(document, query)), None)
+        if document is None and upsert:
+            document = dict(query)
+            document.update(update.get("$setOnInsert", {}))
+            self.documents.append(document)
+        if document is not None:
+            self._apply(document, update)
+
+    async def update_many(self, query, update):
+        for document in self.documents:
+            if matches(document, query):
+                self._apply(document, update)
+
+    async def bulk_write(self, operations, ordered):
+        for operation in operations:
+            await self.update_one(operation._filter, operation._doc)
+
+    async def delete_one(self, query):
+        for document in self.documents:
+            if matches(document, query):
+                self.documents.remove(document)
+                return SimpleNamespace(deleted_count=1)
+        return SimpleNamespace(deleted_count=0)
+
+    def by(self, key):
+        return {document[key]: document for document in self.documents}
+
+
+A, B, C = "a" * 64, "b" * 64, "c" * 64
+NOW = uploads.datetime.utcnow()
+LINK = "/api/uploads/{}"
+
+
+@pytest.fixture
+def database(monkeypatch, tmp_path):
+    database = SimpleNamespace(
+        weddings=Collection(
+            {"id": "w1", "gallery_photos": [{"src": LINK.format(A)}, {"src": LINK.format(B)}]},
+            {"id": "w2", "hero": LINK.format(A)},
+        ),
+        uploads=Collection(
+            {"_id": 1, "sha256": A, "ref_count": 7, "created_at": NOW},
+            {"_id": 2, "sha256": B, "ref_count": 0, "created_at": NOW},
+            {"_id": 3, "sha256": C, "ref_count": 3, "created_at": NOW},
+        ),
+        upload_refs=Collection(),
+    )
+    monkeypatch.setattr(uploads.db, "database", database)
+    monkeypatch.setattr(uploads, "upload_store", uploads.UploadStore(tmp_path))
+    monkeypatch.setattr(uploads, "upload_references", uploads.UploadReferenceTracker())
+    return database
+
+
+def ref_counts(database):
+    return {digest: document["ref_count"] for digest, document in database.uploads.by("sha256").items()}
+
+
+def test_reconcile_recounts_from_the_weddings(database):
+    asyncio.run(uploads.upload_references.reconcile())
+    assert ref_counts(database) == {A: 2, B: 1, C: 0}
+    assert database.upload_refs.by("wedding_id")["w1"]["uploads"] == [A, B]
+
+
+def test_refresh_applies_only_the_difference(database):
+    asyncio.run(uploads.upload_references.reconcile())
+    database.weddings.by("id")["w1"]["gallery_photos"] = [{"src": LINK.format(C)}]
+    uploads.upload_references.mark("w1")
+    asyncio.run(uploads.upload_references.flush())
+    assert ref_counts(database) == {A: 1, B: 0, C: 1}
+    assert not uploads.upload_references.dirty
+
+
+def age(path, seconds):
+    stamp = time.time() - seconds
+    os.utime(path, (stamp, stamp))
+
+
+def test_gc_removes_orphans_and_abandoned_sessions(database, tmp_path):
+    for digest in (A, "d" * 64, "e" * 64):
+        path = uploads.upload_store.blob_path(digest)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(PNG)
+        age(path, uploads.UPLOAD_GC_GRACE_SECONDS + 60)
+    age(uploads.upload_store.blob_path("e" * 64), 60)  # still inside its grace period
+    sessions = tmp_path / "sessions"
+    sessions.mkdir()
+    for name, seconds in (("old", uploads.UPLOAD_SESSION_TTL_SECONDS + 60), ("new", 60)):
+        (sessions / f"{name}.json").write_text("{}")
+        (sessions / f"{name}.part").write_bytes(b"x")
+        age(sessions / f"{name}.json", seconds)
+
+    stats = asyncio.run(uploads.collect_upload_garbage())
+    assert stats == {"uploads": 0, "orphan_blobs": 1, "sessions": 1}
+    assert uploads.upload_store.blob_path(A).exists() and uploads.upload_store.blob_path("e" * 64).exists()
+    assert not uploads.upload_store.blob_path("d" * 64).exists()
+    assert sorted(path.name for path in sessions.iterdir()) == ["new.json", "new.part"]
+
+
+def test_gc_deletes_unreferenced_uploads_after_the_grace_period(database):
+    database.uploads.documents[1]["created_at"] = uploads.datetime(2000, 1, 1)
+    path = uploads.upload_store.blob_path(B)
+    path.parent.mkdir(parents=True)
+    path.write_bytes(PNG)
+    assert asyncio.run(uploads.collect_upload_garbage())["uploads"] == 1
+    assert B not in database.uploads.by("sha256") and not path.exists()
+
+
+@pytest.fixture
+def session(database, monkeypatch):
+    async def current_user(session_id):
+        return SimpleNamespace(id="u1")
+
+    monkeypatch.setattr(uploads, "get_current_user_simple", current_user)
+    created = asyncio.run(uploads.create_upload_session({"size": len(PNG)}, "s"))
+    return created["upload_id"]
+
+
+def chunk_request(body, gate=None):
+    async def receive():
+        if gate is not None:
+            await gate.wait()
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    return Request({"type": "http", "method": "PUT", "headers": []}, receive)
+
+
+def test_concurrent_chunks_at_one_offset_are_serialised(session):
+    async def scenario():
+        gate = asyncio.Event()
+        first = asyncio.create_task(uploads.upload_session_chunk(session, chunk_request(PNG[:32], gate), "s", offset=0))
+        second = asyncio.create_task(uploads.upload_session_chunk(session, chunk_request(PNG[:32]), "s", offset=0))
+        await asyncio.sleep(0.01)
+        assert uploads.upload_session_waiters[session] == 2
+        gate.set()
+        results = await asyncio.gather(first, second, return_exceptions=True)
+        assert results[0]["offset"] == 32
+        assert isinstance(results[1], HTTPException) and results[1].status_code == 409
+        assert results[1].detail["offset"] == 32
+
+    asyncio.run(scenario())
+    assert not uploads.upload_session_locks and not uploads.upload_session_waiters
+
+
+def test_failed_chunk_is_cut_back_and_releases_its_lock(session):
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(uploads.upload_session_chunk(session, chunk_request(PNG + b"extra"), "s", offset=0))
+    assert error.value.status_code == 413
+    assert asyncio.run(uploads.get_upload_session(session, "s"))["offset"] == 0
+    assert not uploads.upload_session_locks
+
+
+def test_completed_session_stores_the_blob_and_drops_its_lock(session, database):
+    asyncio.run(uploads.upload_session_chunk(session, chunk_request(PNG), "s", offset=0))
+    result = asyncio.run(uploads.complete_upload_session(session, "s"))
+    assert result["complete"] and result["content_type"] == "image/png"
+    assert uploads.upload_store.blob_path(result["sha256"]).read_bytes() == PNG
+    assert not uploads.upload_session_locks
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(uploads.get_upload_session(session, "s"))
+    assert error.value.status_code == 404
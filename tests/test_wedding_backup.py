@@ -0,0 +1,65 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+import server
+
+
+@pytest.fixture
+def backup(tmp_path, monkeypatch):
+    monkeypatch.setattr(server, "WEDDINGS_FILE", tmp_path / "weddings.json")
+    monkeypatch.setattr(server, "WEDDINGS_JOURNAL_FILE", tmp_path / "weddings.journal.jsonl")
+    monkeypatch.setattr(server, "weddings_journal_entries", None)
+    monkeypatch.setattr(server, "weddings_compaction", None)
+    server.save_json_file(server.WEDDINGS_FILE, {"w1": {"id": "w1", "user_id": "u1", "faqs": []}})
+    return tmp_path
+
+
+def test_journal_replays_over_the_snapshot(backup):
+    server.journal_wedding_update("w1", {"$set": {"theme": "rose"}, "$push": {"faqs": {"id": "q"}}})
+    server.journal_wedding_created({"id": "w2", "user_id": "u2"})
+    server.journal_wedding_update("w2", {"$set": {"theme": "sage"}})
+    weddings = server.load_wedding_backup()
+    assert weddings["w1"] == {"id": "w1", "user_id": "u1", "faqs": [{"id": "q"}], "theme": "rose"}
+    assert weddings["w2"] == {"id": "w2", "user_id": "u2", "theme": "sage"}
+
+
+def test_entries_for_unknown_weddings_and_torn_lines_are_skipped(backup):
+    with open(server.WEDDINGS_JOURNAL_FILE, "w") as f:
+        f.write(json.dumps({"wedding_id": "ghost", "update": {"$set": {"theme": "x"}}}) + "\n")
+        f.write(json.dumps({"wedding_id": "w1", "update": {"$set": {"theme": "ok"}}}) + "\n")
+        f.write('{"wedding_id": "w1", "upd')
+    weddings = server.load_wedding_backup()
+    assert set(weddings) == {"w1"}
+    assert weddings["w1"]["theme"] == "ok"
+
+
+def test_positional_updates_replay_by_item_id(backup):
+    server.journal_wedding_update("w1", {"$push": {"faqs": {"$each": [{"id": 1}, {"id": "b"}]}}})
+    server.journal_wedding_update("w1", {"$set": {"faqs.$.answer": "A"}}, match={"faqs.id": server.item_id_condition("1")})
+    server.journal_wedding_update("w1", {"$pull": {"faqs": {"id": server.item_id_condition("b")}}})
+    assert server.load_wedding_backup()["w1"]["faqs"] == [{"id": 1, "answer": "A"}]
+
+
+def test_compaction_runs_off_the_loop_and_keeps_later_appends(backup, monkeypatch):
+    monkeypatch.setattr(server, "WEDDINGS_JOURNAL_MAX_ENTRIES", 3)
+    compact = server.compact_wedding_backup
+    ran_in = []
+    monkeypatch.setattr(server, "compact_wedding_backup", lambda: (ran_in.append(threading.get_ident()), compact()))
+    
+    async def scenario():
+        for theme in ("a", "b", "c"):
+            server.journal_wedding_update("w1", {"$set": {"theme": theme}})
+        # Appended while the compaction may still be running
+        server.journal_wedding_update("w1", {"$set": {"venue_name": "Hall"}})
+        await server.weddings_compaction
+    
+    asyncio.run(scenario())
+    assert ran_in and ran_in[0] != threading.get_ident()
+    assert not server.compacting_journal_file().exists()
+    assert server.load_json_file(server.WEDDINGS_FILE)["w1"]["theme"] == "c"
+    assert server.load_wedding_backup()["w1"] == {
+        "id": "w1", "user_id": "u1", "faqs": [], "theme": "c", "venue_name": "Hall"
+    }
@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+from starlette.requests import Request
+
+import server
+
+
+def ids(events):
+    return [event[0] for event in events]
+
+
+def test_replay_returns_events_after_the_last_id_across_channels():
+    hub = server.WeddingEventHub(history_size=10)
+    hub.publish("w1", "rsvp", {"n": 1})
+    hub.publish("share-w1", "rsvp", {"n": 2})
+    hub.publish("w2", "rsvp", {"n": 3})
+    hub.publish("w1", "guestbook", {"n": 4})
+    assert ids(hub.replay(["w1", "share-w1"], 1)) == [2, 4]
+    assert hub.replay(["w1"], 4) == []
+
+
+def test_replay_gives_up_when_history_or_process_cannot_cover_the_gap():
+    hub = server.WeddingEventHub(history_size=2)
+    for n in range(4):
+        hub.publish("w1", "rsvp", {"n": n})
+    assert hub.replay(["w1"], 1) is None
+    assert ids(hub.replay(["w1"], 2)) == [3, 4]
+    # An id this process never issued comes from before a restart
+    assert hub.replay(["w1"], 99) is None
+
+
+def test_idle_channel_history_is_dropped(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(server.time, "monotonic", lambda: clock[0])
+    hub = server.WeddingEventHub(history_size=10, idle_seconds=60)
+    hub.publish("w1", "rsvp", {})
+    hub.publish("w2", "rsvp", {})
+    watcher = hub.subscribe(["w2"])
+    clock[0] += 61
+    hub.publish("w3", "rsvp", {})
+    assert set(hub.history) == {"w2", "w3"} and "w1" not in hub.last_active
+    # A client that missed w1's event must resync rather than get an empty replay
+    assert hub.replay(["w1"], 0) is None
+    assert ids(hub.replay(["w2"], 0)) == [2]
+    # Once w1 comes back, its fresh history can't vouch for the dropped event either
+    hub.publish("w1", "rsvp", {})
+    assert hub.replay(["w1"], 0) is None
+    assert ids(hub.replay(["w1"], 1)) == [4]
+
+    hub.unsubscribe(["w2"], watcher)
+    clock[0] += 61
+    hub.publish("w3", "rsvp", {})
+    assert "w2" not in hub.history and not hub.subscribers
+
+
+def test_slow_subscriber_is_marked_overflowed():
+    subscription = server.EventSubscription(limit=2)
+    for n in range(3):
+        subscription.push((n, "rsvp", "{}"))
+    assert len(subscription.pending) == 2 and subscription.overflowed and subscription.ready.is_set()
+
+
+@pytest.fixture
+def hub(monkeypatch):
+    hub = server.WeddingEventHub(history_size=10)
+    monkeypatch.setattr(server, "wedding_event_hub", hub)
+    return hub
+
+
+def open_stream(last_event_id=None):
+    async def receive():
+        await asyncio.sleep(3600)
+
+    request = Request({"type": "http", "headers": []}, receive)
+    return server.stream_wedding_events("public", request, last_event_id=last_event_id)
+
+
+def test_stream_resumes_from_last_event_id(hub):
+    async def scenario():
+        for n in range(3):
+            hub.publish("public", "guestbook", {"n": n})
+        response = await open_stream("1")
+        chunks = response.body_iterator
+        assert await chunks.__anext__() == "retry: 3000\n\n"
+        assert await chunks.__anext__() == 'id: 2\nevent: guestbook\ndata: {"n": 1}\n\n'
+        assert await chunks.__anext__() == 'id: 3\nevent: guestbook\ndata: {"n": 2}\n\n'
+        # Live events follow the replayed ones on the same connection
+        hub.publish("public", "guestbook", {"n": 3})
+        assert await chunks.__anext__() == 'id: 4\nevent: guestbook\ndata: {"n": 3}\n\n'
+        await chunks.aclose()
+        assert not hub.subscribers
+
+    asyncio.run(scenario())
+
+
+def test_stream_asks_for_a_resync_when_too_far_behind(hub):
+    async def scenario():
+        hub.publish("public", "guestbook", {})
+        response = await open_stream("99")
+        chunks = response.body_iterator
+        await chunks.__anext__()
+        assert await chunks.__anext__() == "id: 1\nevent: resync\ndata: {}\n\n"
+        await chunks.aclose()
+
+    asyncio.run(scenario())
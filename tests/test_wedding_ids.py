@@ -0,0 +1,24 @@
+import server
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = server.BloomFilter(capacity=5000)
+    ids = [f"wedding-{i}" for i in range(5000)]
+    for wedding_id in ids:
+        bloom.add(wedding_id)
+    assert all(wedding_id in bloom for wedding_id in ids)
+
+
+def test_bloom_filter_false_positive_rate_is_near_its_target():
+    bloom = server.BloomFilter(capacity=5000, error_rate=0.01)
+    for i in range(5000):
+        bloom.add(f"wedding-{i}")
+    false_positives = sum(f"other-{i}" in bloom for i in range(20000))
+    assert false_positives / 20000 < 0.03
+
+
+def test_registry_index_skips_missing_ids():
+    registry = server.WeddingIdRegistry("set")
+    assert registry._build_index(["a", None, "b", ""]) == {"a", "b"}
+    bloom = server.WeddingIdRegistry("bloom")._build_index(["a", None])
+    assert "a" in bloom
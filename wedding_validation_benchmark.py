@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Benchmark validation of large wedding documents through the typed section models.
+
+Compares the cached TypeAdapters the API uses against building an adapter per
+call, with the old untyped List[dict]/dict fields as a floor:
+
+    python wedding_validation_benchmark.py --items 200 --photos 500 --rounds 50
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from pydantic import TypeAdapter  # noqa: E402
+
+import server  # noqa: E402
+
+
+def large_wedding(items, photos):
+    text = "A day we will remember for the rest of our lives. " * 8
+    return {
+        "story_timeline": [
+            {"id": f"t{i}", "year": "2020", "title": f"Moment {i}", "description": text,
+             "image": "https://images.unsplash.com/photo-1511285560929-80b456fea0bc?w=600"}
+            for i in range(items)
+        ],
+        "schedule_events": [
+            {"id": f"s{i}", "time": "2:00 PM", "title": f"Event {i}", "description": text,
+             "location": "Garden Pavilion", "duration": "45 minutes", "icon": "Music", "highlight": i % 2 == 0}
+            for i in range(items)
+        ],
+        "gallery_photos": [
+            {"id": f"p{i}", "src": f"https://images.unsplash.com/photo-{i}?w=800", "category": "engagement", "title": f"Photo {i}"}
+            for i in range(photos)
+        ],
+        "bridal_party": [
+            {"id": f"b{i}", "name": f"Guest {i}", "role": "Bridesmaid", "relationship": "Friend", "description": text}
+            for i in range(items)
+        ],
+        "registry_items": [
+            {"id": f"r{i}", "store": "Williams Sonoma", "description": text, "url": "https://example.com", "price": 99.5}
+            for i in range(items)
+        ],
+        "faqs": [
+            {"id": f"f{i}", "category": "Details", "questions": [{"question": "What time?", "answer": text}] * 5}
+            for i in range(items)
+        ],
+        "honeymoon_fund": {"title": "Honeymoon Fund", "description": text, "destination": "Kyoto"},
+    }
+
+
+def run(label, validate, document, rounds):
+    started = time.perf_counter()
+    for _ in range(rounds):
+        validate(document)
+    elapsed = time.perf_counter() - started
+    item_count = sum(len(v) for v in document.values() if isinstance(v, list))
+    print(f"{label:<22} {rounds / elapsed:8.1f} docs/sec  {rounds * item_count / elapsed:10.0f} items/sec  "
+          f"({elapsed / rounds * 1000:.2f} ms/doc)")
+
+
+UNTYPED = TypeAdapter(dict)
+
+
+def untyped(document):
+    UNTYPED.dump_python(UNTYPED.validate_python(document), mode="json")
+
+
+def uncached(document):
+    for field, value in document.items():
+        adapter = TypeAdapter(server.section_list(field) if field in server.WEDDING_ITEM_MODELS else server.HoneymoonFund)
+        adapter.validate_python(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--items", type=int, default=200, help="items per list section")
+    parser.add_argument("--photos", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    document = large_wedding(args.items, args.photos)
+    size_kb = len(server.json.dumps(document)) / 1024
+    print(f"🔄 Validating a {size_kb:.0f} KB wedding document {args.rounds} times")
+    run("cached TypeAdapter", server.validate_wedding_sections, document, args.rounds)
+    run("TypeAdapter per call", uncached, document, max(1, args.rounds // 5))
+    run("untyped dicts", untyped, document, args.rounds)
+
+
+if __name__ == "__main__":
+    main()